@@ -118,6 +118,51 @@ DINGOS_BLOB_TABLE = 2
 DINGOS_LARGE_VALUE_DESTINATION = DINGOS_BLOB_TABLE
 
 
+# If DINGOS_BULK_FACT_WRITE is set, InfoObject.from_dict collects all facts
+# of an information object and writes them with a handful of batched queries
+# rather than running the full query sequence of 'add_fact' for every single fact.
+
+DINGOS_BULK_FACT_WRITE = True
+
+# DINGOS_BULK_LOAD_BACKEND governs how the bulk fact writer inserts the (possibly
+# very many) rows linking information objects to facts and facts to values:
+#
+# - 'copy': rows are streamed into the target table with PostgreSQL's
+#   'COPY ... FROM STDIN'. On other databases, 'executemany' is used instead.
+#   The writer only ever appends new rows, so they are copied straight into
+#   the target table: merging them from a staging table would merely write
+#   every row twice. The table's sequence assigns the primary keys in the
+#   order of the rows.
+# - 'executemany': rows are inserted with the DB-API's 'executemany'.
+# - 'orm': rows are inserted with Django's 'bulk_create'.
+# - 'auto': 'copy' on PostgreSQL, 'executemany' on all other databases.
+
+DINGOS_BULK_LOAD_BACKEND = 'auto'
+
+# Schema information (fact terms, data types, namespaces, information-object
+# types, families and revisions) is cached in memory. DINGOS_SCHEMA_CACHE_SIZE
+# governs the maximal number of cached entries per model; a value of 0 disables
+# the caches.
+
+DINGOS_SCHEMA_CACHE_SIZE = 10000
+
+# If DINGOS_SKIP_UNCHANGED_REIMPORT is set, the import of an information object
+# whose content equals the content of the latest revision of the object's identifier
+# is skipped rather than creating a new revision with identical content.
+
+DINGOS_SKIP_UNCHANGED_REIMPORT = True
+
+# If DINGOS_COPY_ON_WRITE_REVISIONS is set, a new revision of an information object
+# only stores the facts that differ from its predecessor revision; the remaining
+# facts are inherited from the predecessor. To keep reads cheap, a full revision is
+# written whenever the chain of inheriting revisions would exceed
+# DINGOS_COPY_ON_WRITE_MAX_CHAIN revisions.
+
+DINGOS_COPY_ON_WRITE_REVISIONS = False
+
+DINGOS_COPY_ON_WRITE_MAX_CHAIN = 10
+
+
 
 # The DINGOS_BLOB_ROOT absolutely has to be set in the DINGOS settings.
 # If that is not the case, the attempt to read the value from the settings
@@ -129,6 +174,26 @@ DINGOS_BLOB_ROOT = None
 
 DINGOS_BLOB_STORAGE = None
 
+# Blobs written to DINGOS_BLOB_STORAGE are spread over DINGOS_BLOB_SHARD_DEPTH levels
+# of subdirectories named after the leading characters of the blob's SHA256 digest.
+# If DINGOS_BLOB_COMPRESSION is set, new blobs are compressed with zlib; reading
+# works for compressed and uncompressed blobs regardless of the setting.
+
+DINGOS_BLOB_SHARD_DEPTH = 2
+
+DINGOS_BLOB_COMPRESSION = False
+
+# Contents of the blob table are cached in memory; DINGOS_BLOB_CACHE_SIZE
+# governs the maximal total size (in characters) of the cached contents; a value
+# of 0 disables the cache. If DINGOS_BLOB_PREVIEW_LENGTH is set, the facts of an
+# information object only display the first DINGOS_BLOB_PREVIEW_LENGTH characters of
+# values in the blob table, with a link to the full value; by default, values are
+# displayed in full.
+
+DINGOS_BLOB_CACHE_SIZE = 16 * 1024 * 1024
+
+DINGOS_BLOB_PREVIEW_LENGTH = 0
+
 DINGOS_DEFAULT_USER_PREFS = {
     'dingos' : { 'widgets' :
                      {'embedded_in_objects' :
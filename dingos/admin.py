@@ -30,7 +30,9 @@ from models import DataTypeNameSpace,\
     IdentifierNameSpace,\
     UserData,\
     FactTermNamespaceMap,\
-    PositionalNamespace
+    PositionalNamespace,\
+    ImportJob,\
+    ImportCheckpoint
 
 
 
@@ -154,6 +156,16 @@ class FactTermNamespaceMapAdmin(admin.ModelAdmin):
 
     inlines = (FactTermNamespaceMap_PositionalNamespace_Inline,)
 
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('pk','filename','command','status','worker','created','seconds')
+    list_filter = ('status','command')
+    raw_id_fields = ('markings',)
+
+class ImportCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('pk','filename','command','status','digest','created','seconds')
+    list_filter = ('status','command')
+    search_fields = ('filename','digest')
+
 
 #
 # Registration
@@ -183,4 +195,7 @@ admin.site.register(UserData,UserDataAdmin)
 
 admin.site.register(FactTermNamespaceMap,FactTermNamespaceMapAdmin)
 
+admin.site.register(ImportJob,ImportJobAdmin)
+admin.site.register(ImportCheckpoint,ImportCheckpointAdmin)
+
 
@@ -0,0 +1,157 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+File-system storage for values that are too large for the value table.
+
+Blobs are addressed by the SHA256 digest of their content. Since the digest
+determines the content, a blob that already exists is never written again.
+Blob files are spread over subdirectories named after the leading characters
+of the digest (e.g., 'ab/cd/abcd...blob'), so that no single directory
+ends up with hundreds of thousands of entries.
+"""
+
+import errno
+import hashlib
+import os
+import tempfile
+import zlib
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+BLOB_SUFFIX = '.blob'
+
+# Suffix of zlib-compressed blobs: whether a blob is compressed is
+# recorded in its name, so changing the 'compress' setting does not
+# affect reading the blobs that have already been written.
+
+COMPRESSED_BLOB_SUFFIX = '.blob.z'
+
+
+class BlobFileSystemStorage(FileSystemStorage):
+    """
+    A FileSystemStorage with additional methods for writing and reading blobs
+    by their digest:
+
+    - 'save_blob' writes a blob unless a blob with the same digest exists already.
+      The blob is written to a temporary file in the target directory, which is
+      then renamed, so readers never see partially written blobs.
+    - 'read_blob' returns the content of a blob, decompressing it if required.
+
+    Parameters (in addition to those of FileSystemStorage):
+
+    - compress: write new blobs compressed with zlib
+    - shard_depth: number of subdirectory levels
+    - shard_width: number of digest characters per subdirectory level
+
+    Blobs written by earlier versions of DINGOS directly into the root directory
+    are found as well.
+    """
+
+    def __init__(self, location=None, base_url=None, compress=False, shard_depth=2, shard_width=2):
+        super(BlobFileSystemStorage, self).__init__(location=location, base_url=base_url)
+        self.compress = compress
+        self.shard_depth = shard_depth
+        self.shard_width = shard_width
+
+    def blob_name(self, digest, compressed=False):
+        """
+        Return the name of the blob with the given digest relative to the storage root.
+        """
+        shards = [digest[level * self.shard_width:(level + 1) * self.shard_width]
+                  for level in range(self.shard_depth)]
+        return os.path.join(*(shards + ['%s%s' % (digest, COMPRESSED_BLOB_SUFFIX if compressed else BLOB_SUFFIX)]))
+
+    def candidate_names(self, digest):
+        # Names under which the blob may have been written, the ones of the current
+        # configuration first.
+        names = [self.blob_name(digest, compressed=self.compress),
+                 self.blob_name(digest, compressed=not self.compress)]
+        if self.shard_depth:
+            names.append('%s%s' % (digest, BLOB_SUFFIX))
+        return names
+
+    def find_blob(self, digest):
+        """
+        Return the name of the blob with the given digest, or None if there is no such blob.
+        """
+        for name in self.candidate_names(digest):
+            if self.exists(name):
+                return name
+        return None
+
+    def has_blob(self, digest):
+        return self.find_blob(digest) is not None
+
+    def save_blob(self, value, digest=None):
+        """
+        Write the given value unless a blob with the same digest exists already.
+        Returns the digest and whether the blob has been written.
+        """
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        if digest is None:
+            digest = hashlib.sha256(value).hexdigest()
+        if self.has_blob(digest):
+            return (digest, False)
+
+        name = self.blob_name(digest, compressed=self.compress)
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            # Another process may have created the directory in the meantime
+            if e.errno != errno.EEXIST:
+                raise
+
+        if self.compress:
+            value = zlib.compress(value)
+
+        (fd, tmp_path) = tempfile.mkstemp(dir=directory, prefix='.%s.' % digest, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(value)
+            if settings.FILE_UPLOAD_PERMISSIONS is not None:
+                os.chmod(tmp_path, settings.FILE_UPLOAD_PERMISSIONS)
+            if os.name == 'nt' and os.path.exists(full_path):
+                # 'rename' does not replace existing files on Windows; since the
+                # existing blob has the same content, we can simply discard ours.
+                os.remove(tmp_path)
+            else:
+                os.rename(tmp_path, full_path)
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return (digest, True)
+
+    def read_blob(self, digest):
+        """
+        Return the content of the blob with the given digest; raises IOError
+        if there is no such blob.
+        """
+        name = self.find_blob(digest)
+        if name is None:
+            raise IOError(errno.ENOENT, "Blob %s not found" % digest)
+        with open(self.path(name), 'rb') as blob_file:
+            content = blob_file.read()
+        if name.endswith(COMPRESSED_BLOB_SUFFIX):
+            content = zlib.decompress(content)
+        return content
@@ -19,11 +19,23 @@
 
 import logging
 import re
+import threading
+
+from collections import OrderedDict
 
-from django.utils.datastructures import SortedDict
 
 logger = logging.getLogger(__name__)
 
+# Element names in a DingoObjDict (as opposed to attributes and special keys
+# such as '_value', which start with '@' and '_').
+
+RE_ELEMENT_MATCHER = re.compile(r"[^@_].*")
+
+# Kinds of entries on the stack used by 'DingoObjDict.iterflatten'
+
+_FLAT_FACT = 0
+_FLAT_NODE = 1
+
 
 
 def dict2tuple(mydict):
@@ -35,13 +47,13 @@ def dict2tuple(mydict):
     observes the order of elements (which standard dictionaries don't).
     """
     result = []
-    for key in mydict.keys():
+    for key in mydict:
         # There are three cases we need to consider:
         # dictionary, list, and other values
         try:
             # We test whether the object is a dictionary-like
             # structure via accessing the
-            keys = mydict[key].keys()
+            mydict[key].keys
             key_result = dict2tuple(mydict[key])
         except AttributeError:
             # So we have either a list or a value
@@ -79,11 +91,137 @@ def tuple2dict(mytuple, constructor=dict):
     return result
 
 
-class ExtendedSortedDict(SortedDict):
+class CompactOrderedDict(dict):
+    """
+    A dictionary that remembers the order in which keys were inserted.
+
+    CompactOrderedDict replaces Django's SortedDict as basis of the dictionaries
+    created (in large numbers) during imports: instances do not carry an instance
+    dictionary, and deleting a key does not search the key order; instead, deleted keys are
+    remembered and removed from the key order the next time the order is read.
+    """
+
+    __slots__ = ('_key_order', '_deleted')
+
+    def __init__(self, data=None, **kwargs):
+        super(CompactOrderedDict, self).__init__()
+        self._key_order = []
+        self._deleted = None
+        if data is not None:
+            self.update(data)
+        if kwargs:
+            self.update(kwargs)
+
+    def _compact(self):
+        if self._deleted:
+            deleted = self._deleted
+            self._key_order = [key for key in self._key_order if not key in deleted]
+        self._deleted = None
+
+    def __setitem__(self, key, value):
+        if not key in self:
+            if self._deleted and key in self._deleted:
+                self._compact()
+            self._key_order.append(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        if self._deleted is None:
+            self._deleted = set()
+        self._deleted.add(key)
+
+    def __iter__(self):
+        if self._deleted:
+            self._compact()
+        return iter(self._key_order)
+
+    def __reversed__(self):
+        if self._deleted:
+            self._compact()
+        return reversed(self._key_order)
+
+    def __reduce__(self):
+        return (self.__class__, (self.items(),))
+
+    def __repr__(self):
+        return '{%s}' % ', '.join(['%r: %r' % (key, value) for (key, value) in self.iteritems()])
+
+    @property
+    def keyOrder(self):
+        # For code written against Django's SortedDict
+        if self._deleted:
+            self._compact()
+        return self._key_order
+
+    def keys(self):
+        if self._deleted:
+            self._compact()
+        return self._key_order[:]
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    iterkeys = __iter__
+
+    def itervalues(self):
+        for key in self:
+            yield self[key]
+
+    def iteritems(self):
+        for key in self:
+            yield (key, self[key])
+
+    def pop(self, key, *args):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        if not self:
+            raise KeyError('popitem(): dictionary is empty')
+        if self._deleted:
+            self._compact()
+        key = self._key_order.pop()
+        return (key, dict.pop(self, key))
+
+    def setdefault(self, key, default=None):
+        if not key in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, data=None, **kwargs):
+        if data is not None:
+            if hasattr(data, 'keys'):
+                for key in data.keys():
+                    self[key] = data[key]
+            else:
+                for (key, value) in data:
+                    self[key] = value
+        for (key, value) in kwargs.items():
+            self[key] = value
+
+    def clear(self):
+        dict.clear(self)
+        self._key_order = []
+        self._deleted = None
+
+    def copy(self):
+        return self.__class__(self)
+
+
+class ExtendedSortedDict(CompactOrderedDict):
     """
     ExtendedSortedDict adds a few convenient
-    methods to Django's SortedDict class.
+    methods to the CompactOrderedDict class.
     """
+
+    __slots__ = ()
     #def copy(self):
     #    obj = self.__class__(self)
     #    obj.keyOrder = self.keyOrder[:]
@@ -177,6 +315,180 @@ class ExtendedSortedDict(SortedDict):
                 existing[keys[len(keys) - 1]] = [value]
 
 
+class SlottedRecord(object):
+    """
+    Base class for compact records that are created in large numbers during imports
+    (see 'FlatFact'). The fields of a record are stored in slots rather than
+    in a dictionary of its own, but a record can be accessed like a dictionary that maps
+    the names in '_keys' to the values of the fields: keys of fields that have not been
+    set are missing, and keys other than those in '_keys' are kept in a dictionary
+    that is only created if such a key is set.
+
+    Subclasses define '__slots__' (including the slots for all keys in '_keys') and may map keys
+    to slots with other names via '_key_slots'.
+    """
+
+    __slots__ = ('_extra',)
+
+    _keys = ()
+    _key_slots = {}
+
+    def __init__(self, *args, **kwargs):
+        if args:
+            for (key, value) in args[0].items():
+                self[key] = value
+        for (key, value) in kwargs.items():
+            self[key] = value
+
+    def _slot(self, key):
+        if key in self._key_slots:
+            return self._key_slots[key]
+        elif key in self._keys:
+            return key
+        else:
+            return None
+
+    def __getitem__(self, key):
+        slot = self._slot(key)
+        try:
+            if slot:
+                return getattr(self, slot)
+            return self._extra[key]
+        except (AttributeError, KeyError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        slot = self._slot(key)
+        if slot:
+            setattr(self, slot, value)
+        else:
+            try:
+                self._extra[key] = value
+            except AttributeError:
+                self._extra = {key: value}
+
+    def __delitem__(self, key):
+        slot = self._slot(key)
+        try:
+            if slot:
+                delattr(self, slot)
+            else:
+                del self._extra[key]
+        except (AttributeError, KeyError):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    has_key = __contains__
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            self[key] = default
+            return default
+
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[key]
+        return value
+
+    def update(self, other):
+        for (key, value) in other.items():
+            self[key] = value
+
+    def keys(self):
+        result = [key for key in self._keys if hasattr(self, self._slot(key))]
+        result.extend(getattr(self, '_extra', {}).keys())
+        return result
+
+    def values(self):
+        return map(lambda x: self[x], self.keys())
+
+    def items(self):
+        return map(lambda x: (x, self[x]), self.keys())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def copy(self):
+        return self.__class__(self)
+
+    def __eq__(self, other):
+        if not hasattr(other, 'items'):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __cmp__(self, other):
+        # Records sort like the dictionaries they replace
+        if not hasattr(other, 'items'):
+            return NotImplemented
+        return cmp(dict(self.items()), dict(other.items()))
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self.items()),))
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, dict(self.items()))
+
+
+class FlatFact(SlottedRecord):
+    """
+    An entry of the flat representation of a DingoObjDict (see 'DingoObjDict.flatten'),
+    i.e., a fact (or attribute) with keys 'node_id', 'term', 'attribute', 'value' and 'namespaces'.
+    'DingoObjDict.from_flat_repr' additionally understands the keys 'value_list' and
+    '@@namespace_map'; all other keys are added to the resulting dictionary.
+    """
+
+    __slots__ = ('node_id', 'term', 'attribute', 'value', 'namespaces',
+                 'number_of_attributed_elements', 'value_list', 'namespace_map')
+
+    _keys = ('node_id', 'term', 'attribute', 'value', 'namespaces',
+             'number_of_attributed_elements', 'value_list', '@@namespace_map')
+    _key_slots = {'@@namespace_map': 'namespace_map'}
+
+    @classmethod
+    def create(cls, node_id, term, attribute, value, namespaces):
+        """
+        Create a fact of the flat representation (without going through the
+        dictionary interface).
+        """
+        fact = cls()
+        fact.node_id = node_id
+        fact.term = term
+        fact.attribute = attribute
+        fact.value = value
+        fact.namespaces = namespaces
+        return fact
+
+
 class DingoObjDict(ExtendedSortedDict):
     """
     The DingoObjDict extends the ExtendedSortedDict with
@@ -185,6 +497,8 @@ class DingoObjDict(ExtendedSortedDict):
     documentation of the flatten function.
     """
 
+    __slots__ = ()
+
     # TODO Remove commented-out code
     #def dictify(self):
     #   return dict([(k, (v.dictify() if isinstance(v,dict) else v))
@@ -203,6 +517,9 @@ class DingoObjDict(ExtendedSortedDict):
         of fact-term/value pairs and associated information about tree structure (in node_id)
         and a dictionary mapping XML attributes to node identifiers.
 
+        The entries of the list are 'FlatFact' records, which can be accessed just like
+        the dictionaries shown in the example.
+
         This all is best explained by example (see below).
 
         Note that attributes are also represented in the flattened representation. There
@@ -289,150 +606,148 @@ class DingoObjDict(ExtendedSortedDict):
 
         """
 
-        if not namespace_dict:
-            namespace_dict = {}
-
-
-
-        def node_id_gen(n):
-            """
-            Given an integer, generate a fixed-length representation.
-
-            This is used for coding tree-node representations such
-            as N001:N005:N009 (9th child of 5th child of 1st child).
-
-            Currently, we use three digits, i.e., we get problems
-            if we import stuff with more than 1000 children in a node.
+        attr_dict = {}
+        result_list = list(self.iterflatten(attr_ignore_predicate=attr_ignore_predicate,
+                                            force_nonleaf_fact_predicate=force_nonleaf_fact_predicate,
+                                            namespace_dict=namespace_dict,
+                                            attr_dict=attr_dict))
+        return (result_list, attr_dict)
 
-            """
+    def iterflatten(self, attr_ignore_predicate=None, force_nonleaf_fact_predicate=None, namespace_dict=None,
+                    attr_dict=None):
+        """
+        Generator variant of 'flatten': the facts of the flat representation are yielded
+        one after the other in the order of their node identifiers; the attributes are entered into
+        'attr_dict' (if given) as the dictionary is traversed. The attributes of a node have been
+        entered by the time the first fact of the node is yielded.
+
+        Node identifiers consist of fixed-length components ('N0001', 'L0000', 'A0002', ...),
+        so the facts can be generated in the order of their node identifiers while walking the
+        dictionary: first the fact of a node itself, then its attributes, its list elements and
+        its remaining elements, each in the order in which they occur. Only the facts
+        below a node with 10000 or more children (for which the components are
+        no longer of fixed length) need to be sorted.
+        """
 
-            return "%s%04d" % (n[0], n[1])
+        if not namespace_dict:
+            namespace_dict = {}
 
+        if attr_dict is None:
+            attr_dict = {}
 
+        if not attr_ignore_predicate:
+            attr_ignore_predicate = (lambda x: '@' in x['attribute'])
 
-        RE_ELEMENT_MATCHER = re.compile(r"[^@_].*")
+        if not force_nonleaf_fact_predicate:
+            force_nonleaf_fact_predicate = (lambda x,y: False)
 
+        def child_node_id(node_id, kind, counter):
+            if node_id == '':
+                return "%s%04d" % (kind, counter)
+            else:
+                return "%s:%s%04d" % (node_id, kind, counter)
 
-        def _flatten(self, result_list, attr_dict, elt_names, prefix):
+        def expand(node, node_id, term, namespaces):
             """
-            Flatten a Dingo dictionary representation of an infomration object into a list
-            of fact-term/value pairs and associated information about tree structure (in node_id)
-            and XML attributes.
-
-            Internal function for recursive calls.
-
+            Return the entries for the facts of the given node and the child nodes
+            that remain to be expanded in the order of their node identifiers.
             """
 
-            if '@@ns' in self.keys():
-                current_namespace = (namespace_dict.get(self.get('@@ns'),None),self.get('@@ns'))
+            if '@@ns' in node:
+                current_namespace = (namespace_dict.get(node.get('@@ns'),None),node.get('@@ns'))
             else:
                 current_namespace = (None,None)
 
-            attributes = filter(lambda x: x[0] == '@', self.keys())
+            attributes = [key for key in node if key[0] == '@']
 
-            node_id = ':'.join(map(node_id_gen, prefix))
-            for attribute in attributes:
-                if node_id not in attr_dict.keys():
-                    attr_dict[node_id] = {attribute[1:]: self[attribute]}
-                else:
-                    attr_dict[node_id][attribute[1:]] = self[attribute]
-
-            elements = filter(lambda x: RE_ELEMENT_MATCHER.match(x), self)
-
-            fact_data = {'term': '/'.join(elt_names),
-                         'namespaces' : map(lambda x: x[2],prefix),
-                         'value': self.get('_value', ''),
-                         'attribute': False,
-                         'node_id': node_id}
-
-            if elements == [] or force_nonleaf_fact_predicate(fact_data,attributes):
-                logger.debug("Entered _VALUE branch for %s" % self)
-                if '_value' in self.keys() or attributes != []:
-                    fact_data = {'term': '/'.join(elt_names),
-                                 'namespaces' : map(lambda x: x[2],prefix),
-                                 'value': self.get('_value', ''),
-                                 'attribute': False,
-                                 'node_id': node_id}
-                    result_list.append(fact_data)
-                    logger.debug("Appended fact %s" % fact_data)
-            if elements != []:
-
-                counter = 0
-                for element in elements:
-                    logger.debug("Processing element %s" % element)
-                    if type(self[element]) == type([]):
-                        logger.debug("Entered list branch for %s " % self[element])
-
-                        for sub_elt in self[element]:
-                            current_namespace = (namespace_dict.get(sub_elt.get('@@ns'),None),sub_elt.get('@@ns'))
-
-                            (result_list, attr_dict) = _flatten(sub_elt,
-                                                                result_list=result_list,
-                                                                attr_dict=attr_dict,
-                                                                elt_names=elt_names + [element],
-                                                                prefix=prefix + [('L', counter,current_namespace)])
-
-
-                            counter += 1
-                    elif isinstance(self[element],basestring):
-                        logger.debug("Entered value branch for %s" % self[element])
-                        # added this branch to deal with abbreviated dictionaries
-                        # that provide value directly rather then via '_value' key in dictionary
-
-                        # temporarily append namespace
-                        elt_names.append(element)
-
-                        fact_data = {'term': '/'.join(elt_names),
-                                     'namespaces' : map(lambda x: x[2],prefix + [('N',counter,current_namespace)]),
-                                     'value': self[element],
-                                     'attribute': False,
-                                     'node_id': "%s" % ':'.join(map(node_id_gen, prefix + [('N', counter,current_namespace)]))}
-                        logger.debug("Appended fact %s" % fact_data)
-                        result_list.append(fact_data)
-                        # clean up namespace
-                        elt_names = elt_names[:-1]
-                        counter += 1
-                    else:
-                        logger.debug("Recursing for %s" % self[element])
-                        current_namespace = (namespace_dict.get(self[element].get('@@ns'),None),self[element].get('@@ns'))
-
-                        (result_list, attr_dict) = _flatten(self[element],
-                                                            result_list=result_list,
-                                                            attr_dict=attr_dict,
-                                                            elt_names=elt_names + [element],
-                                                            prefix=prefix + [('N', counter,current_namespace)])
-                        counter += 1
+            if attributes:
+                node_attributes = attr_dict.setdefault(node_id,{})
+                for attribute in attributes:
+                    node_attributes[attribute[1:]] = node[attribute]
+
+            elements = [key for key in node if RE_ELEMENT_MATCHER.match(key)]
+
+            entries = []
+
+            if elements == [] or force_nonleaf_fact_predicate(FlatFact.create(node_id,
+                                                                              term,
+                                                                              False,
+                                                                              node.get('_value', ''),
+                                                                              list(namespaces)),
+                                                              attributes):
+                if '_value' in node or attributes != []:
+                    entries.append((_FLAT_FACT, FlatFact.create(node_id,
+                                                                term,
+                                                                False,
+                                                                node.get('_value', ''),
+                                                                list(namespaces))))
 
             attr_counter = 0
             for attribute in attributes:
-                if node_id == '':
-                    attr_node_id = node_id_gen(('A', attr_counter,(None,None)))
-                else:
-                    attr_node_id = "%s:%s" % (node_id, node_id_gen(('A', attr_counter,(None,None))))
-                fact = {'term': "%s" % ('/'.join(elt_names)),
-                        'namespaces' : map(lambda x: x[2],prefix),
-                        'value': self[attribute],
-                        'node_id': attr_node_id,
-                        'attribute': attribute[1:],
-                        'number_of_attributed_elements': len(elements)}
+                fact = FlatFact.create(child_node_id(node_id, 'A', attr_counter),
+                                       term,
+                                       attribute[1:],
+                                       node[attribute],
+                                       list(namespaces))
+                fact.number_of_attributed_elements = len(elements)
                 if not attr_ignore_predicate(fact):
-                    del(fact['number_of_attributed_elements'])
-                    result_list.append(fact)
-                    logger.debug("Appended fact %s" % fact)
+                    del(fact.number_of_attributed_elements)
+                    entries.append((_FLAT_FACT, fact))
                     attr_counter += 1
-                else:
-                    logger.debug("Ignoring fact %s because of attr_ignore_list" % fact)
-            result_list.sort(key=lambda x: x['node_id'])
-
-            return (result_list, attr_dict)
 
-        if not attr_ignore_predicate:
-            attr_ignore_predicate = (lambda x: '@' in x['attribute'])
-
-        if not force_nonleaf_fact_predicate:
-            force_nonleaf_fact_predicate = (lambda x,y: False)
+            list_entries = []
+            element_entries = []
+            counter = 0
+            for element in elements:
+                value = node[element]
+                if term:
+                    element_term = "%s/%s" % (term, element)
+                else:
+                    element_term = element
+                if type(value) == type([]):
+                    for sub_elt in value:
+                        current_namespace = (namespace_dict.get(sub_elt.get('@@ns'),None),sub_elt.get('@@ns'))
+                        list_entries.append((_FLAT_NODE, (sub_elt,
+                                                          child_node_id(node_id, 'L', counter),
+                                                          element_term,
+                                                          namespaces + [current_namespace])))
+                        counter += 1
+                elif isinstance(value,basestring):
+                    # Abbreviated dictionaries provide the value directly
+                    # rather than via a '_value' key in a dictionary
+                    element_entries.append((_FLAT_FACT, FlatFact.create(child_node_id(node_id, 'N', counter),
+                                                                        element_term,
+                                                                        False,
+                                                                        value,
+                                                                        namespaces + [current_namespace])))
+                    counter += 1
+                else:
+                    current_namespace = (namespace_dict.get(value.get('@@ns'),None),value.get('@@ns'))
+                    element_entries.append((_FLAT_NODE, (value,
+                                                         child_node_id(node_id, 'N', counter),
+                                                         element_term,
+                                                         namespaces + [current_namespace])))
+                    counter += 1
+
+            entries.extend(list_entries)
+            entries.extend(element_entries)
+
+            if counter > 10000 or attr_counter > 10000:
+                return map(lambda x: (_FLAT_FACT, x),
+                           sorted(walk(entries), key=lambda x: x.node_id))
+
+            return entries
+
+        def walk(entries):
+            stack = list(reversed(entries))
+            while stack:
+                (kind, data) = stack.pop()
+                if kind == _FLAT_FACT:
+                    yield data
+                else:
+                    stack.extend(reversed(expand(*data)))
 
-        return _flatten(self,result_list=[], attr_dict={}, elt_names=[], prefix=[])
+        return walk([(_FLAT_NODE, (self, '', '', []))])
 
     def from_flat_repr(self,fact_list,include_node_id=False,no_attributes=False,track_namespaces=True,namespace_mapping=None):
         """
@@ -509,7 +824,7 @@ class DingoObjDict(ExtendedSortedDict):
             del(fact['node_id'])
 
 
-            if '@@namespace_map' in fact.keys():
+            if '@@namespace_map' in fact:
                 namespace_map = fact['@@namespace_map']
                 del(fact['@@namespace_map'])
             else:
@@ -548,7 +863,7 @@ class DingoObjDict(ExtendedSortedDict):
                 if no_attributes and i == len(node_path)-1 and node_kind== 'A':
                     continue
 
-                if not (element in walker.keys()):
+                if not (element in walker):
 
                     if node_kind == 'L':
                         walker[element] = []
@@ -647,3 +962,113 @@ def dict2DingoObjDict(data):
     info_tuple = dict2tuple(data)
     info_dict = tuple2dict(info_tuple, constructor=DingoObjDict)
     return info_dict
+
+
+class LRUCache(object):
+    """
+    A dictionary-like cache of bounded size: if more than 'maxsize' entries
+    are stored, the least recently used entry is evicted. A 'maxsize'
+    of 0 disables the cache, i.e., nothing is stored.
+
+    The cache counts hits and misses of lookups via 'get'; the
+    counters are reported (along with the current size) by 'stats'.
+
+    Access to the cache is guarded by a lock, so a cache may
+    be shared between threads.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            # Re-insert the entry to mark it as most recently used
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data)}
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SizeBoundedLRUCache(LRUCache):
+    """
+    An LRUCache that is bounded by the total size of the stored values
+    (as determined by 'sizeof') rather than by the number of entries: if the
+    values add up to more than 'maxsize', the least recently used entries
+    are evicted. Values that are larger than 'maxsize' on their own are not
+    stored at all.
+    """
+
+    def __init__(self, maxsize=1024 * 1024, sizeof=len):
+        super(SizeBoundedLRUCache, self).__init__(maxsize=maxsize)
+        self.sizeof = sizeof
+        self.total_size = 0
+        self._sizes = {}
+
+    def _remove(self, key):
+        if key in self._data:
+            del self._data[key]
+            self.total_size -= self._sizes.pop(key)
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            self._remove(key)
+            if size > self.maxsize:
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self.total_size += size
+            while self.total_size > self.maxsize:
+                (evicted_key, evicted_value) = self._data.popitem(last=False)
+                self.total_size -= self._sizes.pop(evicted_key)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.total_size = 0
+
+    def stats(self):
+        stats = super(SizeBoundedLRUCache, self).stats()
+        stats['total_size'] = self.total_size
+        return stats
@@ -0,0 +1,310 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Instrumentation of imports: the import code reports the wall time, number of
+queries and number of rows of the stages of an import (XML parsing, flattening,
+datatype extraction, etc.) to the active 'ImportProfiler', which collects them
+per stage, per information object and per imported file.
+
+Profiling is turned on with 'enable' (the import commands do so for the options
+'--stats' and '--stats-json'). While it is turned off, 'active' is None, and all that
+instrumented code does is to check this.
+"""
+
+import functools
+import time
+
+from django.db import connections
+from django.conf import settings
+
+# The profiler to which the import code reports; None if profiling is turned off.
+
+active = None
+
+# Order in which the stages are listed in the statistics.
+
+STAGES = ['xml_parse',
+          'xml_to_dict',
+          'prefetch',
+          'flatten',
+          'datatype_extraction',
+          'special_handlers',
+          'fact_terms',
+          'fact_values',
+          'facts',
+          'node_ids',
+          'namespace_maps',
+          'copy_on_write',
+          'io2f',
+          'naming',
+          'marking']
+
+# Number of queries after which the query log of a connection whose debug cursor
+# has been turned on for counting queries is emptied.
+
+QUERY_LOG_SIZE = 1000
+
+
+def enable(profiler=None):
+    """
+    Turn profiling on and return the active profiler.
+    """
+    global active
+    if active is None:
+        active = profiler or ImportProfiler()
+        active.start_query_counting()
+    return active
+
+
+def disable():
+    """
+    Turn profiling off.
+    """
+    global active
+    if active is not None:
+        active.stop_query_counting()
+    active = None
+
+
+class _Stage(object):
+    """
+    Context manager returned by 'stage'; the number of rows treated by the stage can be set via 'rows'.
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.rows = 0
+
+    def __enter__(self):
+        if self.profiler:
+            self.token = self.profiler.start(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profiler:
+            self.profiler.stop(self.token, rows=self.rows)
+        return False
+
+
+def stage(name):
+    """
+    Measure the enclosed block as stage of the given name::
+
+         with profiling.stage('flatten') as flatten_stage:
+             ...
+             flatten_stage.rows = len(flat_list)
+
+    For code that is run for each and every fact, use 'active.start' and 'active.stop'
+    (guarded by a check whether 'active' is set) rather than this function.
+    """
+    return _Stage(active, name)
+
+
+def profiled_iobject(function):
+    """
+    Decorator for 'DingoImportHandling.create_iobject': while profiling is turned on,
+    the stages measured during the call are also recorded for the information object.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        profiler = active
+        if not profiler:
+            return function(*args, **kwargs)
+        profiler.start_object(kwargs.get('identifier_ns_uri'), kwargs.get('uid'), kwargs.get('iobject_type_name'))
+        result = None
+        try:
+            result = function(*args, **kwargs)
+            return result
+        finally:
+            profiler.finish_object(result[1] if result else None)
+    return wrapper
+
+
+def _add(stats, name, seconds, queries, rows):
+    entry = stats.get(name)
+    if entry is None:
+        entry = stats[name] = {'calls': 0, 'seconds': 0.0, 'queries': 0, 'rows': 0}
+    entry['calls'] += 1
+    entry['seconds'] += seconds
+    entry['queries'] += queries
+    entry['rows'] += rows
+
+
+class ImportProfiler(object):
+    """
+    Collects wall time, number of queries and number of rows per stage, per information object
+    and per file. The times of nested stages are included in the times of the enclosing
+    stages.
+
+    Queries are counted via the query log of the database connections; for connections that
+    do not log queries anyway (i.e., if DEBUG is not set), logging is turned on while
+    the profiler is active.
+    """
+
+    def __init__(self):
+        self.files = []
+        self._file = None
+        self._objects = []
+        self._counted_connections = []
+        self._discarded_queries = 0
+
+    def start_query_counting(self):
+        for connection in connections.all():
+            if not (settings.DEBUG or connection.use_debug_cursor):
+                connection.use_debug_cursor = True
+                self._counted_connections.append(connection)
+
+    def stop_query_counting(self):
+        for connection in self._counted_connections:
+            connection.use_debug_cursor = False
+            del connection.queries[:]
+        self._counted_connections = []
+
+    def query_count(self):
+        count = self._discarded_queries
+        for connection in connections.all():
+            count += len(connection.queries)
+        return count
+
+    def _discard_query_log(self):
+        # The query log of connections whose logging we turned on is only
+        # kept for counting, so we keep it small.
+        for connection in self._counted_connections:
+            if len(connection.queries) > QUERY_LOG_SIZE:
+                self._discarded_queries += len(connection.queries)
+                del connection.queries[:]
+
+    def _current_file(self):
+        if self._file is None:
+            # Stages measured outside of an imported file
+            self.start_file(None)
+        return self._file
+
+    def start(self, name):
+        return (name, time.time(), self.query_count())
+
+    def stop(self, token, rows=0):
+        (name, start_time, start_queries) = token
+        seconds = time.time() - start_time
+        queries = self.query_count() - start_queries
+        _add(self._current_file()['stages'], name, seconds, queries, rows)
+        if self._objects:
+            _add(self._objects[-1]['stages'], name, seconds, queries, rows)
+        self._discard_query_log()
+
+    def start_file(self, filename):
+        self._file = {'filename': filename,
+                      'seconds': 0.0,
+                      'queries': 0,
+                      'stages': {},
+                      'objects': [],
+                      '_token': self.start('file')}
+        self.files.append(self._file)
+
+    def finish_file(self):
+        """
+        Finish the record for the current file and return it.
+        """
+        record = self._file
+        (name, start_time, start_queries) = record.pop('_token')
+        record['seconds'] = time.time() - start_time
+        record['queries'] = self.query_count() - start_queries
+        self._file = None
+        self._discard_query_log()
+        return record
+
+    def add_file(self, record):
+        """
+        Add a file record collected by another profiler (e.g., in a worker process).
+        """
+        self.files.append(record)
+
+    def start_object(self, identifier_ns_uri, uid, iobject_type_name):
+        self._objects.append({'identifier': "%s:%s" % (identifier_ns_uri, uid),
+                              'iobject_type': iobject_type_name,
+                              'stages': {},
+                              '_token': self.start('object')})
+
+    def finish_object(self, exists=None):
+        record = self._objects.pop()
+        (name, start_time, start_queries) = record.pop('_token')
+        record['seconds'] = time.time() - start_time
+        record['queries'] = self.query_count() - start_queries
+        record['exists'] = exists
+        self._current_file()['objects'].append(record)
+        self._discard_query_log()
+
+    def report(self):
+        """
+        Return a dictionary (that can be serialized as JSON) with the totals per stage ('stages'),
+        the total time, number of queries and number of objects ('total') and the records
+        of all files ('files'), which in turn contain the records of the objects written
+        while importing the file.
+        """
+        stages = {}
+        total = {'files': 0, 'objects': 0, 'seconds': 0.0, 'queries': 0}
+        for record in self.files:
+            if record['filename'] is not None:
+                total['files'] += 1
+            total['objects'] += len(record['objects'])
+            total['seconds'] += record['seconds']
+            total['queries'] += record['queries']
+            for (name, entry) in record['stages'].items():
+                if not name in stages:
+                    stages[name] = {'calls': 0, 'seconds': 0.0, 'queries': 0, 'rows': 0}
+                for key in entry:
+                    stages[name][key] += entry[key]
+        return {'total': total,
+                'stages': stages,
+                'files': self.files}
+
+    def format_stats(self, slowest=10):
+        """
+        Return a table of the totals per stage, followed by the slowest information objects.
+        """
+        report = self.report()
+        total = report['total']
+        stages = report['stages']
+
+        lines = ["%-20s %8s %10s %7s %9s %10s" % ('Stage', 'Calls', 'Seconds', '%', 'Queries', 'Rows')]
+        for name in STAGES + sorted(set(stages.keys()) - set(STAGES)):
+            if not name in stages:
+                continue
+            entry = stages[name]
+            lines.append("%-20s %8d %10.3f %6.1f%% %9d %10d" % (name,
+                                                                 entry['calls'],
+                                                                 entry['seconds'],
+                                                                 100.0 * entry['seconds'] / (total['seconds'] or 1),
+                                                                 entry['queries'],
+                                                                 entry['rows']))
+        lines.append("%-20s %8s %10.3f %6.1f%% %9d" % ('total', '', total['seconds'], 100.0, total['queries']))
+        lines.append("%s files, %s information objects" % (total['files'], total['objects']))
+
+        objects = []
+        for record in report['files']:
+            objects.extend(record['objects'])
+        if objects and slowest:
+            lines.append("")
+            lines.append("Slowest information objects:")
+            for record in sorted(objects, key=lambda x: -x['seconds'])[:slowest]:
+                lines.append("%10.3fs %6d queries  %s (%s)" % (record['seconds'],
+                                                             record['queries'],
+                                                             record['identifier'],
+                                                             record['iobject_type']))
+        return "\n".join(lines) + "\n"
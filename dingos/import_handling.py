@@ -19,17 +19,24 @@
 
 import logging
 import uuid
+import json
+import hashlib
+import time
 
 import libxml2
 
 from collections import deque
+from itertools import chain
 
+from django.db.models import Max
 from django.utils import timezone
 
+import dingos
 from dingos import *
 from dingos.core.datastructures import DingoObjDict
+from dingos.core import profiling
 from core.xml_utils import extract_attributes
-from dingos.models import dingos_class_map, get_or_create_iobject, Marking2X
+from dingos.models import dingos_class_map, get_or_create_iobject, Marking2X, atomic_import, _chunks, ImportPlan
 
 import pprint
 
@@ -49,8 +56,553 @@ EXIST_ID_AND_EXACT_TIMESTAMP = "existed"
 EXIST_ID_AND_OLDER_TIMESTAMP = "existed_older"
 EXIST_ID_AND_NEWER_TIMESTAMP = "existed_newer"
 EXIST_PLACEHOLDER = 'exist_placeholder'
+EXIST_ID_AND_SAME_CONTENT = "existed_same_content"
 NO_EXISTING_OBJECT_FOUND = False
 
+# Status under which an information object that would be written during a dry run
+# is recorded in the 'ImportPlan'.
+
+PLANNED_STATUS = {NO_EXISTING_OBJECT_FOUND: 'new',
+                  EXIST_ID_AND_OLDER_TIMESTAMP: 'new_revision',
+                  EXIST_ID_AND_NEWER_TIMESTAMP: 'older_revision',
+                  EXIST_PLACEHOLDER: 'placeholder'}
+
+
+def iobject_content_digest(iobject_data,
+                           iobject_family_name,
+                           iobject_type_name,
+                           iobject_type_namespace_uri,
+                           salt=None):
+    """
+    Calculate the SHA256 digest of the content of an information object, i.e.,
+    of its family, type and DingoObjDict. The digest is calculated over
+    a JSON serialization of the DingoObjDict that retains the order of keys,
+    since the order determines the node identifiers of the facts.
+
+    The facts written for the content also depend on the importer's hooks
+    (see the 'config_hooks' of 'DingoImportHandling.create_iobject'). If a salt
+    (e.g., a version of the importer's hooks) is given, it is included in the digest,
+    so that content imported with other hooks is not considered unchanged.
+    """
+    content = [iobject_family_name,
+               iobject_type_name,
+               iobject_type_namespace_uri,
+               iobject_data]
+    if salt:
+        content.append(salt)
+    serialization = json.dumps(content,
+                               separators=(',', ':'),
+                               default=unicode)
+    return hashlib.sha256(serialization).hexdigest()
+
+
+# Node types of elements and of the ends of elements as reported by the libxml2 text reader
+
+XML_READER_TYPE_ELEMENT = 1
+XML_READER_TYPE_END_ELEMENT = 15
+
+# Without XML_PARSE_HUGE, libxml2 refuses documents nested deeper than 256 levels
+# and text nodes larger than 10MB.
+
+XML_PARSE_OPTIONS = libxml2.XML_PARSE_HUGE
+
+
+def serialize_children(element):
+    """
+    Return the concatenated serialization of the child nodes of the given element.
+    The serializations are joined in one go, since repeatedly adding
+    to a string takes quadratic time for elements with large content.
+    """
+    serialization = []
+    child = element.children
+    while child is not None:
+        serialization.append(child.serialize())
+        child = child.next
+    return ''.join(serialization)
+
+
+def read_to_root_element(xml_fname):
+    """
+    Return a libxml2 text reader for the given file that is positioned on the root element.
+    """
+    reader = libxml2.readerForFile(xml_fname, None, XML_PARSE_OPTIONS)
+    if reader is None:
+        raise IOError("Could not open %s" % xml_fname)
+
+    ret = reader.Read()
+    while ret == 1 and reader.NodeType() != XML_READER_TYPE_ELEMENT:
+        ret = reader.Read()
+    if ret != 1:
+        raise StandardError("Could not find root element in %s" % xml_fname)
+    return reader
+
+
+def read_to_element(xml_fname, path):
+    """
+    Return a libxml2 text reader for the given file that is positioned on the element
+    with the given path, i.e., the list of positions among their sibling elements of the
+    element and its ancestors below the root element (the root element has the empty path).
+    Since the subtrees of the preceding siblings are skipped, only the subtree of the
+    element is held in memory when it is expanded.
+    """
+    reader = read_to_root_element(xml_fname)
+    for position in path:
+        ret = reader.Read()
+        while ret == 1:
+            if reader.NodeType() == XML_READER_TYPE_ELEMENT:
+                if position == 0:
+                    break
+                position -= 1
+            ret = reader.Next()
+        if ret != 1:
+            raise StandardError("Could not find element %s in %s" % (path, xml_fname))
+    return reader
+
+
+def serialize_children_at(xml_fname, path):
+    """
+    Return the concatenated serialization of the child nodes of the element with
+    the given path (see 'read_to_element') in the given file.
+    """
+    # The reader must be kept until the serialization is done, since the expanded
+    # nodes are freed together with the reader.
+    reader = read_to_element(xml_fname, path)
+    return serialize_children(reader.Expand())
+
+
+class XMLElementImporter(object):
+    """
+    Turns XML elements into DingoObjDicts as described in 'DingoImportHandling.xml_import'.
+
+    Embedded objects that are recognized with the 'embedded_predicate' are
+    replaced by a reference and pushed onto a pending stack; they are
+    imported with 'process_pending'.
+
+    The import of a single element is split into 'start_element', 'start_child' (called
+    for each child node) and 'finish_element', such that the children of
+    an element can also be fed one by one as they are read, as is done by
+    'DingoImportHandling.xml_import_stream'.
+
+    Elements are traversed with an explicit stack rather than by recursion, so
+    the depth of the imported documents is not limited by Python's recursion limit.
+    """
+
+    def __init__(self,
+                 ns_mapping=None,
+                 embedded_predicate=None,
+                 id_and_revision_extractor=None,
+                 extract_empty_embedded=False,
+                 keep_attrs_in_created_reference=True,
+                 transformer=None):
+
+        self.ns_mapping = ns_mapping
+        self.embedded_predicate = embedded_predicate
+        self.id_and_revision_extractor = id_and_revision_extractor
+        self.extract_empty_embedded = extract_empty_embedded
+        self.keep_attrs_in_created_reference = keep_attrs_in_created_reference
+        if not transformer:
+            transformer = lambda x, y: (x, y)
+        self.transformer = transformer
+
+        # id and revision info of the root element; must be set before the import starts.
+        self.main_id_and_rev_info = None
+
+        self.generated_id_count = {}
+
+        # We use the pending stack to hold extracted embedded objects
+        # that still need to be processed
+        self.pending_stack = deque()
+
+    def import_element(self, element, depth=0, type_info=None, inherited_id_and_rev_info=None):
+        """
+        Import the given element and its descendants and return a pair of element
+        name and DingoObjDict.
+        """
+
+        if element.name == 'comment':
+            return None
+
+        state = self.start_element(element, depth, type_info=type_info,
+                                   inherited_id_and_rev_info=inherited_id_and_rev_info)
+
+        return self.import_children(state)
+
+    def import_children(self, state):
+        """
+        Add all children of the element whose import has been started with 'start_element'
+        and finish the element. The descendants are imported depth-first with an explicit
+        stack of element states.
+        """
+
+        state['next_child'] = state['element'].children
+        stack = [state]
+
+        while True:
+            current = stack[-1]
+            child = current['next_child']
+            if child is None:
+                stack.pop()
+                element_import = self.finish_element(current)
+                if not stack:
+                    return element_import
+                if element_import:
+                    stack[-1]['element_dicts'].append(element_import)
+            else:
+                current['next_child'] = child.next
+                child_state = self.start_child(current, child)
+                if child_state:
+                    child_state['next_child'] = child.children
+                    stack.append(child_state)
+
+    def start_element(self, element, depth=0, type_info=None, inherited_id_and_rev_info=None, streamed=False):
+        """
+        Start the import of the given element: the returned state is to be passed
+        to 'start_child' and 'finish_element'. If 'streamed' is set, the children
+        of the element are not available anymore when 'finish_element' is called;
+        should their serialization be required, it is obtained from the function
+        stored under the key 'children_serializer' of the state.
+        """
+
+        if not inherited_id_and_rev_info:
+            inherited_id_and_rev_info = self.main_id_and_rev_info.copy()
+
+        result = DingoObjDict()
+
+        # Add properties to result dictionary for this element
+
+        if element.properties:
+            for prop in element.properties:
+
+                if not prop:
+                    break
+                if prop.type == 'attribute':
+                    try:
+                        result["@%s:%s" % (prop.ns().name, prop.name)] = prop.content
+                    except:
+                        result["@%s" % prop.name] = prop.content
+
+        # see if there is a namespace
+
+        try:
+            ns = element.ns().name
+            result["@@ns"] = ns
+        except:
+            pass
+
+        return {'element': element,
+                'depth': depth,
+                'type_info': type_info,
+                'streamed': streamed,
+                'result': result,
+                'inherited_id_and_rev_info': inherited_id_and_rev_info,
+                'fresh_inherited_id_and_rev_info': inherited_id_and_rev_info.copy(),
+                # list for keeping resulting dictionaries of child elements
+                'element_dicts': [],
+                # While looking at the child-elements, we have to keep track
+                # of certain data.
+                #
+                # Firstly: keep track whether we have seen text content that is not whitespace --
+                # if that happens, we know that this element contains mixed
+                # content and we will back off and just dump the element contents
+                # as is as value into the dictionary.
+                'non_ws_content': False,
+                # Secondly: If the element contains cdata stuff, we will see
+                # that one (well, the only) child has type cdata. So if
+                # we find such a child, we set the flag
+                'cdata_content': False,
+                # Thirdly: we keep track of how many different child-element-names
+                # we have seen.
+                #
+                # - If we find that we have exactly one distinct name,
+                #   we will generate a dictionary of form
+                #             {<Element_Name> : [ <list of child elemen dictionaries> ]}
+                # - If we find that we have as many distinct names as we
+                #   child elements, we create a dictionary mapping each child element
+                #   name to its dictionary representation
+                # - If we find that we have less child element names than
+                #   we have children, we know that at least one name
+                #   occured more than once. Our dictionary representation cannot
+                #   deal with that, and we back off and dump the contents as they
+                #   are marked as 'xml' content with the '@@type' attribute.
+                'name_set': {},
+                'previous_seen_child': None,
+                'double_occurrance': False,
+                'element_child_count': 0,
+                # In streaming mode, we keep the text content of an element without
+                # child elements, since the child nodes are gone once the element is finished.
+                'text_content': [],
+                'children_serializer': None}
+
+    def start_child(self, state, child, expand=None):
+        """
+        Process a child node of the element whose import has been started with 'start_element'.
+        If the child is an element that is to be imported as part of the element,
+        its import is started and its state returned; the caller must import the children of
+        the child and append the result to the element dictionaries of the given state.
+
+        If the descendants of the child may not have been read yet, 'expand' must be given:
+        it is called to read them before the child is extracted as embedded object.
+        """
+
+        element = state['element']
+        depth = state['depth']
+
+        #if child_name=='comment':
+        #    pass
+        if child.name == 'text':
+            # If we have non-whitespace content in one of the children,
+            # we set the non_ws_content flag
+            content = child.content.strip()
+            if content != "":
+                state['non_ws_content'] = True
+            if state['streamed'] and not state['name_set']:
+                state['text_content'].append(child.content)
+
+        elif child.type == 'cdata':
+            logger.debug("!!!!FOUND CDATA")
+            # If one of the children (actually, it should be the only child)
+            # has type cdata, we know that the parent element contains cdata
+            # and set the cdata_content flag accordingly
+            state['cdata_content'] = True
+            if state['streamed'] and not state['name_set']:
+                state['text_content'].append(child.content)
+        else:
+            # we have found an element, so we recurse into it.
+            state['element_child_count'] += 1
+            state['text_content'] = []
+            if state['previous_seen_child'] and (child.name in state['name_set']) \
+                    and (not child.name == state['previous_seen_child']):
+                state['double_occurrance'] = True
+
+            state['name_set'][child.name] = None
+
+            embedded_ns = None
+            if self.embedded_predicate:
+                embedded_ns = self.embedded_predicate(element, child, self.ns_mapping)
+                logger.debug("Embedded ns is %s" % embedded_ns)
+
+            if embedded_ns:
+                if expand:
+                    expand()
+                self.add_embedded_child(state, child, embedded_ns)
+            elif child.name != 'comment':
+                return self.start_element(child, depth + 1,
+                                          inherited_id_and_rev_info=state['inherited_id_and_rev_info'],
+                                          streamed=state['streamed'])
+        return None
+
+    def add_embedded_child(self, state, child, embedded_ns):
+        """
+        Replace an embedded child by a reference and push it onto the pending stack.
+        """
+
+        fresh_inherited_id_and_rev_info = state['fresh_inherited_id_and_rev_info']
+        inherited_id_and_rev_info = fresh_inherited_id_and_rev_info.copy()
+        state['inherited_id_and_rev_info'] = inherited_id_and_rev_info
+        # There is an embedded object. We therefore
+        # replace the contents of the element with an element
+        # containing an idref (and, since we might need them,
+        # all attributes of the embedded element)
+
+        if type(embedded_ns) == type({}):
+            # If necessary, the embedded_predicate can return more information
+            # than namespace information, namely we can can hand down
+            # id and revision info that has been derived wenn the embedding
+            # was detected. For backward compatibility,
+            # we further allow returning of a string; if, however,
+            # a dictionary is returned, there is id_and_revision_info.
+            id_and_revision_info = embedded_ns.get('id_and_revision_info',
+                                                   self.id_and_revision_extractor(child))
+            embedded_ns = embedded_ns.get('embedded_ns',None)
+        else:
+            id_and_revision_info = self.id_and_revision_extractor(child)
+
+        # See whether stuff needs to be inherited
+        if not 'id' in id_and_revision_info or not id_and_revision_info['id']:
+            if 'id' in inherited_id_and_rev_info:
+                parent_id = inherited_id_and_rev_info['id']
+                if parent_id in self.generated_id_count:
+                    gen_counter = self.generated_id_count[parent_id]
+                    gen_counter +=1
+                else:
+                    gen_counter = 0
+                self.generated_id_count[parent_id] = gen_counter
+                (parent_namespace, parent_uid) = parent_id.split(':')
+                generated_id = "%s:emb%s-in-%s" % (parent_namespace,gen_counter,parent_uid)
+                logger.info("Found embedded %s without id and generated id %s" % (state['element'].name,generated_id))
+                id_and_revision_info['id'] = generated_id
+                id_and_revision_info['id_inherited'] = True
+            else:
+                logger.error("Attempt to import object (element name %s) without id -- object is ignored" % child.name)
+
+                #cybox_id = gen_cybox_id(iobject_type_name)
+
+        if not id_and_revision_info.get('timestamp', None):
+            if inherited_id_and_rev_info and 'timestamp' in inherited_id_and_rev_info:
+                id_and_revision_info['timestamp'] = inherited_id_and_rev_info['timestamp']
+                id_and_revision_info['ts_inherited'] = True
+        else:
+            inherited_id_and_rev_info['timestamp'] = id_and_revision_info['timestamp']
+
+        if 'id' in id_and_revision_info:
+            # If the identifier has no namespace info (this may occur, e.g. for
+            # embedded OpenIOC in STIX, we take the namespace inherited from  the
+            # embedding object
+            if (not ':' in id_and_revision_info['id']
+                and inherited_id_and_rev_info['id']
+                and ':' in inherited_id_and_rev_info['id']):
+                id_and_revision_info['id'] = "%s:%s" % (inherited_id_and_rev_info['id'].split(':')[0],
+                                                        id_and_revision_info['id'])
+                id_and_revision_info['ns_inherited'] = True
+
+            inherited_id_and_rev_info['id'] = id_and_revision_info['id']
+
+        if self.keep_attrs_in_created_reference:
+            reference_dict = extract_attributes(child, prefix_key_char='@',
+                                                dict_constructor=DingoObjDict)
+        else:
+            reference_dict = DingoObjDict()
+
+        reference_dict['@idref'] = id_and_revision_info['id']
+
+        reference_dict['@@timestamp'] = id_and_revision_info['timestamp']
+
+        try:
+            reference_dict['@@ns'] = child.ns().name
+        except:
+            reference_dict['@@ns'] = None
+        if embedded_ns == True:
+            embedded_ns = None
+        logger.debug("Setting embedded type info to %s" % embedded_ns)
+        reference_dict['@@embedded_type_info'] = embedded_ns
+
+        state['element_dicts'].append((child.name, reference_dict))
+        if (child.children or child.content) \
+                or self.extract_empty_embedded \
+                or 'extract_empty_embedded' in id_and_revision_info:
+
+            id_and_revision_info['inherited'] = fresh_inherited_id_and_rev_info.copy()
+            if 'inherited' in id_and_revision_info['inherited']:
+                for key in id_and_revision_info['inherited']['inherited']:
+                    if not key in id_and_revision_info['inherited']:
+                        id_and_revision_info['inherited'][key] = id_and_revision_info['inherited']['inherited'][key]
+                del(id_and_revision_info['inherited']['inherited'])
+
+            logger.debug(
+                "Adding XML subtree starting with element %s and type info %s to pending stack." % (
+                id_and_revision_info, embedded_ns))
+            self.pending_stack.append((id_and_revision_info, embedded_ns, child))
+        else:
+            # For example, in cybox 1.0, the following occurs::
+            #         <EmailMessageObj:File xsi:type="FileObj:FileObjectType" object_reference="cybox:object-3cf6a958-5c3f-11e2-a06c-0050569761d3"/>
+            # This is only a reference and may not be confused with the definition of the object,
+            # which occurs someplace else -- otherwise, the (almost) empty reference is created as object
+            # and may overwrite the object resulting from the real definition.
+            logger.info(
+                "Not adding element %s with type info %s to pending stack because element is empty." % (
+                id_and_revision_info, embedded_ns))
+
+    def finish_element(self, state):
+        """
+        Finish the import of an element and return a pair of element name and DingoObjDict.
+        """
+
+        element = state['element']
+        result = state['result']
+        name_set = state['name_set']
+
+        distinct_child_count = len(name_set)
+
+        if state['streamed']:
+            # The child nodes are gone, so we dump the text content collected
+            # while streaming or have the children serialized once more.
+            serialize = state['children_serializer']
+        else:
+            serialize = lambda: serialize_children(element)
+
+        if state['streamed'] and distinct_child_count == 0:
+            result['_value'] = ''.join(state['text_content'])
+            if state['cdata_content']:
+                result['@@content_type'] = 'cdata'
+        elif distinct_child_count == 0:
+            # No child elements were detected, so we dump the content into
+            # the value
+            result['_value'] = element.content
+            if state['cdata_content']:
+                # If this is a cdata element, we mark it as such
+                result['@@content_type'] = 'cdata'
+        elif state['non_ws_content'] == True:
+            # We have mixed content, so we dump it
+            result['_value'] = serialize().strip()
+            #result['_value']=element.serialize()
+            result['@@content_type'] = 'mixed'
+        elif state['double_occurrance']: # distinct_child_count >1 and (distinct_child_count) < element_child_count:
+            # We have a structure our dictionary representation cannot
+            # deal with -- so we dump it
+
+            logger.warning("Cannot deal with XML structure of %s (children %s, count %s): will dump to value" % (
+            element.name, name_set.keys(), state['element_child_count']))
+            result['_value'] = serialize().strip()
+            #result['_value']=element.serialize()
+            result['@@content_type'] = 'xml'
+
+        else:
+
+            previously_written_name = None
+            for (name, element_dict) in state['element_dicts']:
+
+                if not previously_written_name or name != previously_written_name:
+                    result[name] = element_dict
+                    previously_written_name = name
+                else: # if name == previously_written_name:
+                    if type(result[name]) == type([]):
+                        result[name].append(element_dict)
+                    else:
+                        result[name] = [result[name], element_dict]
+        if state['type_info']:
+            result['@@embedded_type_info'] = state['type_info']
+
+        return self.transformer(element.name, result)
+
+    def process_pending(self, do_not_process_list, detach_deferred=False):
+        """
+        Import the embedded objects on the pending stack and yield them as dictionaries
+        with keys 'id_and_rev_info', 'elt_name' and 'dict_repr'; embedded objects
+        found during the import are pushed onto the stack and processed as well.
+
+        For each found embedded object, 'add_embedded_child' pushes
+        the following triple on the stack:
+        - id_and_revision_info: A dictionary, containing
+          identifier and (possibly) timestamp information
+          for that object
+        - type_info: Information about the type of the
+          embedded object (can be None)
+        - the XML node that describes the embedded object
+
+        Objects whose id_and_revision_info contains the key 'defer_processing' are not
+        imported but appended to the 'do_not_process_list'. If 'detach_deferred' is set,
+        their XML nodes are copied into a document of their own.
+        """
+
+        while self.pending_stack:
+            (id_and_revision_info, type_info, elt) = self.pending_stack.pop()
+            if 'defer_processing' in id_and_revision_info:
+                if detach_deferred:
+                    doc = libxml2.newDoc("1.0")
+                    elt = elt.docCopyNode(doc, 1)
+                    doc.setRootElement(elt)
+                    elt.reconciliateNs(doc)
+                do_not_process_list.append((id_and_revision_info,type_info,elt))
+
+            else:
+                (elt_name, elt_dict) = self.import_element(elt, 0,
+                                                           type_info=type_info,
+                                                           inherited_id_and_rev_info=id_and_revision_info.copy())
+
+                yield {'id_and_rev_info': id_and_revision_info,
+                       'elt_name': elt_name,
+                       'dict_repr': elt_dict}
+
 
 class DingoImportHandling(object):
     def __init__(self, *args, **kwargs):
@@ -61,6 +613,149 @@ class DingoImportHandling(object):
         except:
             pass
 
+        # Existing revisions of identifiers resolved by 'prefetch_existing_revisions'
+
+        self._existing_revisions = {}
+
+        # The 'ImportPlan' collecting what would be written during a dry run (see 'start_dry_run')
+
+        self.plan = None
+
+    def start_dry_run(self, plan=None):
+        """
+        Start a dry run: until 'finish_dry_run' is called, 'create_iobject' does not write
+        anything but records in an 'ImportPlan' what it would write; 'xml_import'
+        records the parsed documents. Lookups in the database are still carried out
+        (read-only), so that the plan distinguishes existing from new objects.
+
+        Returns the plan.
+        """
+        self.plan = plan or ImportPlan(dingos_class_map=self._DCM)
+        return self.plan
+
+    def finish_dry_run(self):
+        """
+        Finish the dry run and return its plan.
+        """
+        plan = self.plan
+        self.plan = None
+        return plan
+
+
+    def prefetch_existing_revisions(self, id_triples):
+        """
+        Given a list of triples (identifier namespace uri, uid, timestamp) -- usually
+        those of all objects contained in a document that is to be imported --
+        determine with a handful of batched queries the latest revision of each identifier
+        and the revisions with the given timestamps. 'create_iobject' takes this information
+        from memory rather than querying for each object separately; it also keeps the information
+        up to date for the objects it writes.
+
+        Each call replaces the information gathered by the previous one, so only the
+        revisions for the document at hand are kept in memory, however many documents
+        are imported with the same handler. Since the information becomes stale once
+        the surrounding transaction is rolled back, it may also be discarded
+        with 'clear_existing_revisions'.
+        """
+
+        self._existing_revisions = {}
+
+        with profiling.stage('prefetch') as prefetch_stage:
+
+            id_triples = filter(lambda x: x[1], id_triples)
+
+            identifier_keys = set(map(lambda x: (x[0], x[1]), id_triples))
+            for key in identifier_keys:
+                self._existing_revisions.setdefault(key, {'latest': None,
+                                                          'revisions': {}})
+
+            # Resolve the identifiers
+
+            identifier_pks = {}
+            uids = sorted(set(map(lambda x: x[1], identifier_keys)))
+            namespace_uris = set(map(lambda x: x[0], identifier_keys))
+            for chunk in _chunks(uids):
+                for (pk, namespace_uri, uid) in self._DCM['Identifier'].objects.filter(
+                        namespace__uri__in=namespace_uris,
+                        uid__in=chunk).values_list('pk', 'namespace__uri', 'uid'):
+                    if (namespace_uri, uid) in identifier_keys:
+                        identifier_pks[pk] = (namespace_uri, uid)
+
+            # Determine the timestamps of the latest revisions
+
+            latest_timestamps = {}
+            for chunk in _chunks(identifier_pks.keys()):
+                for (identifier_pk, timestamp) in self._DCM['InfoObject'].objects.filter(
+                        identifier__in=chunk).order_by().values('identifier').annotate(
+                        latest_timestamp=Max('timestamp')).values_list('identifier', 'latest_timestamp'):
+                    latest_timestamps[identifier_pk] = timestamp
+
+            # Retrieve the latest revisions and the revisions with the given timestamps
+
+            wanted = set(map(lambda x: (x[0], x[1]), latest_timestamps.items()))
+            for (namespace_uri, uid, timestamp) in id_triples:
+                self._existing_revisions[(namespace_uri, uid)]['revisions'][timestamp] = None
+            pks_by_key = dict(map(lambda x: (x[1], x[0]), identifier_pks.items()))
+            for (namespace_uri, uid, timestamp) in id_triples:
+                identifier_pk = pks_by_key.get((namespace_uri, uid))
+                if identifier_pk:
+                    wanted.add((identifier_pk, timestamp))
+
+            timestamps = set(filter(None, map(lambda x: x[1], wanted)))
+            for chunk in _chunks(identifier_pks.keys()):
+                for iobject in self._DCM['InfoObject'].objects.filter(
+                        identifier__in=chunk,
+                        timestamp__in=timestamps).select_related('iobject_type', 'iobject_family'):
+                    if not (iobject.identifier_id, iobject.timestamp) in wanted:
+                        continue
+                    known = self._existing_revisions[identifier_pks[iobject.identifier_id]]
+                    known['revisions'][iobject.timestamp] = iobject
+                    if iobject.timestamp == latest_timestamps[iobject.identifier_id]:
+                        known['latest'] = iobject
+
+            prefetch_stage.rows = len(id_triples)
+
+    def prefetch_revisions_for_import_result(self, import_result, id_triple_extractor):
+        """
+        Entry point for importers (such as the MANTIS importers for STIX or OpenIOC) that
+        write the objects found by 'xml_import': call it with the result of 'xml_import'
+        before writing the objects, so that 'create_iobject' finds the existing revisions
+        of all of them in memory (see 'prefetch_existing_revisions').
+
+        'id_triple_extractor' is the function with which the importer determines the
+        identifier of an object: given the 'id_and_rev_info' of the top-level object or
+        of an embedded object, it returns the triple (identifier namespace uri, uid, timestamp)
+        that is later passed to 'create_iobject' (or None if the object has no identifier).
+
+        Rather than calling this function, importers may also pass 'id_triple_extractor'
+        to 'xml_import'.
+        """
+
+        id_triples = []
+        for found_object in chain([import_result], import_result.get('embedded_objects', [])):
+            id_triple = id_triple_extractor(found_object['id_and_rev_info'])
+            if id_triple:
+                id_triples.append(id_triple)
+        if id_triples:
+            self.prefetch_existing_revisions(id_triples)
+
+    def clear_existing_revisions(self):
+        """
+        Forget the information gathered by 'prefetch_existing_revisions'.
+        """
+        self._existing_revisions = {}
+
+    def note_existing_revision(self, identifier_ns_uri, uid, iobject):
+        """
+        Update the information gathered by 'prefetch_existing_revisions' (if any)
+        for the given identifier with a revision that has been written.
+        """
+        known = self._existing_revisions.get((identifier_ns_uri, uid))
+        if known is None:
+            return
+        known['revisions'][iobject.timestamp] = iobject
+        if known['latest'] is None or iobject.timestamp >= known['latest'].timestamp:
+            known['latest'] = iobject
 
     def get_latest_revision_of_iobject_by_uid(self, namespace_uri, uid):
         """
@@ -78,6 +773,37 @@ class DingoImportHandling(object):
 
 
 
+    def get_parent_revision(self, latest_existing_iobject, exists, created):
+        """
+        Determine the revision from which a newly created revision inherits its facts
+        if DINGOS_COPY_ON_WRITE_REVISIONS is set: this is the latest existing revision,
+        provided the new revision succeeds it, the latest revision is not a PLACEHOLDER
+        and the chain of inheriting revisions does not grow beyond DINGOS_COPY_ON_WRITE_MAX_CHAIN.
+        Otherwise, None is returned and a full revision is written.
+        """
+        if not (dingos.DINGOS_COPY_ON_WRITE_REVISIONS and created and exists == EXIST_ID_AND_OLDER_TIMESTAMP):
+            return None
+        if latest_existing_iobject.iobject_type.name == DINGOS_PLACEHOLDER_TYPE_NAME \
+                and latest_existing_iobject.iobject_family.name == DINGOS_IOBJECT_FAMILY_NAME:
+            return None
+        if len(latest_existing_iobject.get_revision_chain()) >= dingos.DINGOS_COPY_ON_WRITE_MAX_CHAIN:
+            return None
+        return latest_existing_iobject
+
+    def mark_iobject(self, iobject, markings):
+        """
+        Mark the information object with each of the given markings.
+        """
+        if self.plan is not None:
+            self.plan.markings += len(markings)
+            return
+        with profiling.stage('marking') as marking_stage:
+            for marking in markings:
+                Marking2X.objects.create(marked=iobject,
+                                         marking=marking)
+            marking_stage.rows = len(markings)
+
+    @profiling.profiled_iobject
     def create_iobject(self,
                        identifier_ns_uri=None,
                        uid=None,
@@ -93,6 +819,7 @@ class DingoImportHandling(object):
                        iobject_type_name=DINGOS_PLACEHOLDER_TYPE_NAME,
                        iobject_type_namespace_uri=DINGOS_NAMESPACE_URI,
                        iobject_type_revision_name="",
+                       skip_unchanged=None,
                        ):
         """
         Create an information object:
@@ -108,7 +835,10 @@ class DingoImportHandling(object):
         - config_hooks specifies hooking functions for customizing the
           way the DingoObjDict is transformed into facts -- please
           look at the sample import modules for STIX and OpenIOC to
-          get an idea of how this is used
+          get an idea of how this is used. The entry 'import_version' (a string
+          that importers change whenever their hooks change) is included in
+          the content digest, so that unchanged content is imported again after
+          the hooks have changed.
 
         - A list of markings can be provided. Essentially, a marking is simply
           another information object, to which the created information object
@@ -120,6 +850,14 @@ class DingoImportHandling(object):
           object is used by the importer to create objects for forward references found
           during the import.
 
+        - If 'skip_unchanged' is set (the default is taken from DINGOS_SKIP_UNCHANGED_REIMPORT)
+          and the latest revision of the identifier has the same content (see 'iobject_content_digest'),
+          no new revision is written; the latest revision is returned (after marking it with the given
+          markings) with the flag EXIST_ID_AND_SAME_CONTENT.
+
+        - During a dry run (see 'start_dry_run'), nothing is written; the information object
+          that would be written is returned unsaved.
+
         Call the function as
     
         (iobject(s),exists) = create_iobject(...)
@@ -147,7 +885,14 @@ class DingoImportHandling(object):
         if not config_hooks:
             config_hooks = {}
 
+        if skip_unchanged is None:
+            skip_unchanged = dingos.DINGOS_SKIP_UNCHANGED_REIMPORT
 
+        content_digest = iobject_content_digest(iobject_data,
+                                                iobject_family_name,
+                                                iobject_type_name,
+                                                iobject_type_namespace_uri,
+                                                salt=config_hooks.get('import_version'))
 
         latest_existing_iobject = None
         latest_existing_timestamp = None
@@ -159,7 +904,15 @@ class DingoImportHandling(object):
         # Check for existing objects of the given uid
 
 
-        latest_existing_iobject = self.get_latest_revision_of_iobject_by_uid(identifier_ns_uri, uid)
+        # If the existing revisions of the identifier have been determined beforehand
+        # (see 'prefetch_existing_revisions'), we use that information.
+
+        known_revisions = self._existing_revisions.get((identifier_ns_uri, uid))
+
+        if known_revisions is not None:
+            latest_existing_iobject = known_revisions['latest']
+        else:
+            latest_existing_iobject = self.get_latest_revision_of_iobject_by_uid(identifier_ns_uri, uid)
 
         if latest_existing_iobject:
             latest_existing_timestamp = latest_existing_iobject.timestamp
@@ -169,15 +922,26 @@ class DingoImportHandling(object):
                 iobject_type_namespace_uri==DINGOS_NAMESPACE_URI):
                 return (latest_existing_iobject, EXIST_ID_AND_EXACT_TIMESTAMP)
 
+            if skip_unchanged and latest_existing_iobject.content_digest == content_digest:
+                logger.debug("Content of %s:%s is unchanged; skipping import" % (identifier_ns_uri, uid))
+                if self.plan is not None:
+                    self.plan.add_object('unchanged', iobject_type_name)
+                if markings:
+                    self.mark_iobject(latest_existing_iobject, markings)
+                return (latest_existing_iobject, EXIST_ID_AND_SAME_CONTENT)
+
         if not timestamp:
             timestamp = create_timestamp
 
 
-        existing_iobjects = self._DCM['InfoObject'].objects.filter(identifier__uid=uid).filter(
-            identifier__namespace__uri=identifier_ns_uri).filter(timestamp=timestamp)
+        if known_revisions is not None and timestamp in known_revisions['revisions']:
+            existing_iobject = known_revisions['revisions'][timestamp]
+        else:
+            existing_iobjects = self._DCM['InfoObject'].objects.filter(identifier__uid=uid).filter(
+                identifier__namespace__uri=identifier_ns_uri).filter(timestamp=timestamp)
 
-        if existing_iobjects:
-            existing_iobject = existing_iobjects[0]
+            if existing_iobjects:
+                existing_iobject = existing_iobjects[0]
 
         if existing_iobject:
             if existing_iobject.iobject_type.name == DINGOS_PLACEHOLDER_TYPE_NAME \
@@ -224,13 +988,31 @@ class DingoImportHandling(object):
 
         logger.debug("EXISTS flag for %s:%s is: %s" % (identifier_ns_uri, uid, exists))
 
+        if self.plan is not None:
+            if exists == EXIST_ID_AND_EXACT_TIMESTAMP:
+                self.plan.add_object('exists', iobject_type_name)
+            elif not import_older_ts and exists == EXIST_ID_AND_NEWER_TIMESTAMP:
+                self.plan.add_object('skipped_older', iobject_type_name)
+            else:
+                iobject = self.plan.add_iobject(PLANNED_STATUS[exists],
+                                                identifier_ns_uri,
+                                                uid,
+                                                timestamp,
+                                                create_timestamp,
+                                                iobject_data,
+                                                config_hooks,
+                                                namespace_dict,
+                                                iobject_family_name,
+                                                iobject_family_revision_name,
+                                                iobject_type_name,
+                                                iobject_type_namespace_uri,
+                                                iobject_type_revision_name)
+                return (iobject, exists)
+
         if exists==EXIST_ID_AND_EXACT_TIMESTAMP:
             if markings:
-            # If markings were given, we create the marking.
-
-                 for marking in markings:
-                     Marking2X.objects.create(marked=existing_iobject,
-                         marking=marking)
+                # If markings were given, we create the marking.
+                self.mark_iobject(existing_iobject, markings)
 
             return (existing_iobject, exists)
         elif  (not import_older_ts and exists == EXIST_ID_AND_NEWER_TIMESTAMP):
@@ -248,39 +1030,48 @@ class DingoImportHandling(object):
                                                                  uid,
                                                                  '{:%d-%m-%Y:%H:%M:%S}.{:03d}'.format(timestamp, timestamp.microsecond // 1000)))
 
-            iobject, created = get_or_create_iobject(uid,
-                                                     identifier_ns_uri,
-                                                     iobject_type_name,
-                                                     iobject_type_namespace_uri,
-                                                     iobject_type_revision_name,
-                                                     iobject_family_name,
-                                                     iobject_family_revision_name,
-                                                     identifier_namespace_name=None,
-                                                     timestamp=timestamp,
-                                                     create_timestamp=create_timestamp,
-                                                     overwrite=overwrite,
-                                                     dingos_class_map=self._DCM,
-                                                    )
-
-            # After creating the object, we write the facts to the object.
-            # We overwrite in the special case that a PLACEHOLDER was found.
-
-            if created or overwrite:
-                iobject.from_dict(iobject_data, config_hooks=config_hooks, namespace_dict=namespace_dict)
-
-
-            # We adjust the back pointer in the identifier table to the latest version
-            # of the object
-            if not exists or exists == EXIST_ID_AND_OLDER_TIMESTAMP or exists == EXIST_PLACEHOLDER:
-                iobject.identifier.latest = iobject
-                iobject.identifier.save()
-
-            if markings:
-                # If markings were given, we create the marking.
-
-                for marking in markings:
-                    Marking2X.objects.create(marked=iobject,
-                                             marking=marking)
+            # The object is written within a savepoint (or a transaction of its own,
+            # if no transaction is running), so that an error while writing
+            # the object does not leave a partially written object behind.
+
+            with atomic_import():
+
+                iobject, created = get_or_create_iobject(uid,
+                                                         identifier_ns_uri,
+                                                         iobject_type_name,
+                                                         iobject_type_namespace_uri,
+                                                         iobject_type_revision_name,
+                                                         iobject_family_name,
+                                                         iobject_family_revision_name,
+                                                         identifier_namespace_name=None,
+                                                         timestamp=timestamp,
+                                                         create_timestamp=create_timestamp,
+                                                         overwrite=overwrite,
+                                                         content_digest=content_digest,
+                                                         dingos_class_map=self._DCM,
+                                                        )
+
+                # After creating the object, we write the facts to the object.
+                # We overwrite in the special case that a PLACEHOLDER was found.
+
+                if created or overwrite:
+                    iobject.from_dict(iobject_data, config_hooks=config_hooks, namespace_dict=namespace_dict,
+                                      parent_revision=self.get_parent_revision(latest_existing_iobject,
+                                                                               exists,
+                                                                               created and not overwrite))
+
+
+                # We adjust the back pointer in the identifier table to the latest version
+                # of the object
+                if not exists or exists == EXIST_ID_AND_OLDER_TIMESTAMP or exists == EXIST_PLACEHOLDER:
+                    iobject.identifier.latest = iobject
+                    iobject.identifier.save()
+
+                if markings:
+                    # If markings were given, we create the marking.
+                    self.mark_iobject(iobject, markings)
+
+            self.note_existing_revision(identifier_ns_uri, uid, iobject)
 
             return (iobject, exists)
 
@@ -323,7 +1114,8 @@ class DingoImportHandling(object):
                    id_and_revision_extractor=None,
                    extract_empty_embedded=False,
                    keep_attrs_in_created_reference=True,
-                   transformer=None):
+                   transformer=None,
+                   id_triple_extractor=None):
         """
         This is the generic XML import function for dingos. Its parameters
         are as follows:
@@ -368,343 +1160,150 @@ class DingoImportHandling(object):
           Please refer to existing import MANTIS modules such as for OpenIOC for
           examples of how to use this parameter.
 
+        - id_triple_extractor:
+          A function that, when given the 'id_and_rev_info' of the top-level object
+          or of an embedded object, returns the triple (identifier namespace uri, uid, timestamp)
+          with which the object will be written (or None). If given, the existing revisions
+          of all objects found in the XML are determined in a handful of batched queries
+          (see 'prefetch_revisions_for_import_result').
+
 
         Note: a good starting point for understanding how to use the python bindings
         of libxml2 is http://mikekneller.com/kb/python/libxml2python/part1.
         """
 
-        generated_id_count = {}
-
-
-
         # Fill defaults
         if not ns_mapping:
             nas_mapping = {}
-        if not transformer:
-            transformer = lambda x, y: (x, y)
 
-        # We use the _import_pending_stack to hold extracted embedded objects
-        # that still need to be processed
-        _import_pending_stack = deque()
+        start_time = time.time()
 
         # We collect the read embedded objects in the following list
         embedded_objects = deque()
 
-        def xml_import_(element, depth=0, type_info=None, inherited_id_and_rev_info=None):
-            """
-            Recursive import function
-            """
-
-            if not inherited_id_and_rev_info:
-                inherited_id_and_rev_info = main_id_and_rev_info.copy()
-
-            fresh_inherited_id_and_rev_info = inherited_id_and_rev_info.copy()
-
-
-            if element.name == 'comment':
-                return None
-
-
-            #try:
-            #    namespace = element.ns()
-            #    ns_mapping[namespace.name]=namespace.content
-            #except:
-            #    pass
-
-            result = DingoObjDict()
-
-            # Add properties to result dictionary for this element
-
-            if element.properties:
-                for prop in element.properties:
-
-                    if not prop:
-                        break
-                    if prop.type == 'attribute':
-                        try:
-                            result["@%s:%s" % (prop.ns().name, prop.name)] = prop.content
-                        except:
-                            result["@%s" % prop.name] = prop.content
-
+        importer = XMLElementImporter(ns_mapping=ns_mapping,
+                                      embedded_predicate=embedded_predicate,
+                                      id_and_revision_extractor=id_and_revision_extractor,
+                                      extract_empty_embedded=extract_empty_embedded,
+                                      keep_attrs_in_created_reference=keep_attrs_in_created_reference,
+                                      transformer=transformer)
 
+        with profiling.stage('xml_parse'):
 
-            # see if there is a namespace
+            if xml_content:
 
-            try:
-                ns = element.ns().name
-                result["@@ns"] = ns
-            except:
-                pass
-
-            # prepare list for keeping resulting dictionaries of child elements
-
-            element_dicts = []
-
-            # While looking at the child-elements, we have to keep track
-            # of certain data.
-
-            # Firstly: keep track whether we have seen text content that is not whitespace --
-            # if that happens, we know that this element contains mixed
-            # content and we will back off and just dump the element contents
-            # as is as value into the dictionary.
-
-            non_ws_content = False
-
-            # Secondly: If the element contains cdata stuff, we will see
-            # that one (well, the only) child has type cdata. So if
-            # we find such a child, we set the flag
+                if isinstance(xml_content,libxml2.xmlNode):
+                    root = xml_content
+                else:
+                    doc = libxml2.readDoc(xml_content, None, None, XML_PARSE_OPTIONS)
+                    root = doc.getRootElement()
 
-            cdata_content = False
+            else:
+                doc = libxml2.readFile(xml_fname, None, XML_PARSE_OPTIONS | libxml2.XML_PARSE_RECOVER)
+                root = doc.getRootElement()
+                with open(xml_fname, 'r') as content_file:
+                    xml_content = content_file.read()
 
-            # Thirdly: we keep track of how many different child-element-names
-            # we have seen. 
-            #
-            # - If we find that we have exactly one distinct name,
-            #   we will generate a dictionary of form
-            #             {<Element_Name> : [ <list of child elemen dictionaries> ]}
-            # - If we find that we have as many distinct names as we
-            #   child elements, we create a dictionary mapping each child element
-            #   name to its dictionary representation
-            # - If we find that we have less child element names than
-            #   we have children, we know that at least one name
-            #   occured more than once. Our dictionary representation cannot
-            #   deal with that, and we back off and dump the contents as they
-            #   are marked as 'xml' content with the '@@type' attribute.
+        # Extract namespace information (if any)
+        try:
+            ns_def = root.nsDefs()
+            while ns_def:
+                ns_mapping[ns_def.name] = ns_def.content
+                ns_def = ns_def.next
+        except:
+            pass
 
-            name_set = {}
+        # Extract ID and timestamp for root element
 
-            previous_seen_child = None
-            double_occurrance = False
+        main_id_and_rev_info = id_and_revision_extractor(root)
+        importer.main_id_and_rev_info = main_id_and_rev_info
 
-            element_child_count = 0
-            child = element.children
-            while child is not None:
+        # Call the internal recursive function. This returns
+        # - name of the top-level element
+        # - DingoObjDict resulting from import
+        # As side effect, it pushes the XML nodes of
+        # found embedded objects onto the pending stack
 
-                #if child_name=='comment':
-                #    pass
-                if child.name == 'text':
-                    # If we have non-whitespace content in one of the children,
-                    # we set the non_ws_content flag
-                    content = child.content.strip()
-                    if content != "":
-                        non_ws_content = True
+        with profiling.stage('xml_to_dict') as xml_to_dict_stage:
 
-                elif child.type == 'cdata':
-                    logger.debug("!!!!FOUND CDATA")
-                    # If one of the children (actually, it should be the only child)
-                    # has type cdata, we know that the parent element contains cdata
-                    # and set the cdata_content flag accordingly
-                    cdata_content = True
-                else:
-                    # we have found an element, so we recurse into it.
-                    element_child_count += 1
-                    if previous_seen_child and (child.name in name_set) and (not child.name == previous_seen_child):
-                        double_occurrance = True
-
-                    name_set[child.name] = None
-
-                    if embedded_predicate:
-                        embedded_ns = embedded_predicate(element, child, ns_mapping)
-                        logger.debug("Embedded ns is %s" % embedded_ns)
-
-                        if embedded_ns:
-                            inherited_id_and_rev_info = fresh_inherited_id_and_rev_info.copy()
-                            # There is an embedded object. We therefore
-                            # replace the contents of the element with an element
-                            # containing an idref (and, since we might need them,
-                            # all attributes of the embedded element)
-
-                            if type(embedded_ns) == type({}):
-                                # If necessary, the embedded_predicate can return more information
-                                # than namespace information, namely we can can hand down
-                                # id and revision info that has been derived wenn the embedding
-                                # was detected. For backward compatibility,
-                                # we further allow returning of a string; if, however,
-                                # a dictionary is returned, there is id_and_revision_info.
-                                id_and_revision_info = embedded_ns.get('id_and_revision_info',
-                                                                       id_and_revision_extractor(child))
-                                embedded_ns = embedded_ns.get('embedded_ns',None)
-                            else:
-                                id_and_revision_info = id_and_revision_extractor(child)
-
-
-                            # See whether stuff needs to be inherited
-                            if not 'id' in id_and_revision_info or not id_and_revision_info['id']:
-                                if 'id' in inherited_id_and_rev_info:
-                                    parent_id = inherited_id_and_rev_info['id']
-                                    if parent_id in generated_id_count:
-                                        gen_counter = generated_id_count[parent_id]
-                                        gen_counter +=1
-                                    else:
-                                        gen_counter = 0
-                                    generated_id_count[parent_id] = gen_counter
-                                    (parent_namespace, parent_uid) = parent_id.split(':')
-                                    generated_id = "%s:emb%s-in-%s" % (parent_namespace,gen_counter,parent_uid)
-                                    logger.info("Found embedded %s without id and generated id %s" % (element.name,generated_id))
-                                    id_and_revision_info['id'] = generated_id
-                                    id_and_revision_info['id_inherited'] = True
-                                else:
-                                    logger.error("Attempt to import object (element name %s) without id -- object is ignored" % elt_name)
-
-                                    #cybox_id = gen_cybox_id(iobject_type_name)
-
-                            if not id_and_revision_info.get('timestamp', None):
-                                if inherited_id_and_rev_info and 'timestamp' in inherited_id_and_rev_info:
-                                    id_and_revision_info['timestamp'] = inherited_id_and_rev_info['timestamp']
-                                    id_and_revision_info['ts_inherited'] = True
-                            else:
-                                inherited_id_and_rev_info['timestamp'] = id_and_revision_info['timestamp']
-
-
-                            if 'id' in id_and_revision_info:
-                                # If the identifier has no namespace info (this may occur, e.g. for
-                                # embedded OpenIOC in STIX, we take the namespace inherited from  the
-                                # embedding object
-                                if (not ':' in id_and_revision_info['id']
-                                    and inherited_id_and_rev_info['id']
-                                    and ':' in inherited_id_and_rev_info['id']):
-                                    id_and_revision_info['id'] = "%s:%s" % (inherited_id_and_rev_info['id'].split(':')[0],
-                                                                            id_and_revision_info['id'])
-                                    id_and_revision_info['ns_inherited'] = True
-
-                                inherited_id_and_rev_info['id'] = id_and_revision_info['id']
-
-
-
-                            if keep_attrs_in_created_reference:
-                                reference_dict = extract_attributes(child, prefix_key_char='@',
-                                                                    dict_constructor=DingoObjDict)
-                            else:
-                                reference_dict = DingoObjDict()
-
-                            reference_dict['@idref'] = id_and_revision_info['id']
-
-                            reference_dict['@@timestamp'] = id_and_revision_info['timestamp']
-
-                            try:
-                                reference_dict['@@ns'] = child.ns().name
-                            except:
-                                reference_dict['@@ns'] = None
-                            if embedded_ns == True:
-                                embedded_ns = None
-                            logger.debug("Setting embedded type info to %s" % embedded_ns)
-                            reference_dict['@@embedded_type_info'] = embedded_ns
-
-                            element_dicts.append((child.name, reference_dict))
-                            if (child.children or child.content) \
-                                or extract_empty_embedded \
-                                or 'extract_empty_embedded' in id_and_revision_info:
-
-                                id_and_revision_info['inherited'] = fresh_inherited_id_and_rev_info.copy()
-                                if 'inherited' in id_and_revision_info['inherited']:
-                                    for key in id_and_revision_info['inherited']['inherited']:
-                                        if not key in id_and_revision_info['inherited']:
-                                            id_and_revision_info['inherited'][key] = id_and_revision_info['inherited']['inherited'][key]
-                                    del(id_and_revision_info['inherited']['inherited'])
-
-                                logger.debug(
-                                    "Adding XML subtree starting with element %s and type info %s to pending stack." % (
-                                    id_and_revision_info, embedded_ns))
-                                _import_pending_stack.append((id_and_revision_info, embedded_ns, child))
-                            else:
-                                # For example, in cybox 1.0, the following occurs::
-                                #         <EmailMessageObj:File xsi:type="FileObj:FileObjectType" object_reference="cybox:object-3cf6a958-5c3f-11e2-a06c-0050569761d3"/>
-                                # This is only a reference and may not be confused with the definition of the object,
-                                # which occurs someplace else -- otherwise, the (almost) empty reference is created as object
-                                # and may overwrite the object resulting from the real definition.
-                                logger.info(
-                                    "Not adding element %s with type info %s to pending stack because element is empty." % (
-                                    id_and_revision_info, embedded_ns))
-                        else:
-                            child_import = xml_import_(child, depth + 1, inherited_id_and_rev_info=inherited_id_and_rev_info)
-                            if child_import:
-                                element_dicts.append(child_import)
-                    else:
-                        child_import = xml_import_(child, depth + 1, inherited_id_and_rev_info=inherited_id_and_rev_info)
-                        if child_import:
-                            element_dicts.append(child_import)
-
-                child = child.next
-                # now, we decide what to do with this node
-
-            distinct_child_count = len(name_set.keys())
-
-            if distinct_child_count == 0:
-                # No child elements were detected, so we dump the content into
-                # the value
-                result['_value'] = element.content
-                if cdata_content:
-                    # If this is a cdata element, we mark it as such
-                    result['@@content_type'] = 'cdata'
-            elif non_ws_content == True:
-                # We have mixed content, so we dump it
-                sub_child = element.children
-                serialization = ''
-                while sub_child:
-                    serialization += sub_child.serialize()
-                    sub_child = sub_child.next
-                result['_value'] = serialization.strip()
-                #result['_value']=element.serialize()
-                result['@@content_type'] = 'mixed'
-            elif double_occurrance: # distinct_child_count >1 and (distinct_child_count) < element_child_count:
-                # We have a structure our dictionary representation cannot
-                # deal with -- so we dump it
-
-                logger.warning("Cannot deal with XML structure of %s (children %s, count %s): will dump to value" % (
-                element.name, name_set.keys(), element_child_count))
-                sub_child = element.children
-                serialization = ''
-                while sub_child:
-                    serialization += sub_child.serialize()
-                    sub_child = sub_child.next
-                result['_value'] = serialization.strip()
-                #result['_value']=element.serialize()
-                result['@@content_type'] = 'xml'
+            (main_elt_name, main_elt_dict) = importer.import_element(root, 0)
 
-            else:
+            # We now go through the pending stack (see 'XMLElementImporter.process_pending').
 
-                previously_written_name = None
-                for (name, element_dict) in element_dicts:
+            do_not_process_list = []
 
-                    if not previously_written_name or name != previously_written_name:
-                        result[name] = element_dict
-                        previously_written_name = name
-                    else: # if name == previously_written_name:
-                        if type(result[name]) == type([]):
-                            result[name].append(element_dict)
-                        else:
-                            result[name] = [result[name], element_dict]
-            if type_info:
-                result['@@embedded_type_info'] = type_info
+            for embedded_object in importer.process_pending(do_not_process_list):
+                embedded_objects.append(embedded_object)
 
-            element_ns = None
-            try:
-                element_ns = element.ns().name
-            except:
-                pass
+            xml_to_dict_stage.rows = len(embedded_objects) + 1
 
-            return transformer(element.name, result)
+        if self.plan is not None:
+            self.plan.add_document(time.time() - start_time, len(embedded_objects))
 
+        result= {'id_and_rev_info': main_id_and_rev_info,
+                'elt_name': main_elt_name,
+                'dict_repr': main_elt_dict,
+                'embedded_objects': embedded_objects,
+                'unprocessed' : do_not_process_list,
+                'file_content': xml_content}
 
-        if xml_content:
+        if id_triple_extractor:
+            self.prefetch_revisions_for_import_result(result, id_triple_extractor)
 
-            if isinstance(xml_content,libxml2.xmlNode):
-                root = xml_content
-            else:
-                doc = libxml2.parseDoc(xml_content)
-                root = doc.getRootElement()
+        #pp.pprint(result)
 
-        else:
-            doc = libxml2.recoverFile(xml_fname)
-            root = doc.getRootElement()
-            with open(xml_fname, 'r') as content_file:
-                xml_content = content_file.read()
+        return result
 
+    def xml_import_stream(self,
+                          xml_fname,
+                          ns_mapping=None,
+                          embedded_predicate=None,
+                          id_and_revision_extractor=None,
+                          extract_empty_embedded=False,
+                          keep_attrs_in_created_reference=True,
+                          transformer=None):
+        """
+        Streaming variant of 'xml_import' for very large files: the file is read
+        with the libxml2 text reader, and the function is a generator that yields the
+        embedded objects (as dictionaries with keys 'id_and_rev_info', 'elt_name' and
+        'dict_repr', just as found in the 'embedded_objects' of the result
+        of 'xml_import') as soon as they have been read. Only the subtree of an embedded
+        object is read into memory as a whole (when the 'embedded_predicate' fires);
+        all other elements are imported node by node, and once an embedded object has been
+        yielded, its subtree is freed. Memory usage is thus bounded by the largest embedded
+        object rather than by the size of the file.
+
+        The last item yielded is the top-level object with the additional key 'unprocessed'
+        (see 'xml_import'); the XML nodes of unprocessed embedded objects are copied
+        into documents of their own, so they remain valid after the file has been read.
+        The file content is not kept in memory, so there is no 'file_content' key.
+        Since 'create_iobject' writes each object within a transaction (or savepoint)
+        of its own, consumers may write the objects as they come in: unless the caller
+        wraps the import in a transaction (the import commands don't when streaming),
+        each object is committed as soon as it has been written.
+
+        The parameters have the same meaning as for 'xml_import'. Note, however, that
+        the 'embedded_predicate' is called as soon as the start tag of the child has been read:
+        it may look at the name, namespace and attributes of the child and of its ancestors,
+        but not at the descendants of either. Elements with mixed content (or other content
+        that has to be dumped as value) are read once more from the file for serialization.
+        """
 
+        start_time = time.time()
 
+        if ns_mapping is None:
+            ns_mapping = {}
 
+        importer = XMLElementImporter(ns_mapping=ns_mapping,
+                                      embedded_predicate=embedded_predicate,
+                                      id_and_revision_extractor=id_and_revision_extractor,
+                                      extract_empty_embedded=extract_empty_embedded,
+                                      keep_attrs_in_created_reference=keep_attrs_in_created_reference,
+                                      transformer=transformer)
 
+        reader = read_to_root_element(xml_fname)
 
+        root = reader.CurrentNode()
 
         # Extract namespace information (if any)
         try:
@@ -715,55 +1314,83 @@ class DingoImportHandling(object):
         except:
             pass
 
-        # Extract ID and timestamp for root element
-
         main_id_and_rev_info = id_and_revision_extractor(root)
+        importer.main_id_and_rev_info = main_id_and_rev_info
 
-        # Call the internal recursive function. This returns
-        # - name of the top-level element
-        # - DingoObjDict resulting from import
-        # As side effect, it pushes the XML nodes of
-        # found embedded objects onto the pending stack
+        def start_streamed(state, path):
+            # The children of the element are serialized from the file only if required.
+            state['children_serializer'] = lambda: serialize_children_at(xml_fname, path)
 
-        (main_elt_name, main_elt_dict) = xml_import_(root, 0)
+        state = importer.start_element(root, 0, streamed=True)
+        start_streamed(state, [])
 
-        # We now go through the pending stack.
-        # For each found embedded object, xml_import_ pushes
-        # the following triple on the stack:
-        # - id_and_revision_info: A dictionary, containing
-        #   identifier and (possibly) timestamp information
-        #   for that object
-        # - type_info: Information about the type of the
-        #   embedded object (can be None)
-        # - the XML node that describes the embedded object
+        # For each element that is being read, the stack contains its state, its path
+        # (see 'read_to_element') and the number of its child elements read so far.
 
-        do_not_process_list = []
+        stack = [[state, [], 0]]
 
-        while _import_pending_stack:
-            (id_and_revision_info, type_info, elt) = _import_pending_stack.pop()
-            if 'defer_processing' in id_and_revision_info:
-                do_not_process_list.append((id_and_revision_info,type_info,elt))
+        do_not_process_list = []
+        embedded_object_count = 0
 
+        if reader.IsEmptyElement():
+            state['streamed'] = False
+            main_import = importer.finish_element(state)
+            stack.pop()
+            ret = 1
+        else:
+            ret = reader.Read()
+
+        while ret == 1 and stack:
+            (state, path, child_element_count) = stack[-1]
+
+            if reader.NodeType() == XML_READER_TYPE_END_ELEMENT:
+                stack.pop()
+                element_import = importer.finish_element(state)
+                if not stack:
+                    main_import = element_import
+                elif element_import:
+                    stack[-1][0]['element_dicts'].append(element_import)
+                ret = reader.Read()
+                continue
+
+            child_path = path + [child_element_count]
+            is_element = reader.NodeType() == XML_READER_TYPE_ELEMENT
+            if is_element:
+                stack[-1][2] += 1
+
+            child_state = importer.start_child(state, reader.CurrentNode(), expand=reader.Expand)
+
+            if child_state:
+                if is_element and not reader.IsEmptyElement():
+                    start_streamed(child_state, child_path)
+                    stack.append([child_state, child_path, 0])
+                else:
+                    # The node is complete already
+                    child_state['streamed'] = False
+                    child_import = importer.finish_element(child_state)
+                    if child_import:
+                        state['element_dicts'].append(child_import)
+                ret = reader.Read()
             else:
-                (elt_name, elt_dict) = xml_import_(elt, 0,
-                                                   type_info=type_info,
-                                                   inherited_id_and_rev_info=id_and_revision_info.copy())
+                # The child was an embedded object (or a node without contents of its own).
+                # Moving on with 'Next' skips its subtree, which can then be freed by the reader.
+                for embedded_object in importer.process_pending(do_not_process_list, detach_deferred=True):
+                    embedded_object_count += 1
+                    yield embedded_object
+                ret = reader.Next()
 
-                embedded_objects.append({'id_and_rev_info': id_and_revision_info,
-                                             'elt_name': elt_name,
-                                             'dict_repr': elt_dict})
-
-        result= {'id_and_rev_info': main_id_and_rev_info,
-                'elt_name': main_elt_name,
-                'dict_repr': main_elt_dict,
-                'embedded_objects': embedded_objects,
-                'unprocessed' : do_not_process_list,
-                'file_content': xml_content}
+        if ret == -1 or stack:
+            raise StandardError("Error while parsing %s" % xml_fname)
 
+        (main_elt_name, main_elt_dict) = main_import
 
-        #pp.pprint(result)
+        if self.plan is not None:
+            self.plan.add_document(time.time() - start_time, embedded_object_count)
 
-        return result
+        yield {'id_and_rev_info': main_id_and_rev_info,
+               'elt_name': main_elt_name,
+               'dict_repr': main_elt_dict,
+               'unprocessed': do_not_process_list}
 
 
 
@@ -22,25 +22,53 @@ import os
 import re
 import json
 import glob
+import sys
+import time
 import traceback
+import multiprocessing
+import random
+from contextlib import contextmanager
 from optparse import make_option
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, IntegrityError, OperationalError
 from django.utils import timezone
 
 from dingos.core.decorators import print_arguments
+from dingos.core import profiling
 
 from dingos.core.datastructures import dict2DingoObjDict
 from dingos import *
 from dingos.import_handling import DingoImportHandling
 
-from dingos.models import InfoObject
+from dingos.models import InfoObject, ImportJob, ImportCheckpoint, clear_schema_caches, atomic_import
 
 DingoImporter = DingoImportHandling()
 
 logger = logging.getLogger(__name__)
 
 
+class DryRunRollback(Exception):
+    """
+    Raised to roll back the transaction in which a file is imported during a dry run.
+    """
+    pass
+
+
+def file_digest(filename, chunk_size=1024*1024):
+    """
+    Return the SHA256 digest of the content of the given file (or None, if the file cannot be read).
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(filename, 'rb') as content_file:
+            for chunk in iter(lambda: content_file.read(chunk_size), ''):
+                digest.update(chunk)
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
+
+
 class Generic_XML_Import:
     """
     This class provides the xml_import function for
@@ -54,7 +82,20 @@ class Generic_XML_Import:
     at the MANTIS importer for IODEF for an example
     of an importer with only moderate amounts of
     configuration.
+
+    Importers that keep their own instance of 'DingoImportHandling' (rather than
+    using the module's 'DingoImporter') must make it available as 'import_handler',
+    since the import commands use it, e.g., for dry runs.
     """
+
+    import_handler = DingoImporter
+
+    # Version of the fact-term handlers and datatype extractor of the importer:
+    # change it whenever these change, since content that has been imported
+    # before is otherwise skipped as unchanged (see 'iobject_content_digest').
+
+    import_version = None
+
     def __init__(self, *args, **kwargs):
 
         # We keep track of toplevel attributes
@@ -124,6 +165,7 @@ class Generic_XML_Import:
                    markings=None,
                    identifier_ns_uri = None,
                    uid = None,
+                   stream = False,
                    **kargs):
 
         """
@@ -135,6 +177,9 @@ class Generic_XML_Import:
         - identifier_ns_uri: Namespace of the identifiers, if identifiers are to be created
         - uid (optional): unique identifier -- if none is given, the SHA256 of the file
           contents are used as identifier.
+        - stream (optional): read the file with 'xml_import_stream' rather than parsing
+          it into memory as a whole. Importers that recognize embedded objects write
+          them as they are yielded.
          """
 
 
@@ -149,11 +194,22 @@ class Generic_XML_Import:
         self.__init__()
 
         # Carry out generic XML import
-        import_result = DingoImporter.xml_import(xml_fname=filepath,
-                                                 xml_content=xml_content,
-                                                 ns_mapping=self.namespace_dict,
-                                                 embedded_predicate=self.cybox_embedding_pred,
-                                                 id_and_revision_extractor=self.id_and_revision_extractor)
+        if stream and filepath:
+            # The generic import does not recognize embedded objects, so the only object
+            # yielded is the top-level object.
+            for import_result in self.import_handler.xml_import_stream(filepath,
+                                                                       ns_mapping=self.namespace_dict,
+                                                                       embedded_predicate=self.cybox_embedding_pred,
+                                                                       id_and_revision_extractor=self.id_and_revision_extractor):
+                pass
+            content_digest = file_digest(filepath)
+        else:
+            import_result = self.import_handler.xml_import(xml_fname=filepath,
+                                                           xml_content=xml_content,
+                                                           ns_mapping=self.namespace_dict,
+                                                           embedded_predicate=self.cybox_embedding_pred,
+                                                           id_and_revision_extractor=self.id_and_revision_extractor)
+            content_digest = hashlib.sha256(import_result['file_content']).hexdigest()
 
 
         # Extract data required for creating info object
@@ -161,12 +217,11 @@ class Generic_XML_Import:
         id_and_rev_info = import_result['id_and_rev_info']
         elt_name = import_result['elt_name']
         elt_dict = import_result['dict_repr']
-        file_content = import_result['file_content']
 
         if uid:
             id_and_rev_info['id'] = uid
         else:
-            id_and_rev_info['id'] = hashlib.sha256(file_content).hexdigest()
+            id_and_rev_info['id'] = content_digest
 
         id_and_rev_info['timestamp'] = timezone.now()
 
@@ -180,23 +235,34 @@ class Generic_XML_Import:
 
         # Create info object
 
-        DingoImporter.create_iobject(iobject_family_name=iobject_family_name,
-                                     iobject_family_revision_name=iobject_family_revision_name,
-                                     iobject_type_name=iobject_type_name,
-                                     iobject_type_namespace_uri=iobject_type_namespace_uri,
-                                     iobject_type_revision_name='',
-                                     iobject_data=elt_dict,
-                                     uid=id_and_rev_info['id'],
-                                     identifier_ns_uri=identifier_ns_uri,
-                                     timestamp=id_and_rev_info['timestamp'],
-                                     create_timestamp=create_timestamp,
-                                     markings=markings,
-                                     config_hooks={'special_ft_handler': self.ft_handler_list(),
-                                                   'datatype_extractor': self.datatype_extractor},
-                                     namespace_dict=self.namespace_dict,
+        self.import_handler.create_iobject(iobject_family_name=iobject_family_name,
+                                           iobject_family_revision_name=iobject_family_revision_name,
+                                           iobject_type_name=iobject_type_name,
+                                           iobject_type_namespace_uri=iobject_type_namespace_uri,
+                                           iobject_type_revision_name='',
+                                           iobject_data=elt_dict,
+                                           uid=id_and_rev_info['id'],
+                                           identifier_ns_uri=identifier_ns_uri,
+                                           timestamp=id_and_rev_info['timestamp'],
+                                           create_timestamp=create_timestamp,
+                                           markings=markings,
+                                           config_hooks={'special_ft_handler': self.ft_handler_list(),
+                                                         'datatype_extractor': self.datatype_extractor,
+                                                         'import_version': self.import_version},
+                                           namespace_dict=self.namespace_dict,
         )
 
 
+@contextmanager
+def per_object_transactions():
+    """
+    Used by 'DingoImportCommand.import_file' instead of 'atomic_import' for streamed
+    imports: no transaction is opened, so each object is written in a transaction
+    of its own by 'create_iobject'.
+    """
+    yield
+
+
 class DingoImportCommand(BaseCommand):
     """
     This class serves as basis for import commands that are specified
@@ -240,6 +306,19 @@ class DingoImportCommand(BaseCommand):
       that stuff from a true commandline).
     - `--id-namespace-uri` stores URI for namespace to be used for qualifying
          the identifiers of the information objects.
+    - `--stats` and `--stats-json` turn on the import profiler (see 'dingos.core.profiling')
+         and print its statistics or write its report to the given JSON file.
+    - `--dry-run` parses the files and resolves the contents against the existing
+         data without writing anything (see 'DingoImportHandling.start_dry_run'); the
+         planned inserts are printed (and written to the file given with `--plan-json`).
+         A dry run is carried out in a single process; should the importer write anything
+         nevertheless, the transaction of the file is rolled back.
+    - `--resume` skips files with the same content as files that have been imported
+         successfully with the command before: the outcome of the import of each file
+         is recorded in a journal (see 'ImportCheckpoint').
+    - `--stream` reads the files with the libxml2 text reader rather than parsing them
+         into memory as a whole (see 'DingoImportHandling.xml_import_stream'), which keeps
+         the memory usage for very large files bounded by the largest embedded object.
     """
     args = 'xml-file xml-file ... (you can use wildcards)'
     help = 'Imports xml files of specified paths into DINGO with generic import'
@@ -273,11 +352,69 @@ class DingoImportCommand(BaseCommand):
                     default=None,
                     dest='destination_path',
                     help='Destination path, to which processed files are to be moved. If unset, the files are not moved.'),
+        make_option('-w','--workers',
+                    action='store',
+                    type='int',
+                    default=1,
+                    dest='workers',
+                    help='Number of worker processes among which the files are distributed (default: 1).'),
+        make_option('-q','--queue',
+                    action='store_true',
+                    default=False,
+                    dest='queue',
+                    help='Queue the files for import by the dingos_import_worker command rather than importing them.'),
+        make_option('--stats',
+                    action='store_true',
+                    default=False,
+                    dest='stats',
+                    help='Print the time, number of queries and number of rows spent on each stage of the import.'),
+        make_option('--stats-json',
+                    action='store',
+                    default=None,
+                    dest='stats_json',
+                    help='Write the statistics per stage, file and information object to the given JSON file.'),
+        make_option('--dry-run',
+                    action='store_true',
+                    default=False,
+                    dest='dry_run',
+                    help='Parse the files and report what the import would write without writing anything.'),
+        make_option('--plan-json',
+                    action='store',
+                    default=None,
+                    dest='plan_json',
+                    help='With --dry-run: write the report of what the import would write to the given JSON file.'),
+        make_option('--resume',
+                    action='store_true',
+                    default=False,
+                    dest='resume',
+                    help='Skip files that have been imported successfully with this command before (see ImportCheckpoint).'),
+        make_option('--stream',
+                    action='store_true',
+                    default=False,
+                    dest='stream',
+                    help='Read the files piece by piece rather than parsing them into memory as a whole (for very large files).'),
     )
 
+    # Number of times the import of a file is retried if it runs into an integrity error
+    # (which may happen if several processes create the same objects at the same time)
+    # or an operational error caused by concurrent transactions (a deadlock detected
+    # by PostgreSQL or a locked database with SQLite, which allows a single writer only).
+    # Before each retry, we wait for a random time of up to IMPORT_RETRY_DELAY seconds
+    # times the number of the attempt.
+
+    IMPORT_RETRIES = 5
+
+    IMPORT_RETRY_DELAY = 0.2
+
 
     Importer = Generic_XML_Import()
 
+    def get_import_handler(self):
+        """
+        Return the 'DingoImportHandling' instance used by the command's importer.
+        """
+        return getattr(self.Importer, 'import_handler', DingoImporter)
+
 
     def __init__(self, *args, **kwargs):
         self.logger = logger
@@ -349,64 +486,356 @@ class DingoImportCommand(BaseCommand):
             marking_dict = dict2DingoObjDict(json.loads(marking_json))
 
             # Create info object for marking
-            marking = DingoImporter.create_marking_iobject(metadata_dict=marking_dict)
+            marking = self.get_import_handler().create_marking_iobject(metadata_dict=marking_dict)
 
             return marking
 
         return None
 
     def handle(self, *args, **options):
-        # The function create_import_marking inherited from
-        # DingoImport command is able to create a dictionary
-        # structure for a marking with object resulting
-        # from the import command will be marked.
 
-        marking = self.create_import_marking(args,options)
+        import_handler = self.get_import_handler()
 
-        if marking:
-            markings = [marking]
-        else:
-            markings = []
+        plan = None
+        if options.get('dry_run'):
+            # Nothing is written: what would be written is collected in a plan (see 'ImportPlan')
+            plan = import_handler.start_dry_run()
 
-        if options.get('marking_ids'):
-            for marking_id in options.get('marking_ids'):
-                try:
-                    ns,uid = marking_id.split(':')
-                    marking = InfoObject.objects.exclude(latest_of=None).get(identifier__uid=uid,identifier__namespace__uri=ns)
-                    logger.info("Found marking: %s " % marking)
-                    markings.append(marking)
-                except:
-                    logger.warning('Could not find marking object %s in system' % marking_id)
+        try:
+            # The function create_import_marking inherited from
+            # DingoImport command is able to create a dictionary
+            # structure for a marking with object resulting
+            # from the import command will be marked.
 
+            marking = self.create_import_marking(args,options)
 
+            if marking:
+                markings = [marking]
+            else:
+                markings = []
 
-        #if len(args) > 1 and options['identifier']:
-        #    raise CommandError('Option --identifier not supported for more than one file per import.')
+            if options.get('marking_ids'):
+                for marking_id in options.get('marking_ids'):
+                    try:
+                        ns,uid = marking_id.split(':')
+                        marking = InfoObject.objects.exclude(latest_of=None).get(identifier__uid=uid,identifier__namespace__uri=ns)
+                        logger.info("Found marking: %s " % marking)
+                        markings.append(marking)
+                    except:
+                        logger.warning('Could not find marking object %s in system' % marking_id)
 
-        if len(args) == 0:
-            logger.warning("No files for import specified!")
-        else:
-            for arg in args:
-                logger.info("Starting processing")
 
+
+            #if len(args) > 1 and options['identifier']:
+            #    raise CommandError('Option --identifier not supported for more than one file per import.')
+
+            if len(args) == 0:
+                logger.warning("No files for import specified!")
+                return
+
+            filenames = []
+            for arg in args:
                 if len(glob.glob(arg)) == 0:
                     logger.warning("No file(s) %s for import found!" % arg)
+                filenames.extend(glob.glob(arg))
 
-                for filename in glob.glob(arg):
+            # The digests of the files computed when resuming are not computed again on import.
+            digests = {}
+            if options.get('resume'):
+                (filenames, digests) = self.skip_completed_files(filenames)
 
-                    logger.info("Starting import of %s" % filename)
-                    try:
-                        self.Importer.xml_import(filepath = filename,
-                           markings = markings,
-                           **options)
-                    except:
-                        logger.error("Something went wrong when importing %s. Traceback: %s" % (filename,traceback.format_exc()))
+            if options.pop('queue', False) and not plan:
+                self.queue_files(filenames, markings, options)
+                return
+
+            logger.info("Starting processing")
+
+            start_time = time.time()
+
+            workers = options.get('workers') or 1
+
+            profiler = None
+            if options.get('stats') or options.get('stats_json'):
+                profiler = profiling.enable()
+
+            try:
+                # The plan of a dry run is collected in this process.
+                if workers > 1 and len(filenames) > 1 and not plan:
+                    results = self.import_files_in_pool(filenames, markings, options, workers, digests=digests)
+                else:
+                    results = (self.import_file(filename, markings, options, digest=digests.get(filename))
+                               for filename in filenames)
 
-                    if options.get('destination_path'):
+                if profiler:
+                    results = self.collect_profiles(results, profiler)
+
+                self.print_summary(results, start_time)
+
+                if profiler:
+                    self.write_stats(profiler, options)
+            finally:
+                if profiler:
+                    profiling.disable()
+
+            if plan:
+                self.write_plan(plan, options)
+        finally:
+            if plan:
+                import_handler.finish_dry_run()
+
+    def collect_profiles(self, results, profiler):
+        """
+        Pass on the results of 'import_file', adding the profiles of files imported in worker
+        processes to the given profiler.
+        """
+        for result in results:
+            for record in result.pop('profile', []):
+                profiler.add_file(record)
+            yield result
+
+    def write_stats(self, profiler, options):
+        """
+        Print the statistics of the profiler (option `--stats`) and/or write its report
+        to a JSON file (option `--stats-json`).
+        """
+
+        out = getattr(self, 'stdout', sys.stdout)
+
+        if options.get('stats'):
+            out.write(profiler.format_stats())
+
+        if options.get('stats_json'):
+            with open(options['stats_json'], 'w') as report_file:
+                json.dump(profiler.report(), report_file, indent=2)
+
+    def write_plan(self, plan, options):
+        """
+        Print the plan of a dry run (option `--dry-run`); if `--plan-json` is given, the plan
+        is also written to that file.
+        """
+
+        out = getattr(self, 'stdout', sys.stdout)
+
+        out.write(plan.format_report())
+
+        if options.get('plan_json'):
+            with open(options['plan_json'], 'w') as plan_file:
+                json.dump(plan.report(), plan_file, indent=2)
+
+    def get_command_name(self):
+        return self.__class__.__module__.split('.')[-1]
+
+    def skip_completed_files(self, filenames):
+        """
+        Return the given files except for those whose content has been imported successfully
+        with this command before (according to the journal, see 'ImportCheckpoint'), together
+        with a dictionary mapping the names of the files to their digests.
+        """
+
+        out = getattr(self, 'stdout', sys.stdout)
+
+        digests = map(file_digest, filenames)
+        completed = ImportCheckpoint.completed_digests(self.get_command_name(), digests)
+
+        remaining = map(lambda x: x[0], filter(lambda x: x[1] not in completed, zip(filenames, digests)))
+
+        if len(remaining) < len(filenames):
+            out.write("Skipping %s of %s files that have been imported before\n" % (len(filenames) - len(remaining),
+                                                                                   len(filenames)))
+        return (remaining, dict(zip(filenames, digests)))
+
+    def queue_files(self, filenames, markings, options):
+        """
+        Create an import job (see 'ImportJob') for each of the given files.
+        """
+
+        out = getattr(self, 'stdout', sys.stdout)
+
+        command = self.get_command_name()
+
+        for filename in filenames:
+            job = ImportJob.enqueue(command, os.path.abspath(filename), markings=markings, options=options)
+            out.write("Queued %s as job %s\n" % (filename, job.pk))
+
+    def import_file(self, filename, markings, options, digest=None):
+        """
+        Import a single file and move it to the destination path (if one has been specified).
+        Returns a dictionary with keys 'filename', 'success', 'size', 'seconds', 'digest'
+        (the SHA256 digest of the content of the file) and 'error' (the traceback of a failed import).
+        If the digest of the file is known already (see 'skip_completed_files'), pass it
+        as 'digest', so that the file is not read for it once more.
+
+        Unless this is a dry run, the outcome is recorded in the journal (see 'ImportCheckpoint');
+        the entry for a successful import is written in the transaction of the import or,
+        when streaming (option 'stream'), after the last object has been committed.
+        """
+        start_time = time.time()
+        try:
+            size = os.path.getsize(filename)
+        except OSError:
+            size = 0
+
+        result = {'filename': filename,
+                  'success': False,
+                  'size': size,
+                  'digest': digest or file_digest(filename),
+                  'error': None}
+
+        import_handler = self.get_import_handler()
+        dry_run = bool(options.get('dry_run'))
+        journal = not dry_run
+
+        success = False
+        error = None
+
+        profiler = profiling.active
+        if profiler:
+            profiler.start_file(filename)
+
+        logger.info("Starting import of %s" % filename)
+        for attempt in range(self.IMPORT_RETRIES + 1):
+            # Information about existing revisions gathered during a previous
+            # (possibly rolled back) import must not be reused.
+            import_handler.clear_existing_revisions()
+            try:
+                # The file is imported in a single transaction: a failed import
+                # leaves no partially imported objects behind. A streamed file,
+                # however, may be arbitrarily large: there, each object is committed
+                # on its own as it is written (see 'DingoImportHandling.xml_import_stream'),
+                # and objects written before a failure remain. (A dry run is still
+                # carried out in a single transaction, which is rolled back.)
+                with (atomic_import() if dry_run or not options.get('stream') else per_object_transactions()):
+                    self.Importer.xml_import(filepath = filename,
+                                             markings = markings,
+                                             **options)
+                    if journal:
+                        ImportCheckpoint.record(self.get_command_name(),
+                                                dict(result, success=True, seconds=time.time() - start_time))
+                    if dry_run:
+                        # Should the importer have written anything nevertheless
+                        # (e.g., via a handler that is not its 'import_handler'),
+                        # it is rolled back.
+                        raise DryRunRollback()
+                success = True
+                break
+            except DryRunRollback:
+                success = True
+                break
+            except (IntegrityError, OperationalError):
+                # Another process has created one of the objects we tried to create
+                # (retrying the import will find the existing object) or our transaction
+                # has been aborted in favor of the transaction of another process.
+                if attempt < self.IMPORT_RETRIES:
+                    logger.warning("%s when importing %s; retrying" % (sys.exc_info()[1].__class__.__name__,
+                                                                       filename))
+                    time.sleep(random.random() * self.IMPORT_RETRY_DELAY * (attempt + 1))
+                else:
+                    error = traceback.format_exc()
+                    logger.error("Something went wrong when importing %s. Traceback: %s" % (filename,error))
+            except:
+                error = traceback.format_exc()
+                logger.error("Something went wrong when importing %s. Traceback: %s" % (filename,error))
+                break
+
+        if profiler:
+            profiler.finish_file()
+
+        if options.get('destination_path') and not dry_run:
+
+            try:
+                dest_path = os.path.join(options.get('destination_path'), os.path.basename(filename))
+                logger.info("Moving %s to %s" % (os.path.basename(filename),dest_path))
+                os.rename(filename,dest_path)
+            except Exception, err:
+                logger.exception("Could not move file %s:" % (filename))
+
+        result.update({'success': success,
+                       'seconds': time.time() - start_time,
+                       'error': error})
+
+        if journal and not success:
+            try:
+                ImportCheckpoint.record(self.get_command_name(), result)
+            except Exception:
+                logger.exception("Could not record the failed import of %s" % filename)
+
+        return result
+
+    def import_files_in_pool(self, filenames, markings, options, workers, digests=None):
+        """
+        Distribute the import of the given files among a pool of worker processes
+        and yield the results of 'import_file' as they come in. 'digests' optionally
+        maps file names to the digests of the files (see 'skip_completed_files').
+        """
+
+        # The worker processes must not share the database connection of this process.
+
+        for connection in connections.all():
+            connection.close()
+
+        pool = multiprocessing.Pool(processes=workers, initializer=_init_import_worker)
+
+        try:
+            marking_pks = map(lambda x: x.pk, markings)
+            digests = digests or {}
+            jobs = map(lambda x: (self.__class__, x, marking_pks, options, digests.get(x)), filenames)
+            for result in pool.imap_unordered(_import_file_in_worker, jobs):
+                yield result
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    def print_summary(self, results, start_time):
+        """
+        Print a line for each imported file and a summary with throughput figures.
+        """
 
-                        try:
-                            dest_path = os.path.join(options.get('destination_path'), os.path.basename(filename))
-                            logger.info("Moving %s to %s" % (os.path.basename(filename),dest_path))
-                            os.rename(filename,dest_path)
-                        except Exception, err:
-                            logger.exception("Could not move file %s:" % (filename))
+        out = getattr(self, 'stdout', sys.stdout)
+
+        counts = {True: 0, False: 0}
+        total_size = 0
+
+        for result in results:
+            counts[result['success']] += 1
+            total_size += result['size']
+            out.write("%s %s (%.1f KB in %.2fs)\n" % ('OK    ' if result['success'] else 'FAILED',
+                                                       result['filename'],
+                                                       result['size'] / 1024.0,
+                                                       result['seconds']))
+
+        seconds = max(time.time() - start_time, 0.001)
+
+        out.write("Imported %s of %s files (%s failed) in %.2fs: %.2f files/s, %.1f KB/s\n" % (counts[True],
+                                                                                            counts[True] + counts[False],
+                                                                                            counts[False],
+                                                                                            seconds,
+                                                                                            (counts[True] + counts[False]) / seconds,
+                                                                                            total_size / 1024.0 / seconds))
+
+
+def _init_import_worker():
+    # Connections and caches inherited from the parent process are not used
+    # in the worker processes.
+
+    for connection in connections.all():
+        connection.close()
+    clear_schema_caches()
+
+
+def _import_file_in_worker(job):
+    (command_class, filename, marking_pks, options, digest) = job
+    markings_by_pk = InfoObject.objects.in_bulk(marking_pks)
+    markings = filter(None, map(lambda x: markings_by_pk.get(x), marking_pks))
+    if not (options.get('stats') or options.get('stats_json')):
+        return command_class().import_file(filename, markings, options, digest=digest)
+    # The profile of the file is handed to the parent process with the result.
+    profiler = profiling.enable()
+    try:
+        result = command_class().import_file(filename, markings, options, digest=digest)
+        result['profile'] = profiler.files
+    finally:
+        profiling.disable()
+    return result
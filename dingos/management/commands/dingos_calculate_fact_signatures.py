@@ -0,0 +1,64 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from dingos.models import Fact, calculate_fact_signatures
+
+
+class Command(BaseCommand):
+    """
+    This class implements the command for calculating the signatures
+    of existing facts.
+    """
+    args = 'no arguments'
+    help = """Calculates the signatures that are used for finding existing facts during import.
+              Run this command after migrating a database that contains facts created by an
+              earlier version of DINGOS: facts without signature are not found during import,
+              so duplicates of these facts would be created."""
+
+    option_list = BaseCommand.option_list + (
+        make_option('-a', '--all',
+                action='store_true',
+                dest='all',
+                default=False,
+                help='Recalculate the signatures of all facts rather than only of facts without signature.'),
+        make_option('-c', '--chunk-size',
+                action='store',
+                dest='chunk_size',
+                default='1000',
+                help='Number of facts treated per database transaction.'),
+    )
+
+
+    def handle(self, *args, **options):
+        if options.get('all'):
+            facts = Fact.objects.all()
+        else:
+            facts = Fact.objects.filter(signature='')
+
+        try:
+            chunk_size = int(options.get('chunk_size') or 1000)
+        except ValueError:
+            raise CommandError("The chunk size must be an integer.")
+
+        total = facts.count()
+        count = 0
+        for count in calculate_fact_signatures(facts, chunk_size=chunk_size):
+            print "Calculated signatures for %s of %s facts" % (count, total)
+        print "Done: calculated signatures for %s facts." % count
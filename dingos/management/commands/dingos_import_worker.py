@@ -0,0 +1,167 @@
+# Copyright (c) Siemens AG, 2013
+#
+# This file is part of MANTIS.  MANTIS is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2
+# of the License, or(at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+
+from optparse import make_option
+from django.core.management import get_commands, load_command_class
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections, DatabaseError
+
+from dingos.importer import DingoImportCommand
+from dingos.models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+
+class JobHeartbeat(threading.Thread):
+    """
+    Thread that records every 'interval' seconds that the worker carrying out
+    the given job is alive (see 'ImportJob.beat').
+    """
+
+    def __init__(self, job, interval):
+        super(JobHeartbeat, self).__init__()
+        self.daemon = True
+        self.job = job
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    if not self.job.beat():
+                        logger.warning("Job %s is no longer claimed by worker %s" % (self.job.pk, self.job.worker))
+                        break
+                except DatabaseError:
+                    logger.exception("Could not record heartbeat of job %s" % self.job.pk)
+        finally:
+            # The thread has its own database connection.
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class Command(BaseCommand):
+    """
+    This class implements the command for carrying out queued import jobs.
+    """
+    args = 'no arguments'
+    help = """Carries out the import jobs queued with the '--queue' option of the import commands.
+              Jobs are claimed with conditional updates, so any number of workers can be run at the same time.
+              While a worker carries out a job, it records a heartbeat for the job; with '--requeue-stale',
+              running jobs whose worker has stopped doing so (e.g., because it has been killed) are queued again."""
+
+    option_list = BaseCommand.option_list + (
+        make_option('-i', '--poll-interval',
+                    action='store',
+                    type='float',
+                    dest='poll_interval',
+                    default=5.0,
+                    help='Seconds to wait before looking for new jobs if the queue is empty (default: 5).'),
+        make_option('-n', '--max-jobs',
+                    action='store',
+                    type='int',
+                    dest='max_jobs',
+                    default=0,
+                    help='Exit after carrying out the given number of jobs (default: run forever).'),
+        make_option('-e', '--exit-when-empty',
+                    action='store_true',
+                    dest='exit_when_empty',
+                    default=False,
+                    help='Exit as soon as the queue is empty rather than waiting for new jobs.'),
+        make_option('--heartbeat-interval',
+                    action='store',
+                    type='float',
+                    dest='heartbeat_interval',
+                    default=30.0,
+                    help='Seconds between two heartbeats recorded for the job carried out (default: 30).'),
+        make_option('--requeue-stale',
+                    action='store',
+                    type='float',
+                    dest='requeue_stale',
+                    default=0,
+                    help='Queue running jobs without heartbeat for the given number of seconds again '
+                         '(default: do not requeue jobs).'),
+    )
+
+    def __init__(self, *args, **kwargs):
+        self.import_commands = {}
+        super(Command, self).__init__(*args, **kwargs)
+
+    def get_import_command(self, name):
+        if not name in self.import_commands:
+            try:
+                command = load_command_class(get_commands()[name], name)
+            except KeyError:
+                raise CommandError("Unknown import command %s" % name)
+            if not isinstance(command, DingoImportCommand):
+                raise CommandError("Command %s is not an import command" % name)
+            self.import_commands[name] = command
+        return self.import_commands[name]
+
+    def run_job(self, job, heartbeat_interval=30.0):
+        heartbeat = JobHeartbeat(job, heartbeat_interval)
+        heartbeat.start()
+        try:
+            command = self.get_import_command(job.command)
+            result = command.import_file(job.filename, list(job.markings.all()), job.get_options())
+        except Exception:
+            result = {'success': False,
+                      'error': traceback.format_exc()}
+        finally:
+            heartbeat.stop()
+        job.finish(result)
+        return job
+
+    def handle(self, *args, **options):
+        worker = "%s:%s" % (socket.gethostname(), os.getpid())
+        poll_interval = options.get('poll_interval') or 5.0
+        max_jobs = options.get('max_jobs') or 0
+        heartbeat_interval = options.get('heartbeat_interval') or 30.0
+        requeue_stale = options.get('requeue_stale') or 0
+        if requeue_stale and requeue_stale <= heartbeat_interval:
+            raise CommandError("The time after which jobs are requeued must exceed the heartbeat interval")
+
+        count = 0
+        while not max_jobs or count < max_jobs:
+            # Connections may have been closed by the database server while we were waiting.
+            # (Within a transaction, e.g., when the worker is called by a test, they must be kept.)
+            if not any(map(lambda x: x.in_atomic_block, connections.all())):
+                close_old_connections()
+            if requeue_stale:
+                requeued = ImportJob.requeue_stale(requeue_stale)
+                if requeued:
+                    self.stdout.write("Queued %s stale jobs again" % requeued)
+            job = ImportJob.claim(worker)
+            if job is None:
+                if options.get('exit_when_empty'):
+                    break
+                time.sleep(poll_interval)
+                continue
+            count += 1
+            self.run_job(job, heartbeat_interval)
+            self.stdout.write("%s job %s: %s (%.2fs)" % (job.get_status_display(), job.pk, job.filename,
+                                                         job.seconds or 0))
@@ -23,17 +23,25 @@ import re
 import hashlib
 import base64
 import copy
+import threading
+import json
 
-from django.db import models
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import models, transaction, IntegrityError, connections, router
 from django.db.models import Count, F
+from django.db.models.query import prefetch_related_objects
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.contrib.auth.models import User, Group
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 from django.core import urlresolvers
 from django.utils.safestring import mark_safe
 from django.utils import timezone
-from django.core.files.base import ContentFile
+from django.utils.encoding import force_text, force_bytes
 from django.core.exceptions import ObjectDoesNotExist
+from django.conf import settings
 
 import dingos.read_settings
 
@@ -41,7 +49,9 @@ import dingos
 
 from dingos import *
 
-from dingos.core.datastructures import DingoObjDict,ExtendedSortedDict,dict2DingoObjDict
+from dingos.core.datastructures import DingoObjDict,ExtendedSortedDict,dict2DingoObjDict,LRUCache,SlottedRecord, \
+    SizeBoundedLRUCache
+from dingos.core import profiling
 
 logger = logging.getLogger(__name__)
 pp = pprint.PrettyPrinter(indent=2)
@@ -142,12 +152,30 @@ class FactValue(DingoModel):
                                                 default=dingos.DINGOS_VALUES_TABLE,
                                                 help_text="""Governs storage location of value""")
 
+    value_hash = models.CharField(max_length=64,
+                                  blank=True,
+                                  editable=False,
+                                  help_text="""SHA256 digest of the value; used for looking up values
+                                               and for enforcing uniqueness of values.""")
+
 
     class Meta:
-        # The constraint below can cause problems if the entries in FactValue become to large:
-        # Uniqueness forces the creation of a index on values
-        # for testing uniqueness.
-        unique_together = ('value', 'fact_data_type','storage_location')
+        # Uniqueness is enforced on the fixed-width digest of the value rather than
+        # on the value itself: a unique constraint on the (text) value would force
+        # the creation of an index on the values, which becomes problematic
+        # for large values.
+        unique_together = ('value_hash', 'fact_data_type','storage_location')
+
+    @staticmethod
+    def digest(value):
+        """
+        Calculate the digest stored in 'value_hash' for the given value.
+        """
+        return hashlib.sha256(force_bytes(value)).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.value_hash = FactValue.digest(self.value)
+        super(FactValue, self).save(*args, **kwargs)
 
     def __unicode__(self):
         return ("%s" % self.value)
@@ -616,6 +644,48 @@ class NodeID(DingoModel):
 dingos_class_map["NodeID"] = NodeID
 
 
+class InfoObject2FactQuerySet(models.query.QuerySet):
+    """
+    QuerySet for InfoObject2Fact objects that can fill in the node
+    identifiers of the retrieved objects from the process-wide
+    intern map of node identifiers (see 'NodeIDInternMap') rather
+    than querying them from the database.
+    """
+
+    _intern_node_ids = False
+
+    def intern_node_ids(self):
+        clone = self._clone()
+        clone._intern_node_ids = True
+        return clone
+
+    def _clone(self, *args, **kwargs):
+        clone = super(InfoObject2FactQuerySet, self)._clone(*args, **kwargs)
+        clone._intern_node_ids = self._intern_node_ids
+        return clone
+
+    def iterator(self):
+        if not self._intern_node_ids:
+            for obj in super(InfoObject2FactQuerySet, self).iterator():
+                yield obj
+            return
+
+        objs = list(super(InfoObject2FactQuerySet, self).iterator())
+        nodes = node_id_intern_map.get_nodes(map(lambda x: x.node_id_id, objs))
+        cache_name = self.model._meta.get_field('node_id').get_cache_name()
+        for obj in objs:
+            node = nodes.get(obj.node_id_id)
+            if node is not None:
+                setattr(obj, cache_name, node)
+            yield obj
+
+
+class InfoObject2FactManager(models.Manager):
+
+    def get_queryset(self):
+        return InfoObject2FactQuerySet(self.model, using=self._db)
+
+
 class InfoObject2Fact(DingoModel):
     """
     The model used for linking information objects and facts.
@@ -682,6 +752,7 @@ class InfoObject2Fact(DingoModel):
 
     namespace_map = models.ForeignKey("FactTermNamespaceMap",null=True)
 
+    objects = InfoObject2FactManager()
 
     @property
     def marking_thru(self):
@@ -736,6 +807,15 @@ class FactTermNamespaceMap(DingoModel):
                                        through="PositionalNamespace",
                                        )
 
+    # Digest of the namespace URIs per position (see 'NamespaceMapCache.digest'):
+    # the unique key on fact term and digest keeps concurrent imports from
+    # creating the same map twice.
+
+    key = models.CharField(max_length=64, null=True, editable=False)
+
+    class Meta:
+        unique_together = ('fact_term', 'key')
+
     def __unicode__(self):
         return "%s" % (self.fact_term.term)
 
@@ -799,14 +879,60 @@ class Fact(DingoModel):
                                             help_text="""Used to reference a specific revision of an information
                                                          object rather than the latest revision.""")
 
+    signature = models.CharField(max_length=64,
+                                 blank=True,
+                                 db_index=True,
+                                 editable=False,
+                                 help_text="""Digest calculated from fact term, fact values and referenced
+                                              information object; used for finding an existing fact
+                                              with the same content.""")
+
 
     class Meta:
         # Here, we cannot have database-enforced uniqueness, because we need
         # uniqueness regarding also M2M-related objects, namely the fact values.
         # Refer to the code in get_or_create_fact that shows how to query whether
-        # such a fact may already exist.
+        # such a fact may already exist (using the signature of the fact).
         pass
 
+    @staticmethod
+    def calculate_signature(fact_term_id, value_ids, value_iobject_id_id=None, value_iobject_ts=None):
+        """
+        Calculate the signature of a fact with the given fact term, values, and
+        reference to an information object (all given by primary keys).
+        The order of the value ids does not matter.
+        """
+        if value_iobject_ts is None:
+            ts = ''
+        else:
+            ts = value_iobject_ts
+            if timezone.is_naive(ts) and settings.USE_TZ:
+                ts = timezone.make_aware(ts, timezone.get_default_timezone())
+            if timezone.is_aware(ts):
+                ts = ts.astimezone(timezone.utc)
+            ts = ts.isoformat()
+        if value_iobject_id_id is None:
+            value_iobject_id_id = ''
+
+        canonical = "%s|%s|%s|%s" % (fact_term_id,
+                                     ",".join(map(str, sorted(set(value_ids)))),
+                                     value_iobject_id_id,
+                                     ts)
+        return hashlib.sha256(canonical).hexdigest()
+
+    def update_signature(self, save=True):
+        """
+        Recalculate the signature from the fact's current fact term, values
+        and reference. Must be called when the values of an existing fact
+        are changed.
+        """
+        self.signature = Fact.calculate_signature(self.fact_term_id,
+                                                  self.fact_values.values_list('pk', flat=True),
+                                                  self.value_iobject_id_id,
+                                                  self.value_iobject_ts)
+        if save:
+            self.save()
+
     def __unicode__(self):
         fact_values = self.fact_values.all()
         if fact_values.count() > 1:
@@ -907,6 +1033,23 @@ class InfoObject(DingoModel):
                             help_text="""Name of the information object, usually auto generated.
                                          from type and facts flagged as 'naming'.""")
 
+    content_digest = models.CharField(max_length=64,
+                                      blank=True,
+                                      editable=False,
+                                      help_text="""SHA256 digest of the imported content of this
+                                                   revision; used for recognizing reimports of
+                                                   unchanged content.""")
+
+    parent_revision = models.ForeignKey("InfoObject",
+                                        null=True,
+                                        blank=True,
+                                        editable=False,
+                                        on_delete=models.PROTECT,
+                                        related_name='child_revisions',
+                                        help_text="""For a copy-on-write revision, the revision from
+                                                     which all facts are inherited that have not
+                                                     been changed or removed.""")
+
     #@property
     #def marking_thru(self):
     #    """
@@ -926,12 +1069,109 @@ class InfoObject(DingoModel):
         unique_together = (('identifier', 'timestamp'),)
         ordering = ['-timestamp']
 
+    # While 'from_dict' collects facts for a bulk write, 'add_fact'
+    # queues the facts in this list rather than writing them.
+
+    _pending_facts = None
+
+    # See 'get_io2f_map'
+
+    _io2f_map = None
 
     def __unicode__(self):
         return "%s: %s" % (self.iobject_type, self.name)
 
     def clear(self):
         self.fact_thru.all().delete()
+        self.removed_nodes.all().delete()
+        self.parent_revision = None
+        self._io2f_map = {}
+
+    def get_revision_chain(self):
+        """
+        Return the list of primary keys of this revision and of the revisions from which it
+        inherits facts (see 'parent_revision'), starting with this revision.
+        """
+        chain = [self.pk]
+        parent_pk = self.parent_revision_id
+        while parent_pk and not parent_pk in chain:
+            chain.append(parent_pk)
+            parent_pk = self._DCM['InfoObject'].objects.filter(pk=parent_pk).values_list('parent_revision_id',
+                                                                                       flat=True)[0]
+        return chain
+
+    def get_effective_io2f_values(self):
+        """
+        For a copy-on-write revision, reassemble the facts of the revision from its own
+        InfoObject2Fact rows and those of the revisions it inherits from. Returns a dictionary mapping
+        the primary keys of node identifiers to tuples (pk, fact_id, namespace_map_id, attributed_fact_id)
+        of the InfoObject2Fact rows making up the revision.
+        """
+        chain = self.get_revision_chain()
+
+        rows = {}
+        for (iobject_pk, node_id_pk, pk, fact_pk, namespace_map_pk, attributed_pk) in \
+                self._DCM['InfoObject2Fact'].objects.filter(iobject__in=chain).order_by().values_list('iobject_id',
+                                                                                                   'node_id_id',
+                                                                                                   'pk',
+                                                                                                   'fact_id',
+                                                                                                   'namespace_map_id',
+                                                                                                   'attributed_fact_id'):
+            rows.setdefault(iobject_pk, []).append((node_id_pk, (pk, fact_pk, namespace_map_pk, attributed_pk)))
+
+        removed = {}
+        for (iobject_pk, node_id_pk) in self._DCM['InfoObjectRemovedNode'].objects.filter(
+                iobject__in=chain).values_list('iobject_id', 'node_id_id'):
+            removed.setdefault(iobject_pk, []).append(node_id_pk)
+
+        result = {}
+        for iobject_pk in reversed(chain):
+            for node_id_pk in removed.get(iobject_pk, []):
+                result.pop(node_id_pk, None)
+            result.update(rows.get(iobject_pk, []))
+        return result
+
+    def get_fact_thrus(self, *prefetch_lookups, **kwargs):
+        """
+        Return the InfoObject2Fact objects of this revision, ordered by node identifier and with
+        the given lookups prefetched. Pass 'intern_node_ids=True' to take node identifiers from
+        the intern map (see 'InfoObject2FactQuerySet').
+
+        For a revision that stores all of its facts, a queryset is returned; for a copy-on-write
+        revision, the list of InfoObject2Fact objects reassembled from the revision chain.
+        """
+        if not self.parent_revision_id:
+            fact_thrus = self.fact_thru.all()
+        else:
+            fact_thrus = self._DCM['InfoObject2Fact'].objects.filter(iobject__in=self.get_revision_chain())
+
+        if kwargs.get('intern_node_ids'):
+            fact_thrus = fact_thrus.intern_node_ids()
+
+        if not self.parent_revision_id:
+            return fact_thrus.prefetch_related(*prefetch_lookups)
+
+        effective_pks = set(map(lambda x: x[0], self.get_effective_io2f_values().values()))
+        fact_thrus = filter(lambda x: x.pk in effective_pks, fact_thrus)
+        prefetch_related_objects(fact_thrus, prefetch_lookups)
+        return fact_thrus
+
+    def get_io2f_map(self):
+        """
+        Return a dictionary mapping the names of node identifiers to the primary keys of
+        the InfoObject2Fact objects of this iobject. The map is loaded once and then kept
+        up to date by 'add_fact' and 'add_facts', which use it for determining the
+        fact to which an attribute fact belongs.
+        """
+        if self._io2f_map is None and self.parent_revision_id:
+            values = self.get_effective_io2f_values()
+            nodes = node_id_intern_map.get_nodes(values.keys())
+            self._io2f_map = dict(map(lambda x: (force_text(nodes[x[0]].name), x[1][0]), values.items()))
+        elif self._io2f_map is None:
+            self._io2f_map = dict(map(lambda x: (force_text(x[0]), x[1]),
+                                      self._DCM['InfoObject2Fact'].objects.filter(iobject=self).order_by('pk').values_list(
+                                          'node_id__name', 'pk')))
+        return self._io2f_map
 
     def is_empty(self):
         """
@@ -940,7 +1180,7 @@ class InfoObject(DingoModel):
         :return:
         """
 
-        return self.fact_thru.count() == 0
+        return self.fact_thru.count() == 0 and not self.parent_revision_id
 
     @property
     def embedded_in(self):
@@ -988,8 +1228,28 @@ class InfoObject(DingoModel):
         with the given fact data type and source (CYBOX, etc.) does not
         exist yet, it is created.
 
+        While 'from_dict' collects the facts of the iobject for a bulk
+        write (see 'add_facts'), the fact is only queued and None is
+        returned.
+
         """
 
+        if self._pending_facts is not None:
+            self._pending_facts.append(PendingFact(fact_term_name=fact_term_name,
+                                                   fact_term_attribute=fact_term_attribute,
+                                                   fact_dt_name=fact_dt_name,
+                                                   fact_dt_namespace_name=fact_dt_namespace_name,
+                                                   fact_dt_namespace_uri=fact_dt_namespace_uri,
+                                                   fact_dt_kind=fact_dt_kind,
+                                                   values=values,
+                                                   value_iobject_id=value_iobject_id,
+                                                   value_iobject_ts=value_iobject_ts,
+                                                   node_id_name=node_id_name,
+                                                   is_attribute=is_attribute,
+                                                   ns_uri_dict=ns_uri_dict,
+                                                   namespaces=namespaces,
+                                                   top_level_namespace=top_level_namespace))
+            return None
 
         if not values:
             values = []
@@ -998,9 +1258,15 @@ class InfoObject(DingoModel):
             namespaces = []
 
         if not ns_uri_dict:
-            ns_uri_dict = None
+            ns_uri_dict = {}
+
+        profiler = profiling.active
 
         # get or create fact_term
+
+        if profiler:
+            token = profiler.start('fact_terms')
+
         fact_term, created = get_or_create_fact_term(iobject_family_name=self.iobject_family.name,
                                                      fact_term_name=fact_term_name,
                                                      fact_term_attribute=fact_term_attribute,
@@ -1012,10 +1278,14 @@ class InfoObject(DingoModel):
                                                      fact_dt_namespace_uri=fact_dt_namespace_uri,
                                                      dingos_class_map=self._DCM)
 
-
+        if profiler:
+            profiler.stop(token, rows=1)
 
         # get or create fact object
 
+        if profiler:
+            token = profiler.start('facts')
+
         fact_obj, created = get_or_create_fact(fact_term,
                                                fact_dt_name=fact_dt_name,
                                                fact_dt_namespace_uri=fact_dt_namespace_uri,
@@ -1024,105 +1294,157 @@ class InfoObject(DingoModel):
                                                value_iobject_ts=value_iobject_ts,
                                                )
 
-
+        if profiler:
+            profiler.stop(token, rows=1)
+            token = profiler.start('io2f')
 
         # get or create node identifier
 
-        node_id, created = dingos_class_map['NodeID'].objects.get_or_create(name=node_id_name)
+        node_id = node_id_intern_map.get_node(node_id_name)
 
         # If this is an attribute: determine whether there is a fact for which this fact is
         # an attribute.
 
         node_id_name_components = node_id_name.split(':')
 
-        attributed_io2f = None
+        io2f_map = self.get_io2f_map()
+
+        attributed_io2f_pk = None
         if node_id_name_components[-1] and node_id_name_components[-1][0] == 'A':
             attributed_node_id_name = ":".join(node_id_name_components[:-1])
-
-            try:
-                attributed_io2f = dingos_class_map['InfoObject2Fact'].objects.get(iobject=self,
-                                                                                 node_id__name=attributed_node_id_name)
-            except InfoObject2Fact.DoesNotExist:
-                pass
+            attributed_io2f_pk = io2f_map.get(force_text(attributed_node_id_name))
 
         io2f = self._DCM['InfoObject2Fact'].objects.create(
             node_id=node_id,
             iobject=self,
             fact=fact_obj,
-            attributed_fact=attributed_io2f)
-
-        counter = 0
-        io2f2n_list = []
-
-
-        namespace_map_elts = FactTermNamespaceMap.objects.filter(fact_term=fact_term).order_by('id','namespaces_thru__position').values_list('id',
-                                                                                             'namespaces_thru__position',
-                                                                                             'namespaces_thru__namespace__uri')
-
-        namespace_maps = []
-        for k,g in itertools.groupby(namespace_map_elts,lambda x:x[0]):
-            namespace_maps.append(list(g))
-
-
-        namespace_map = None
-
-        namespaces_uris = map(lambda x:x[0],namespaces)
-
-
-        for i in namespace_maps:
-            if namespaces_uris == map(lambda x:x[2],i):
-                namespace_map = FactTermNamespaceMap.objects.get(id=i[0][0])
-
+            attributed_fact_id=attributed_io2f_pk)
+
+        io2f_map[force_text(node_id_name)] = io2f.pk
+
+        namespace_map_key = namespace_map_cache.make_key(namespaces)
+        namespace_map_pk = None
+
+        if namespace_map_key:
+            namespace_map_pk = namespace_map_cache.get(fact_term.pk, namespace_map_key)
+
+            if not namespace_map_pk:
+                (namespace_map_pk, map_created) = get_or_create_namespace_map(fact_term.pk, namespace_map_key)
+                if map_created:
+                    io2f2n_list = []
+                    for (counter,(ns_uri,ns_slug)) in enumerate(namespaces):
+                        if ns_uri:
+                            if not (ns_uri in ns_uri_dict):
+                                ns_uri_obj, created = get_or_create_cached(self._DCM['DataTypeNameSpace'],
+                                                                           uri=ns_uri,
+                                                                           defaults={'name':ns_slug})
+                                ns_uri_dict[ns_uri]=ns_uri_obj.pk
+                            io2f2n_list.append(PositionalNamespace(fact_term_namespace_map_id=namespace_map_pk,
+                                                                   position=counter,
+                                                                   namespace_id=ns_uri_dict[ns_uri]))
+                    PositionalNamespace.objects.bulk_create(io2f2n_list)
+                namespace_map_cache.add(fact_term.pk, namespace_map_key, namespace_map_pk)
+
+        if namespace_map_pk:
+            io2f.namespace_map_id = namespace_map_pk
+            io2f.save()
 
-                break
+        if profiler:
+            profiler.stop(token, rows=1)
 
+        return io2f
 
+    def add_facts(self, fact_list, parent_revision=None):
+        """
+        Add a list of facts to the iobject. Each entry of the list is a dictionary
+        with the keyword arguments that would otherwise be passed to 'add_fact'.
+
+        Rather than carrying out the query sequence of 'add_fact' for each fact,
+        fact terms, values, facts, node identifiers and namespace maps are resolved
+        for the whole list together and the InfoObject2Fact rows are inserted with
+        'bulk_create'. The resulting rows are the same as those created by calling
+        'add_fact' for each entry of the list.
+
+        If a 'parent_revision' is given, the list is taken to be the complete content
+        of the (still empty) iobject, which is written as copy-on-write revision
+        of the parent revision (see 'from_dict').
+        """
+        return FactBatchWriter(self).write(fact_list, parent_revision=parent_revision)
 
-        if not namespace_map:
+    def from_dict(self,
+                  dingos_obj_dict,
+                  config_hooks=None,
+                  namespace_dict=None,
+                  bulk_write=None,
+                  parent_revision=None,
+                  ):
+        """
+        Convert DingoObjDict to facts and associate resulting facts with this information object.
 
-            namespace_map = FactTermNamespaceMap.objects.create(fact_term=fact_term)
-            for (ns_uri,ns_slug) in namespaces:
+        If 'bulk_write' is True (the default is governed by the setting DINGOS_BULK_FACT_WRITE),
+        the facts are collected and written with 'add_facts'. This also holds for facts that
+        special fact-term handlers add via 'add_fact'.
 
-                if ns_uri:
+        If a 'parent_revision' is given, the object is written as copy-on-write revision
+        of the parent revision: only facts that have been added or changed with respect to the
+        parent revision are written, and facts of the parent revision that are not part of this
+        revision are recorded as removed. Copy-on-write revisions are always written in bulk.
+        """
 
-                    if not (ns_uri in ns_uri_dict):
-                        ns_uri_obj, created = self._DCM['DataTypeNameSpace'].objects.get_or_create(uri=ns_uri,defaults={'name':ns_slug})
-                        ns_uri_obj_pk = ns_uri_obj.pk
-                        ns_uri_dict[ns_uri]=ns_uri_obj_pk
-                    else:
-                        ns_uri_obj_pk = ns_uri_dict[ns_uri]
+        if parent_revision is not None:
+            bulk_write = True
 
-                    io2f2n_list.append(PositionalNamespace(fact_term_namespace_map=namespace_map,position=counter,namespace_id=ns_uri_obj_pk))
+        if bulk_write is None:
+            bulk_write = dingos.DINGOS_BULK_FACT_WRITE
 
-                counter +=1
-                #self._DCM['IO2F2Namespace'].object.create(io2f=self,position=counter,namespace__pk=ns_uri_obj_pk)
+        if bulk_write:
+            # 'add_facts' resolves the namespaces on its own (using the schema cache)
+            namespace_uri_2_pk_mapping = {}
+        else:
+            namespace_uri_2_pk_mapping = dict(self._DCM['DataTypeNameSpace'].objects.values_list('uri','id'))
 
-            if len(io2f2n_list)!= 0:
-                PositionalNamespace.objects.bulk_create(io2f2n_list)
-            else:
-                namespace_map.delete()
-                namespace_map = None
 
-        if namespace_map:
-            io2f.namespace_map = namespace_map
-            io2f.save()
+        if not self.is_empty():
+            logger.debug("Non-empty info object %s (timestamp %s, pk %s ) is overwritten with new information" % (self.identifier,
+                                                                                                                 self.timestamp,
+                                                                                                                 self.pk))
+            self.clear()
+        else:
+            self._io2f_map = {}
 
-        return io2f
+        if bulk_write:
+            # The facts are written and named without querying the facts of the object
+            pending_facts = self.fact_list_from_dict(dingos_obj_dict,
+                                                     config_hooks=config_hooks,
+                                                     namespace_dict=namespace_dict)
+            writer = FactBatchWriter(self)
+            writer.write(pending_facts, parent_revision=parent_revision)
+            with profiling.stage('naming'):
+                self.set_name(self.name_from_fact_list(writer.naming_fact_list()))
+        else:
+            self._facts_from_dict(dingos_obj_dict, config_hooks, namespace_dict, namespace_uri_2_pk_mapping)
+            with profiling.stage('naming'):
+                self.set_name()
 
-    def from_dict(self,
-                  dingos_obj_dict,
-                  config_hooks=None,
-                  namespace_dict=None,
-                  ):
+    def fact_list_from_dict(self, dingos_obj_dict, config_hooks=None, namespace_dict=None):
         """
-        Convert DingoObjDict to facts and associate resulting facts with this information object.
+        Convert DingoObjDict to the facts that 'from_dict' writes for this information object,
+        but rather than writing them, return them as list of 'PendingFact' records (see 'add_facts').
+        This also holds for facts that special fact-term handlers add via 'add_fact'.
         """
 
+        # From here on, 'add_fact' queues the facts rather than writing them
+        self._pending_facts = []
 
-        # Instantiate default parameters
-
+        try:
+            self._facts_from_dict(dingos_obj_dict, config_hooks, namespace_dict, {})
+        finally:
+            pending_facts = self._pending_facts
+            self._pending_facts = None
 
+        return pending_facts
 
+    def _facts_from_dict(self, dingos_obj_dict, config_hooks, namespace_dict, namespace_uri_2_pk_mapping):
 
         if '@@ns' in dingos_obj_dict.keys():
             top_level_namespace = (namespace_dict.get(dingos_obj_dict.get('@@ns'),None),dingos_obj_dict.get('@@ns'))
@@ -1143,24 +1465,25 @@ class InfoObject(DingoModel):
         if not namespace_dict:
             namespace_dict = {}
 
+        # Flatten the DingoObjDict
 
-        namespace_uri_2_pk_mapping = dict(self._DCM['DataTypeNameSpace'].objects.values_list('uri','id'))
-
-
-        if not self.is_empty():
-            logger.debug("Non-empty info object %s (timestamp %s, pk %s ) is overwritten with new information" % (self.identifier,
-                                                                                                                 self.timestamp,
-                                                                                                                 self.pk))
-            self.clear()
+        with profiling.stage('flatten') as flatten_stage:
+            (flat_list, attrs) = dingos_obj_dict.flatten(attr_ignore_predicate=attr_ignore_predicate,
+                                                         force_nonleaf_fact_predicate=force_nonleaf_fact_predicate,
+                                                         namespace_dict=namespace_dict)
+            flatten_stage.rows = len(flat_list)
 
+        self._facts_from_flat_list(flat_list, attrs, namespace_dict, top_level_namespace, namespace_uri_2_pk_mapping,
+                                   datatype_extractor, special_ft_handler)
 
-        # Flatten the DingoObjDict
+    def _facts_from_flat_list(self, flat_list, attrs, namespace_dict, top_level_namespace, namespace_uri_2_pk_mapping,
+                              datatype_extractor, special_ft_handler):
 
-        (flat_list, attrs) = dingos_obj_dict.flatten(attr_ignore_predicate=attr_ignore_predicate,
-                                                     force_nonleaf_fact_predicate=force_nonleaf_fact_predicate,
-                                                     namespace_dict=namespace_dict)
+        family_namespace_name = "%s-%s" % (self.iobject_family.name, self.iobject_family_revision.name)
 
+        # Profiling is checked for each fact, so we look it up only once.
 
+        profiler = profiling.active
 
         for fact in flat_list:
 
@@ -1196,22 +1519,28 @@ class InfoObject(DingoModel):
             #            attr_info.chained_set(value, 'set', key, attr_node)
 
 
-            # Fill dictionary with arguments for call to 'add_fact'
+            # Fill record with arguments for call to 'add_fact'; the record can
+            # be accessed like a dictionary of keyword arguments (see 'PendingFact').
 
-            add_fact_kargs = {}
-            add_fact_kargs['fact_dt_kind'] = FactDataType.UNKNOWN_KIND
-            add_fact_kargs['fact_dt_namespace_name'] = "%s-%s" % (
-                self.iobject_family.name, self.iobject_family_revision.name)
+            add_fact_kargs = PendingFact()
+            add_fact_kargs.fact_dt_kind = FactDataType.UNKNOWN_KIND
+            add_fact_kargs.fact_dt_namespace_name = family_namespace_name
 
             # See whether the datatype extractor has found a datatype for the value
 
+            if profiler:
+                token = profiler.start('datatype_extraction')
+
             datatype_found = datatype_extractor(self, fact, attr_info, namespace_dict, add_fact_kargs)
 
+            if profiler:
+                profiler.stop(token, rows=1)
+
             if not datatype_found:
-                add_fact_kargs = {}
-                add_fact_kargs['fact_dt_kind'] = FactDataType.NO_VOCAB
-                add_fact_kargs['fact_dt_namespace_name'] = DINGOS_NAMESPACE_SLUG
-                add_fact_kargs['fact_dt_namespace_uri'] = DINGOS_NAMESPACE_URI
+                add_fact_kargs = PendingFact()
+                add_fact_kargs.fact_dt_kind = FactDataType.NO_VOCAB
+                add_fact_kargs.fact_dt_namespace_name = DINGOS_NAMESPACE_SLUG
+                add_fact_kargs.fact_dt_namespace_uri = DINGOS_NAMESPACE_URI
             else:
                 # Check whether the datatype extractor added namespace information
                 # If not, add some here
@@ -1220,16 +1549,16 @@ class InfoObject(DingoModel):
                         add_fact_kargs['fact_dt_namespace_name'], '%s/%s' % (
                             DINGOS_NAMESPACE_URI, self.iobject_family))
 
-            add_fact_kargs['fact_term_name'] = fact['term']
-            add_fact_kargs['fact_term_attribute'] = fact['attribute']
-            add_fact_kargs['values'] = [fact['value']]
-            add_fact_kargs['node_id_name'] = fact['node_id']
-            add_fact_kargs['namespaces'] = fact['namespaces']
-            add_fact_kargs['top_level_namespace'] = top_level_namespace
+            add_fact_kargs.fact_term_name = fact['term']
+            add_fact_kargs.fact_term_attribute = fact['attribute']
+            add_fact_kargs.fact_values = [fact['value']]
+            add_fact_kargs.node_id_name = fact['node_id']
+            add_fact_kargs.namespaces = fact['namespaces']
+            add_fact_kargs.top_level_namespace = top_level_namespace
 
             handler_return_value = True
 
-            logger.debug("Treating fact (before special handler list) %s with attr_info %s and kargs %s" % (fact, attr_info, add_fact_kargs))
+            logger.debug("Treating fact (before special handler list) %s with attr_info %s and kargs %s", fact, attr_info, add_fact_kargs)
             # Below, go through the handlers in the special_ft_handler list --
             # if the predicate returns True for the fact, execute the handler
             # on the fact. If a handler returns False/None, the fact is *not*
@@ -1237,20 +1566,28 @@ class InfoObject(DingoModel):
             # fact -- otherwise the sequence of node identifiers is messed up!
 
             if special_ft_handler:
+                if profiler:
+                    token = profiler.start('special_handlers')
                 for (predicate, handler) in special_ft_handler:
                     if predicate(fact, attr_info):
                         handler_return_value = handler(self, fact, attr_info, add_fact_kargs)
                         if not handler_return_value:
                             break
-            logger.debug("Treating fact (before special handler list) %s with attr_info %s and kargs %s" % (fact, attr_info, add_fact_kargs))
+                if profiler:
+                    profiler.stop(token, rows=1)
+            logger.debug("Treating fact (before special handler list) %s with attr_info %s and kargs %s", fact, attr_info, add_fact_kargs)
             if (handler_return_value == True):
-                add_fact_kargs['ns_uri_dict'] = namespace_uri_2_pk_mapping
-                e2f_obj = self.add_fact(**add_fact_kargs)
+                add_fact_kargs.ns_uri_dict = namespace_uri_2_pk_mapping
+                if self._pending_facts is not None:
+                    # Queue the record itself rather than having 'add_fact' copy it
+                    self._pending_facts.append(add_fact_kargs)
+                    e2f_obj = None
+                else:
+                    e2f_obj = self.add_fact(**add_fact_kargs)
             elif not handler_return_value:
                 continue
             else:
                 e2f_obj = handler_return_value
-        self.set_name()
 
 
 
@@ -1274,7 +1611,7 @@ class InfoObject(DingoModel):
 
         if track_namespaces:
 
-            fact_thrus = self.fact_thru.all().prefetch_related(
+            fact_thrus = self.get_fact_thrus(
                 'fact__fact_term',
                 'fact__fact_values',
                 'fact__fact_values__fact_data_type',
@@ -1284,7 +1621,7 @@ class InfoObject(DingoModel):
                 'namespace_map__namespaces_thru__namespace',
                 'node_id')
         else:
-            fact_thrus = self.fact_thru.all().prefetch_related(
+            fact_thrus = self.get_fact_thrus(
                 'fact__fact_term',
                 'fact__fact_values',
                 'fact__fact_values__fact_data_type',
@@ -1409,36 +1746,75 @@ class InfoObject(DingoModel):
         If no fact has such a flag, the type is used
 
         """
-        name = None
-
-        name_schemas = self._DCM["InfoObjectNaming"].objects.filter(iobject_type=self.iobject_type).order_by(
-            'position').values_list('format_string', flat=True)
-
-        name_components = []
-
         # We retrieve all facts of the object
 
-        fact_list = self._DCM['Fact'].objects.filter(iobject_thru__iobject=self).order_by(
-            'iobject_thru__node_id__name').values_list('iobject_thru__node_id__name',
-                                                        'fact_term__term',
-                                                        'fact_term__attribute',
-                                                        'fact_values__value',
-                                                        'fact_values__storage_location',
-                                                        'value_iobject_id__latest__name')
+        if not self.parent_revision_id:
+            fact_list = self._DCM['Fact'].objects.filter(iobject_thru__iobject=self).order_by(
+                'iobject_thru__node_id__name').values_list('iobject_thru__node_id__name',
+                                                            'fact_term__term',
+                                                            'fact_term__attribute',
+                                                            'fact_values__value',
+                                                            'fact_values__storage_location',
+                                                            'value_iobject_id__latest__name')
+        else:
+            # For a copy-on-write revision, we retrieve the facts of the whole revision chain
+            # and keep those that make up this revision.
+            effective_pks = set(map(lambda x: x[0], self.get_effective_io2f_values().values()))
+            fact_list = map(lambda x: x[1:],
+                            filter(lambda x: x[0] in effective_pks,
+                                   self._DCM['Fact'].objects.filter(
+                                       iobject_thru__iobject__in=self.get_revision_chain()).order_by(
+                                       'iobject_thru__node_id__name').values_list('iobject_thru__pk',
+                                                                                  'iobject_thru__node_id__name',
+                                                                                  'fact_term__term',
+                                                                                  'fact_term__attribute',
+                                                                                  'fact_values__value',
+                                                                                  'fact_values__storage_location',
+                                                                                  'value_iobject_id__latest__name')))
+
+        return self.name_from_fact_list(fact_list)
+
+    def get_naming_schemas(self):
+        """
+        Return the format strings for naming objects of the iobject's type (see 'InfoObjectNaming');
+        the format strings are kept in the schema cache.
+        """
+        cache = get_schema_cache(self._DCM["InfoObjectNaming"])
+        name_schemas = cache.get(self.iobject_type_id) if cache is not None else None
+        if name_schemas is None:
+            name_schemas = list(self._DCM["InfoObjectNaming"].objects.filter(
+                iobject_type=self.iobject_type_id).order_by('position').values_list('format_string', flat=True))
+            if cache is not None:
+                cache.set(self.iobject_type_id, name_schemas)
+        return name_schemas
+
+    def name_from_fact_list(self, fact_list):
+        """
+        Determine the name of the object (see 'extract_name') from a list of
+        tuples (node id, fact term, attribute, value, storage location, name of referenced object),
+        one for each value of the object's facts, ordered by node id.
+        """
+        name = None
+
+        name_schemas = self.get_naming_schemas()
 
         # We build a dictionary that will then be used for the format string
 
         fact_dict = {}
         counter = 0
+
+        # The contents of values in the blob table are loaded in one go.
+
+        fact_list = list(fact_list)
+        blobs = blob_cache.load(map(lambda x: x[3],
+                                    filter(lambda x: x[4] == dingos.DINGOS_BLOB_TABLE, fact_list)))
+
         for (node_id, fact_term, attribute, value, storage_location, related_obj_name) in fact_list:
             #print fact_list[counter]
             if type(value)==type([]):
                 value = "%s,..." % value
             if storage_location == dingos.DINGOS_BLOB_TABLE:
-                try:
-                    value = BlobStorage.objects.get(sha256=value).content
-                except:
-                    value = "In blob table %s" % value
+                value = blobs.get(value, "In blob table %s" % value)
             elif related_obj_name:
                 value = related_obj_name
 
@@ -1601,6 +1977,22 @@ class InfoObject(DingoModel):
 dingos_class_map["InfoObject"] = InfoObject
 
 
+class InfoObjectRemovedNode(DingoModel):
+    """
+    Records for a copy-on-write revision (see 'InfoObject.parent_revision') that
+    the fact at the given node identifier of the parent revision is not
+    part of the revision.
+    """
+
+    iobject = models.ForeignKey(InfoObject,
+                                related_name='removed_nodes')
+
+    node_id = models.ForeignKey(NodeID)
+
+
+dingos_class_map["InfoObjectRemovedNode"] = InfoObjectRemovedNode
+
+
 class Identifier(DingoModel):
     """
     Each information object has an identifier, that consists of a name space,
@@ -1856,197 +2248,928 @@ class UserData(DingoModel):
 dingos_class_map["UserData"] = UserData
 
 
-
-def get_or_create_iobject(identifier_uid,
-                          identifier_namespace_uri,
-                          iobject_type_name,
-                          iobject_type_namespace_uri,
-                          iobject_type_revision_name,
-                          iobject_family_name,
-                          iobject_family_revision_name="",
-                          identifier_namespace_name="",
-                          timestamp=None,
-                          create_timestamp=None,
-                          overwrite=False,
-                          dingos_class_map=dingos_class_map):
+class ImportJob(DingoModel):
     """
-    Get or create an information object.
+    A file queued for import with an import command (see 'DingoImportCommand'):
+    jobs are created with the command's '--queue' option or with 'ImportJob.enqueue'
+    and carried out by the 'dingos_import_worker' command.
     """
 
-    # create or retrieve the iobject type and revision
+    QUEUED = 0
+    RUNNING = 1
+    DONE = 2
+    FAILED = 3
 
-    # create or retrieve identifier
+    STATUS = ((QUEUED, "Queued"),
+              (RUNNING, "Running"),
+              (DONE, "Done"),
+              (FAILED, "Failed"),
+    )
 
-    if not timestamp:
-        raise StandardError("You must supply a timestamp.")
+    command = models.CharField(max_length=255,
+                               help_text="Name of the import command (e.g., 'dingos_generic_xml_import') used for the import.")
 
-    id_namespace, created = dingos_class_map['IdentifierNameSpace'].objects.get_or_create(uri=identifier_namespace_uri)
+    filename = models.CharField(max_length=1024,
+                                help_text="Path of the file to be imported.")
 
-    if created and identifier_namespace_name:
-        id_namespace.name = identifier_namespace_name
-        id_namespace.save()
+    options = models.TextField(blank=True,
+                               help_text="JSON representation of the options passed to the import command.")
 
-    identifier, created = dingos_class_map['Identifier'].objects.get_or_create(uid=identifier_uid,
-                                                                              namespace=id_namespace,
-                                                                              defaults={'latest': None})
+    markings = models.ManyToManyField(InfoObject,
+                                      blank=True,
+                                      related_name='import_job_set')
 
-    iobject_type_namespace, created = dingos_class_map['DataTypeNameSpace'].objects.get_or_create(uri=iobject_type_namespace_uri)
+    status = models.SmallIntegerField(choices=STATUS,
+                                      default=QUEUED,
+                                      db_index=True)
 
-    iobject_family, created = dingos_class_map['InfoObjectFamily'].objects.get_or_create(name=iobject_family_name)
-    iobject_family_revision, created = dingos_class_map['Revision'].objects.get_or_create(
-        name=iobject_family_revision_name)
+    worker = models.CharField(max_length=255,
+                              blank=True,
+                              help_text="Host and process id of the worker that carried out the job.")
 
-    # create or retrieve the iobject type
-    iobject_type, created = dingos_class_map['InfoObjectType'].objects.get_or_create(name=iobject_type_name,
-                                                                                    iobject_family=iobject_family,
-                                                                                    namespace=iobject_type_namespace)
-    iobject_type_revision, created = dingos_class_map['Revision'].objects.get_or_create(name=iobject_type_revision_name)
+    created = models.DateTimeField(auto_now_add=True)
 
-    if not create_timestamp:
-        create_timestamp = timezone.now()
-    #if not timestamp:
-    #    timestamp = create_timestamp
-    #    iobject = overwrite
-    #    created = False
+    started = models.DateTimeField(null=True)
 
+    heartbeat = models.DateTimeField(null=True,
+                                     help_text="Last time the worker carrying out the job reported that it is alive.")
 
+    finished = models.DateTimeField(null=True)
 
-    iobject, created = dingos_class_map["InfoObject"].objects.get_or_create(identifier=identifier,
-                                                                           timestamp=timestamp,
-                                                                           defaults={'iobject_family': iobject_family,
-                                                                                     'iobject_family_revision': iobject_family_revision,
-                                                                                     'iobject_type': iobject_type,
-                                                                                     'iobject_type_revision': iobject_type_revision,
-                                                                                     'create_timestamp': create_timestamp})
-    if created:
-        iobject.set_name()
-        iobject.save()
-        identifier.latest = iobject
-        identifier.save()
+    seconds = models.FloatField(null=True,
+                                help_text="Time taken by the import in seconds.")
 
+    size = models.BigIntegerField(null=True,
+                                  help_text="Size of the imported file in bytes.")
 
-    elif overwrite:
-        iobject.timestamp = timestamp
-        iobject.create_timestamp = create_timestamp
-        iobject.iobject_family = iobject_family
-        iobject.iobject_family_revision = iobject_family_revision
-        iobject.iobject_type = iobject_type
-        iobject.iobject_type_revision = iobject_type_revision
-        iobject.set_name()
-        iobject.save()
+    error = models.TextField(blank=True,
+                             help_text="Traceback of the error that made the import fail.")
 
-    logger.debug(
-        "Created iobject id with %s , ts %s (created was %s) and overwrite as %s" % (iobject.identifier, timestamp, created, overwrite))
-    return iobject, created
+    class Meta:
+        ordering = ['pk']
 
+    @classmethod
+    def enqueue(cls, command, filename, markings=None, options=None):
+        """
+        Queue the import of the given file with the given import command.
+        """
+        job = cls.objects.create(command=command,
+                                 filename=filename,
+                                 options=json.dumps(options or {}))
+        if markings:
+            job.markings.add(*markings)
+        return job
+
+    @classmethod
+    def claim(cls, worker):
+        """
+        Claim the oldest queued job for the given worker and return it
+        (or None, if no job is queued).
 
-def get_or_create_fact(fact_term,
-                       fact_dt_name='String',
-                       fact_dt_namespace_uri=DINGOS_NAMESPACE_URI,
-                       values=None,
-                       value_iobject_id=None,
-                       value_iobject_ts=None,
-                       ):
-    """
-    Get or create a fact object.
-    """
+        A job is claimed with a conditional 'UPDATE' that only succeeds if the
+        job is still queued, so several workers can claim jobs at the same
+        time (also on databases without row locks): a worker that loses the
+        race for a job tries the next queued job.
+        """
+        while True:
+            candidates = list(cls.objects.filter(status=cls.QUEUED).values_list('pk', flat=True)[:10])
+            if not candidates:
+                return None
+            for pk in candidates:
+                now = timezone.now()
+                if cls.objects.filter(pk=pk, status=cls.QUEUED).update(status=cls.RUNNING,
+                                                                       worker=worker,
+                                                                       started=now,
+                                                                       heartbeat=now):
+                    return cls.objects.get(pk=pk)
+
+    @classmethod
+    def requeue_stale(cls, seconds):
+        """
+        Queue running jobs whose worker has not reported to be alive (see 'beat') for the given
+        number of seconds again, e.g., because the worker has been killed. Returns the number
+        of queued jobs.
+        """
+        stale_jobs = cls.objects.filter(status=cls.RUNNING,
+                                        heartbeat__lt=timezone.now() - timedelta(seconds=seconds))
+        return stale_jobs.update(status=cls.QUEUED,
+                                 worker='',
+                                 started=None,
+                                 heartbeat=None)
+
+    def beat(self):
+        """
+        Record that the worker carrying out the job is alive. Returns False if
+        the job is no longer claimed by the worker (e.g., because it has been requeued).
+        """
+        return bool(self.__class__.objects.filter(pk=self.pk,
+                                                  status=self.RUNNING,
+                                                  worker=self.worker).update(heartbeat=timezone.now()))
 
-    if not values:
-        values = []
+    def get_options(self):
+        return json.loads(self.options or '{}')
 
+    def finish(self, result):
+        """
+        Record the result (as returned by 'DingoImportCommand.import_file') of the job.
+        """
+        self.status = self.DONE if result['success'] else self.FAILED
+        self.finished = timezone.now()
+        self.seconds = result.get('seconds')
+        self.size = result.get('size')
+        self.error = result.get('error') or ''
+        self.save(update_fields=['status', 'finished', 'seconds', 'size', 'error'])
 
-    vocab_namespace, created = dingos_class_map['DataTypeNameSpace'].objects.get_or_create(uri=fact_dt_namespace_uri)
+    def __unicode__(self):
+        return "%s (%s)" % (self.filename, self.get_status_display())
 
-    fact_data_type, created = dingos_class_map['FactDataType'].objects.get_or_create(name=fact_dt_name,
-                                                                                    namespace=vocab_namespace)
 
-    # Maybe we already have a fact with exactly the same fact term and the same fact values?
-    # We start by looking at the number of values
+dingos_class_map["ImportJob"] = ImportJob
 
-    value_objects = []
 
-    for value in values:
-        storage_location=dingos.DINGOS_VALUES_TABLE
-        # collect (create or get) the required value objects
-        if value == None:
-            value = ''
-        if isinstance(value,tuple):
-            # If a value is wrapped in a tuple, the second component of the tuple
-            # specifies the storage location of the value.
-            value, storage_location = value
+class ImportCheckpoint(DingoModel):
+    """
+    Journal entry recording the outcome of the import of a file with an import command
+    (see 'DingoImportCommand.import_file'). Files are identified by the SHA256 digest
+    of their content.
+
+    The entry for a successful import is written within the transaction of the import,
+    so it exists if and only if the import has been committed. The '--resume' option
+    of the import commands skips files that have been imported successfully with the same
+    command before.
+    """
 
-        if storage_location == dingos.DINGOS_VALUES_TABLE:
-            # If the value is larger than a given size, the value is written to disk, instead.
-            # We use this to keep too large values out of the database. Depending on how the
-            # database is set up, this may be necessary to allow indexing, which in turn is
-            # required to check uniqueness on values.
+    DONE = 2
+    FAILED = 3
 
-            if len(value) > dingos.DINGOS_MAX_VALUE_SIZE_WRITTEN_TO_VALUE_TABLE:
-                (value_hash,storage_location) = write_large_value(value)
-                value = value_hash
+    STATUS = ((DONE, "Done"),
+              (FAILED, "Failed"),
+    )
 
+    command = models.CharField(max_length=255,
+                               help_text="Name of the import command (e.g., 'dingos_generic_xml_import') used for the import.")
 
-        fact_value, created = dingos_class_map['FactValue'].objects.get_or_create(value=value,
-                                                                                 fact_data_type=fact_data_type,
-                                                                                 storage_location=storage_location)
-        value_objects.append(fact_value)
+    filename = models.CharField(max_length=1024,
+                                help_text="Path of the imported file.")
 
+    digest = models.CharField(max_length=64,
+                              db_index=True,
+                              help_text="SHA256 digest of the content of the imported file.")
 
+    status = models.SmallIntegerField(choices=STATUS)
 
-    # Do we already have a fact with given fact term and given values?
-    #
-    # For understanding the query below better, see https://groups.google.com/forum/#!topic/django-users/X9TCSrBn57Y.
-    # The double query is necessary, because the first count counts the number of selected
-    # fact_value objects, not the number of total objects for each fact.
-
-
-    possibly_matching_facts = Fact.objects.filter(fact_values__in=value_objects,
-                                                  value_iobject_id=value_iobject_id,
-                                                  value_iobject_ts=value_iobject_ts,
-                                                  fact_term=fact_term
-    ).values_list('pk',flat=True)
-
-    matching_facts = Fact.objects.filter(pk__in=list(possibly_matching_facts)). \
-        annotate(num_values=Count('fact_values')). \
-        filter(num_values=len(value_objects)). \
-        exclude(id__in= \
-        Fact.objects.filter(pk__in=possibly_matching_facts).annotate(total_values=Count('fact_values')). \
-            filter(total_values__gt=len(value_objects)))
-
-    # Below, for educational purposes, the original query until Dingos 0.2.0, which got *really*
-    # slow with lot's of objects in the system. The reason for this are the last three lines:
-    # the exclude-statement required the database to count the the number of values for each
-    # Fact in the system... but we are really only interested into facts with the same
-    # fact_term, value_iobject_id and value_iobject_ts...
-
-    #matching_facts = Fact.objects.filter(fact_values__in=value_objects). \
-    #    annotate(num_values=Count('fact_values')). \
-    #    filter(num_values=len(value_objects)). \
-    #    filter(value_iobject_id=value_iobject_id). \
-    #    filter(value_iobject_ts=value_iobject_ts). \
-    #    filter(fact_term=fact_term). \
-    #    exclude(id__in= \
-    #    Fact.objects.annotate(total_values=Count('fact_values')). \
-    #        filter(total_values__gt=len(value_objects)))
-
-    created = True
-    try:
-        fact_obj = matching_facts[0]
-        created = False
-        logger.debug("FOUND MATCHING OBJECT with pk %s" % fact_obj.pk)
-    except:
-        fact_obj = dingos_class_map['Fact'].objects.create(fact_term=fact_term,
-                                                          value_iobject_id=value_iobject_id,
-                                                          value_iobject_ts=value_iobject_ts,
-                                                           )
+    created = models.DateTimeField(auto_now_add=True)
+
+    seconds = models.FloatField(null=True,
+                                help_text="Time taken by the import in seconds.")
+
+    size = models.BigIntegerField(null=True,
+                                  help_text="Size of the imported file in bytes.")
+
+    error = models.TextField(blank=True,
+                             help_text="Traceback of the error that made the import fail.")
+
+    class Meta:
+        ordering = ['pk']
+
+    @classmethod
+    def record(cls, command, result):
+        """
+        Record the result (as returned by 'DingoImportCommand.import_file', i.e., with the
+        additional key 'digest') of the import of a file with the given command.
+        """
+        return cls.objects.create(command=command,
+                                  filename=result['filename'],
+                                  digest=result['digest'] or '',
+                                  status=cls.DONE if result['success'] else cls.FAILED,
+                                  seconds=result.get('seconds'),
+                                  size=result.get('size'),
+                                  error=result.get('error') or '')
+
+    @classmethod
+    def completed_digests(cls, command, digests):
+        """
+        Return the set of those of the given digests for which a successful import
+        with the given command has been recorded.
+        """
+        completed = set()
+        for chunk in _chunks(sorted(set(filter(None, digests)))):
+            completed.update(cls.objects.filter(command=command,
+                                                status=cls.DONE,
+                                                digest__in=chunk).values_list('digest', flat=True))
+        return completed
+
+    def __unicode__(self):
+        return "%s (%s)" % (self.filename, self.get_status_display())
+
+
+
+# Schema information (namespaces, data types, fact terms, information-object types,
+# etc.) is looked up for each and every fact that is imported, but hardly ever
+# changes. We therefore keep the objects in process-wide caches (one per model)
+# that map the natural key of an object to the object.
+#
+# The caches are invalidated whenever an object of the respective model is
+# changed or deleted via the ORM. Note that changes that bypass the ORM's signals
+# (e.g., queryset updates or changes made by other processes) are not noticed;
+# also, objects created within a transaction that is rolled back remain
+# in the cache: in such cases, 'clear_schema_caches' must be called.
+
+SCHEMA_CACHED_MODELS = ['DataTypeNameSpace',
+                        'FactDataType',
+                        'FactTerm',
+                        'FactTerm2Type',
+                        'IdentifierNameSpace',
+                        'InfoObjectFamily',
+                        'InfoObjectNaming',
+                        'InfoObjectType',
+                        'Revision']
+
+schema_caches = {}
+
+# Cache of the (FactTerm2Type, FactDataType) pairs known to be linked.
+
+FACT_DATA_TYPE_LINKS = 'FactTerm2Type.fact_data_types'
+
+
+def _invalidate_schema_cache(sender, created=False, **kwargs):
+    if created and sender.__name__ != 'InfoObjectNaming':
+        # A newly created object cannot have made a cached entry stale
+        # (except for naming schemas, which are cached per iobject type)
+        return
+    cache = schema_caches.get(sender)
+    if cache is not None:
+        cache.clear()
+    if sender.__name__ in ['FactTerm2Type', 'FactDataType']:
+        cache = schema_caches.get(FACT_DATA_TYPE_LINKS)
+        if cache is not None:
+            cache.clear()
+
+
+def _invalidate_fact_data_type_links(sender, action=None, **kwargs):
+    if action in ['post_remove', 'post_clear']:
+        cache = schema_caches.get(FACT_DATA_TYPE_LINKS)
+        if cache is not None:
+            cache.clear()
+
+
+def get_schema_cache(model):
+    """
+    Return the cache for the given model (or for the links between FactTerm2Type
+    and FactDataType objects, if FACT_DATA_TYPE_LINKS is passed) or None,
+    if the model is not cached or the caches are disabled.
+    """
+    try:
+        return schema_caches[model]
+    except KeyError:
+        pass
+
+    if not dingos.DINGOS_SCHEMA_CACHE_SIZE:
+        return None
+
+    if model == FACT_DATA_TYPE_LINKS:
+        m2m_changed.connect(_invalidate_fact_data_type_links,
+                            sender=dingos_class_map['FactTerm2Type'].fact_data_types.through,
+                            dispatch_uid='dingos_schema_cache_links')
+    elif model.__name__ in SCHEMA_CACHED_MODELS:
+        post_save.connect(_invalidate_schema_cache,
+                          sender=model,
+                          dispatch_uid='dingos_schema_cache_save_%s' % id(model))
+        post_delete.connect(_invalidate_schema_cache,
+                            sender=model,
+                            dispatch_uid='dingos_schema_cache_delete_%s' % id(model))
+    else:
+        return None
+
+    return schema_caches.setdefault(model, LRUCache(maxsize=dingos.DINGOS_SCHEMA_CACHE_SIZE))
+
+
+def clear_schema_caches():
+    """
+    Empty all schema caches, the intern map of node identifiers
+    and the cache of namespace maps.
+    """
+    for cache in schema_caches.values():
+        cache.clear()
+    node_id_intern_map.clear()
+    namespace_map_cache.clear()
+
+
+@contextmanager
+def atomic_import(using=None):
+    """
+    Like 'transaction.atomic' (i.e., a transaction or, if nested, a savepoint), but
+    the schema caches are cleared if the block is rolled back, since they
+    may contain objects that were created within the block.
+    """
+    try:
+        with transaction.atomic(using=using):
+            yield
+    except:
+        clear_schema_caches()
+        raise
+
+
+def schema_cache_stats():
+    """
+    Return a dictionary mapping the names of cached models to a dictionary
+    with the number of hits, misses and cached entries.
+    """
+    result = {}
+    for (model, cache) in schema_caches.items():
+        result[getattr(model, '__name__', model)] = cache.stats()
+    return result
+
+
+class NodeIDInternMap(object):
+    """
+    Process-wide map from the names of node identifiers ('N0001:L0003:A0000', etc.)
+    to the primary keys of the corresponding NodeID objects (and back).
+    There are comparatively few distinct node identifiers, so all node identifiers
+    are loaded into the map on first use. Missing node identifiers
+    are created with a single 'bulk_create'.
+
+    Like the schema caches, the map is cleared when a NodeID object
+    is changed or deleted via the ORM and by 'clear_schema_caches'.
+    """
+
+    def __init__(self):
+        self._pks = {}
+        self._nodes = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def _add(self, name, pk):
+        name = force_text(name)
+        self._pks[name] = pk
+        self._nodes[pk] = dingos_class_map['NodeID'](pk=pk, name=name)
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def load(self):
+        with self._lock:
+            if not self._loaded:
+                for (name, pk) in dingos_class_map['NodeID'].objects.values_list('name', 'pk'):
+                    self._add(name, pk)
+                self._loaded = True
+
+    def clear(self):
+        with self._lock:
+            self._pks = {}
+            self._nodes = {}
+            self._loaded = False
+
+    def get_pks(self, names):
+        """
+        Return a dictionary mapping the given names (as unicode strings)
+        to the primary keys of NodeID objects; missing NodeID objects are created.
+        """
+        self.load()
+        names = set(map(force_text, names))
+        missing = filter(lambda x: x not in self._pks, names)
+        if missing:
+            created_pks = bulk_get_or_create(dingos_class_map['NodeID'],
+                                             ('name',),
+                                             map(lambda x: (x,), missing))
+            with self._lock:
+                for ((name,), pk) in created_pks.items():
+                    self._add(name, pk)
+        return dict(map(lambda x: (x, self._pks[x]), names))
+
+    def lookup(self, names):
+        """
+        Like 'get_pks', but missing NodeID objects are not created (and are not part of the result).
+        """
+        self.load()
+        names = set(map(force_text, names))
+        return dict(map(lambda x: (x, self._pks[x]), filter(lambda x: x in self._pks, names)))
+
+    def get_node(self, name):
+        """
+        Return the NodeID object with the given name (creating it if necessary).
+        The returned object is shared and must not be changed.
+        """
+        return self._nodes[self.get_pks([name])[force_text(name)]]
+
+    def get_nodes(self, pks):
+        """
+        Return a dictionary mapping the given primary keys to NodeID objects.
+        """
+        self.load()
+        missing = filter(lambda x: x not in self._nodes, set(pks))
+        if missing:
+            with self._lock:
+                for chunk in _chunks(missing):
+                    for (name, pk) in dingos_class_map['NodeID'].objects.filter(pk__in=chunk).values_list('name', 'pk'):
+                        self._add(name, pk)
+        return dict(map(lambda x: (x, self._nodes.get(x)), pks))
+
+
+node_id_intern_map = NodeIDInternMap()
+
+
+def _invalidate_node_id_intern_map(sender, created=False, **kwargs):
+    if not created:
+        node_id_intern_map.clear()
+
+
+post_save.connect(_invalidate_node_id_intern_map,
+                  sender=NodeID,
+                  dispatch_uid='dingos_node_id_intern_map_save')
+post_delete.connect(_invalidate_node_id_intern_map,
+                    sender=NodeID,
+                    dispatch_uid='dingos_node_id_intern_map_delete')
+
+
+class NamespaceMapCache(object):
+    """
+    Process-wide cache mapping pairs of a fact-term primary key and
+    a tuple of namespace URIs (one per position, None for positions without
+    namespace, see 'make_key') to the primary key of a matching FactTermNamespaceMap.
+
+    The namespace maps of a fact term are loaded on first use of the fact term;
+    afterwards, finding the namespace map for a fact is a dictionary lookup.
+    The cache is cleared when a namespace map or one of its positional
+    namespaces is changed or deleted via the ORM and by 'clear_schema_caches'.
+    """
+
+    def __init__(self):
+        self._maps = {}
+        self._loaded_terms = set()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(namespaces):
+        """
+        Turn a list of (namespace URI, namespace slug) pairs as
+        produced by 'DingoObjDict.flatten' into a key. Trailing positions
+        without namespace are not recorded in a namespace map and are therefore dropped
+        from the key; an empty key means that no namespace map is required.
+        """
+        uris = map(lambda x: force_text(x[0]) if x[0] else None, namespaces)
+        while uris and uris[-1] is None:
+            uris.pop()
+        return tuple(uris)
+
+    @staticmethod
+    def digest(key):
+        """
+        Return the digest of a key as stored in the 'key' field of FactTermNamespaceMap.
+        """
+        return hashlib.sha256(force_bytes(json.dumps(key))).hexdigest()
+
+    def load(self, fact_term_pks):
+        """
+        Load the namespace maps of all given fact terms that have not been loaded yet.
+        """
+        missing = filter(lambda x: x not in self._loaded_terms, set(fact_term_pks))
+        if not missing:
+            return
+        with self._lock:
+            for chunk in _chunks(sorted(missing)):
+                map_elts = dingos_class_map['FactTermNamespaceMap'].objects.filter(fact_term__in=chunk).order_by(
+                    'id', 'namespaces_thru__position').values_list('fact_term',
+                                                                   'id',
+                                                                   'namespaces_thru__position',
+                                                                   'namespaces_thru__namespace__uri')
+                for (map_pk, group) in itertools.groupby(map_elts, lambda x: x[1]):
+                    group = filter(lambda x: x[2] is not None, group)
+                    if not group:
+                        continue
+                    uris = [None] * (group[-1][2] + 1)
+                    for (fact_term_pk, map_pk, position, uri) in group:
+                        uris[position] = force_text(uri)
+                    # If there are several equivalent maps, the oldest one is used.
+                    self._maps.setdefault((group[0][0], tuple(uris)), map_pk)
+                self._loaded_terms.update(chunk)
+
+    def is_loaded(self, fact_term_pk):
+        return fact_term_pk in self._loaded_terms
+
+    def get(self, fact_term_pk, key):
+        """
+        Return the primary key of the namespace map for the given fact term and key or None.
+        """
+        self.load([fact_term_pk])
+        return self._maps.get((fact_term_pk, key))
+
+    def add(self, fact_term_pk, key, map_pk):
+        with self._lock:
+            self._maps.setdefault((fact_term_pk, key), map_pk)
+
+    def clear(self):
+        with self._lock:
+            self._maps = {}
+            self._loaded_terms = set()
+
+
+namespace_map_cache = NamespaceMapCache()
+
+
+def get_or_create_namespace_map(fact_term_pk, key):
+    """
+    Return the primary key of the namespace map of the given fact term for the given
+    key (see 'NamespaceMapCache.make_key') and whether the map has been created; the
+    positional namespaces of a created map are to be added by the caller.
+
+    The map is created within a savepoint: if another process has created the same
+    map in the meantime, the unique key on fact term and key digest makes the creation
+    fail and the existing map is used.
+    """
+    ns_map_model = dingos_class_map['FactTermNamespaceMap']
+    digest = NamespaceMapCache.digest(key)
+    try:
+        with transaction.atomic():
+            return (ns_map_model.objects.create(fact_term_id=fact_term_pk, key=digest).pk, True)
+    except IntegrityError:
+        return (ns_map_model.objects.get(fact_term_id=fact_term_pk, key=digest).pk, False)
+
+
+def _invalidate_namespace_map_cache(sender, created=False, **kwargs):
+    if not created:
+        namespace_map_cache.clear()
+
+
+for (model_name, action, signal) in [('FactTermNamespaceMap', 'save', post_save),
+                                     ('FactTermNamespaceMap', 'delete', post_delete),
+                                     ('PositionalNamespace', 'save', post_save),
+                                     ('PositionalNamespace', 'delete', post_delete)]:
+    signal.connect(_invalidate_namespace_map_cache,
+                   sender=dingos_class_map[model_name],
+                   dispatch_uid='dingos_namespace_map_cache_%s_%s' % (action, model_name))
+
+
+class BlobCache(object):
+    """
+    Process-wide read-through cache for the contents of the blob table (see 'BlobStorage'),
+    bounded by the total size of the cached contents (DINGOS_BLOB_CACHE_SIZE).
+
+    'load' fetches all requested contents that are not cached with a single 'IN' query
+    (per BULK_QUERY_CHUNK_SIZE digests), so code that treats many blob-backed values
+    should collect their digests and load them up front rather than calling 'get'
+    value by value. 'load_previews' only transfers the start of the contents.
+    The cache is cleared when a blob is changed or deleted via the ORM.
+    """
+
+    def __init__(self, maxsize=None):
+        if maxsize is None:
+            maxsize = dingos.DINGOS_BLOB_CACHE_SIZE
+        self.contents = SizeBoundedLRUCache(maxsize=maxsize)
+
+    def load(self, digests):
+        """
+        Return a dictionary mapping each of the given digests for which there is a blob
+        to the blob's content.
+        """
+        result = {}
+        missing = []
+        for digest in set(digests):
+            content = self.contents.get(digest)
+            if content is None:
+                missing.append(digest)
+            else:
+                result[digest] = content
+        for chunk in _chunks(sorted(missing)):
+            for (digest, content) in dingos_class_map['BlobStorage'].objects.filter(
+                    sha256__in=chunk).values_list('sha256', 'content'):
+                self.contents.set(digest, content)
+                result[digest] = content
+        return result
+
+    def get(self, digest, default=None):
+        return self.load([digest]).get(digest, default)
+
+    def load_previews(self, digests, length):
+        """
+        Return a dictionary mapping each of the given digests for which there is a blob
+        to a pair of the first 'length' characters of the blob's content and a flag
+        that tells whether the content is longer than that.
+        """
+        result = {}
+        missing = []
+        for digest in set(digests):
+            # A preview is cached as the first 'length'+1 characters, so
+            # that we can tell whether the content has been truncated.
+            preview = self.contents.get(digest)
+            if preview is None:
+                preview = self.contents.get((digest, length))
+            if preview is None:
+                missing.append(digest)
+            else:
+                result[digest] = (preview[:length], len(preview) > length)
+        if missing:
+            blob_model = dingos_class_map['BlobStorage']
+            content_column = connections[blob_model.objects.db].ops.quote_name('content')
+            for chunk in _chunks(sorted(missing)):
+                for (digest, preview) in blob_model.objects.filter(sha256__in=chunk).extra(
+                        select={'preview': 'SUBSTR(%s, 1, %%s)' % content_column},
+                        select_params=(length + 1,)).values_list('sha256', 'preview'):
+                    self.contents.set((digest, length), preview)
+                    result[digest] = (preview[:length], len(preview) > length)
+        return result
+
+    def preview(self, digest, length=None, default=None):
+        """
+        Return the first 'length' (default: DINGOS_BLOB_PREVIEW_LENGTH) characters of the blob's
+        content, followed by '...' if the content is longer. If the length is 0, the
+        whole content is returned.
+        """
+        if length is None:
+            length = dingos.DINGOS_BLOB_PREVIEW_LENGTH
+        if not length:
+            return self.get(digest, default)
+        try:
+            (preview, truncated) = self.load_previews([digest], length)[digest]
+        except KeyError:
+            return default
+        return "%s..." % preview if truncated else preview
+
+    def clear(self):
+        self.contents.clear()
+
+
+blob_cache = BlobCache()
+
+
+def _invalidate_blob_cache(sender, created=False, **kwargs):
+    if not created:
+        blob_cache.clear()
+
+
+post_save.connect(_invalidate_blob_cache,
+                  sender=dingos_class_map['BlobStorage'],
+                  dispatch_uid='dingos_blob_cache_save')
+post_delete.connect(_invalidate_blob_cache,
+                    sender=dingos_class_map['BlobStorage'],
+                    dispatch_uid='dingos_blob_cache_delete')
+
+
+def _schema_cache_key(lookup):
+    """
+    Build the cache key from a dictionary mapping field names to values; for
+    foreign-key fields, the value may be an object or its primary key.
+    """
+    return _bulk_key(map(lambda x: getattr(x[1], 'pk', x[1]),
+                         sorted(lookup.items())))
+
+
+def get_or_create_cached(model, defaults=None, **lookup):
+    """
+    Like 'model.objects.get_or_create(defaults=defaults, **lookup)', but
+    the schema cache of the model (if any) is consulted first.
+    """
+    if not defaults:
+        defaults = {}
+
+    cache = get_schema_cache(model)
+    if cache is None:
+        return model.objects.get_or_create(defaults=defaults, **lookup)
+
+    key = _schema_cache_key(lookup)
+    obj = cache.get(key)
+    if obj is not None:
+        return obj, False
+
+    obj, created = model.objects.get_or_create(defaults=defaults, **lookup)
+    cache.set(key, obj)
+    return obj, created
+
+
+def link_fact_data_type(fact_term_2_type, fact_dt):
+    """
+    Make sure that the data type 'fact_dt' is registered for the
+    given FactTerm2Type object.
+    """
+    cache = get_schema_cache(FACT_DATA_TYPE_LINKS)
+    key = (fact_term_2_type.pk, fact_dt.pk)
+    if cache is not None and cache.get(key):
+        return
+    try:
+        with transaction.atomic():
+            fact_term_2_type.fact_data_types.add(fact_dt)
+    except IntegrityError:
+        # Another process has linked the data type in the meantime.
+        pass
+    if cache is not None:
+        cache.set(key, True)
+
+
+def get_or_create_iobject(identifier_uid,
+                          identifier_namespace_uri,
+                          iobject_type_name,
+                          iobject_type_namespace_uri,
+                          iobject_type_revision_name,
+                          iobject_family_name,
+                          iobject_family_revision_name="",
+                          identifier_namespace_name="",
+                          timestamp=None,
+                          create_timestamp=None,
+                          overwrite=False,
+                          content_digest='',
+                          dingos_class_map=dingos_class_map):
+    """
+    Get or create an information object.
+    """
+
+    # create or retrieve the iobject type and revision
+
+    # create or retrieve identifier
+
+    if not timestamp:
+        raise StandardError("You must supply a timestamp.")
+
+    id_namespace, created = get_or_create_cached(dingos_class_map['IdentifierNameSpace'], uri=identifier_namespace_uri)
+
+    if created and identifier_namespace_name:
+        id_namespace.name = identifier_namespace_name
+        id_namespace.save()
+
+    identifier, created = dingos_class_map['Identifier'].objects.get_or_create(uid=identifier_uid,
+                                                                              namespace=id_namespace,
+                                                                              defaults={'latest': None})
+
+    iobject_type_namespace, created = get_or_create_cached(dingos_class_map['DataTypeNameSpace'], uri=iobject_type_namespace_uri)
+
+    iobject_family, created = get_or_create_cached(dingos_class_map['InfoObjectFamily'], name=iobject_family_name)
+    iobject_family_revision, created = get_or_create_cached(dingos_class_map['Revision'],
+                                                              name=iobject_family_revision_name)
+
+    # create or retrieve the iobject type
+    iobject_type, created = get_or_create_cached(dingos_class_map['InfoObjectType'],
+                                                  name=iobject_type_name,
+                                                  iobject_family=iobject_family,
+                                                  namespace=iobject_type_namespace)
+    iobject_type_revision, created = get_or_create_cached(dingos_class_map['Revision'], name=iobject_type_revision_name)
+
+    if not create_timestamp:
+        create_timestamp = timezone.now()
+    #if not timestamp:
+    #    timestamp = create_timestamp
+    #    iobject = overwrite
+    #    created = False
+
+
+
+    iobject, created = dingos_class_map["InfoObject"].objects.get_or_create(identifier=identifier,
+                                                                           timestamp=timestamp,
+                                                                           defaults={'iobject_family': iobject_family,
+                                                                                     'iobject_family_revision': iobject_family_revision,
+                                                                                     'iobject_type': iobject_type,
+                                                                                     'iobject_type_revision': iobject_type_revision,
+                                                                                     'create_timestamp': create_timestamp,
+                                                                                     'content_digest': content_digest})
+    if created:
+        # The object is named when facts are added with 'from_dict'
+        identifier.latest = iobject
+        identifier.save()
+
+
+    elif overwrite:
+        iobject.timestamp = timestamp
+        iobject.create_timestamp = create_timestamp
+        iobject.iobject_family = iobject_family
+        iobject.iobject_family_revision = iobject_family_revision
+        iobject.iobject_type = iobject_type
+        iobject.iobject_type_revision = iobject_type_revision
+        iobject.content_digest = content_digest
+        iobject.save()
+
+    logger.debug(
+        "Created iobject id with %s , ts %s (created was %s) and overwrite as %s" % (iobject.identifier, timestamp, created, overwrite))
+    return iobject, created
+
+
+def get_or_create_fact(fact_term,
+                       fact_dt_name='String',
+                       fact_dt_namespace_uri=DINGOS_NAMESPACE_URI,
+                       values=None,
+                       value_iobject_id=None,
+                       value_iobject_ts=None,
+                       ):
+    """
+    Get or create a fact object.
+    """
+
+    if not values:
+        values = []
+
+
+    vocab_namespace, created = get_or_create_cached(dingos_class_map['DataTypeNameSpace'], uri=fact_dt_namespace_uri)
+
+    fact_data_type, created = get_or_create_cached(dingos_class_map['FactDataType'],
+                                                    name=fact_dt_name,
+                                                    namespace=vocab_namespace)
+
+    # Maybe we already have a fact with exactly the same fact term and the same fact values?
+    # We start by looking at the number of values
+
+    value_objects = []
+
+    for value in values:
+        storage_location=dingos.DINGOS_VALUES_TABLE
+        # collect (create or get) the required value objects
+        if value == None:
+            value = ''
+        if isinstance(value,tuple):
+            # If a value is wrapped in a tuple, the second component of the tuple
+            # specifies the storage location of the value.
+            value, storage_location = value
+
+        if storage_location == dingos.DINGOS_VALUES_TABLE:
+            # If the value is larger than a given size, the value is written to disk, instead.
+            # We use this to keep too large values out of the database. Depending on how the
+            # database is set up, this may be necessary to allow indexing, which in turn is
+            # required to check uniqueness on values.
+
+            if len(value) > dingos.DINGOS_MAX_VALUE_SIZE_WRITTEN_TO_VALUE_TABLE:
+                (value_hash,storage_location) = write_large_value(value)
+                value = value_hash
+
+
+        fact_value, created = dingos_class_map['FactValue'].objects.get_or_create(value_hash=FactValue.digest(value),
+                                                                                 fact_data_type=fact_data_type,
+                                                                                 storage_location=storage_location,
+                                                                                 defaults={'value': value})
+        value_objects.append(fact_value)
+
+
+
+    # Do we already have a fact with given fact term and given values?
+    #
+    # Until Dingos 0.2.1, this was determined with a rather expensive query that counted
+    # the values of all facts with the given fact term and one of the given values. Now,
+    # each fact carries a signature calculated from fact term, values and referenced
+    # iobject, so the lookup is a simple (indexed) equality test.
+    #
+    # As before, facts without values and facts for which a value has been
+    # given several times are not looked up (and thus always created anew).
+
+    value_pks = map(lambda x: x.pk, value_objects)
+
+    signature = Fact.calculate_signature(fact_term.pk,
+                                         value_pks,
+                                         getattr(value_iobject_id, 'pk', value_iobject_id),
+                                         value_iobject_ts)
+
+    fact_obj = None
+    if value_pks and len(set(value_pks)) == len(value_pks):
+        matching_facts = dingos_class_map['Fact'].objects.filter(signature=signature).order_by('pk')[:1]
+        if matching_facts:
+            fact_obj = matching_facts[0]
+            logger.debug("FOUND MATCHING OBJECT with pk %s" % fact_obj.pk)
+
+    created = False
+    if not fact_obj:
+        created = True
+        fact_obj = dingos_class_map['Fact'].objects.create(fact_term=fact_term,
+                                                          value_iobject_id=value_iobject_id,
+                                                          value_iobject_ts=value_iobject_ts,
+                                                          signature=signature)
 
         fact_obj.fact_values.add(*value_objects)
-        fact_obj.save()
 
 
     return fact_obj, created
 
 
+def calculate_fact_signatures(facts=None, chunk_size=1000):
+    """
+    Calculate and store the signatures of the given facts (a queryset; by default,
+    all facts without signature). The facts are treated in chunks of the given size;
+    the function yields the number of treated facts after each chunk.
+    """
+    if facts is None:
+        facts = dingos_class_map['Fact'].objects.filter(signature='')
+
+    fact_values_model = dingos_class_map['Fact'].fact_values.through
+
+    last_pk = 0
+    count = 0
+    while True:
+        chunk = list(facts.filter(pk__gt=last_pk).order_by('pk').values_list('pk',
+                                                                             'fact_term_id',
+                                                                             'value_iobject_id',
+                                                                             'value_iobject_ts')[:chunk_size])
+        if not chunk:
+            break
+
+        value_pks = {}
+        for (fact_pk, value_pk) in fact_values_model.objects.filter(fact_id__in=map(lambda x: x[0], chunk)).values_list(
+                'fact_id', 'factvalue_id'):
+            value_pks.setdefault(fact_pk, []).append(value_pk)
+
+        with transaction.atomic():
+            for (fact_pk, fact_term_pk, vio_pk, ts) in chunk:
+                signature = Fact.calculate_signature(fact_term_pk, value_pks.get(fact_pk, []), vio_pk, ts)
+                dingos_class_map['Fact'].objects.filter(pk=fact_pk).update(signature=signature)
+
+        last_pk = chunk[-1][0]
+        count += len(chunk)
+        yield count
+
+
 def get_or_create_fact_term(iobject_family_name,
                             fact_term_name,
                             fact_term_attribute,
@@ -2067,15 +3190,15 @@ def get_or_create_fact_term(iobject_family_name,
 
     # create or retrieve the enrichment type and revision
 
-    iobject_family, created = dingos_class_map['InfoObjectFamily'].objects.get_or_create(name=iobject_family_name)
+    iobject_family, created = get_or_create_cached(dingos_class_map['InfoObjectFamily'], name=iobject_family_name)
 
     # create or retrieve namespace of data type
 
-    fact_dt_namespace, created = dingos_class_map['DataTypeNameSpace'].objects.get_or_create(uri=fact_dt_namespace_uri)
+    fact_dt_namespace, created = get_or_create_cached(dingos_class_map['DataTypeNameSpace'], uri=fact_dt_namespace_uri)
 
     # create or retrieve namespace of the infoobject type
 
-    iobject_type_namespace, created = dingos_class_map['DataTypeNameSpace'].objects.get_or_create(uri=iobject_type_namespace_uri)
+    iobject_type_namespace, created = get_or_create_cached(dingos_class_map['DataTypeNameSpace'], uri=iobject_type_namespace_uri)
 
     if created and fact_dt_namespace_name:
         fact_dt_namespace.name = fact_dt_namespace_name
@@ -2083,42 +3206,49 @@ def get_or_create_fact_term(iobject_family_name,
 
 
     # create or retrieve the fact-value data type object
-    fact_dt, created = dingos_class_map['FactDataType'].objects.get_or_create(name=fact_dt_name,
-                                                                              namespace=fact_dt_namespace)
+    fact_dt, created = get_or_create_cached(dingos_class_map['FactDataType'],
+                                             name=fact_dt_name,
+                                             namespace=fact_dt_namespace)
 
     if created:
         fact_dt.kind = fact_dt_kind
         fact_dt.save()
 
     # create or retreive the iobject type
-    iobject_type, created = dingos_class_map['InfoObjectType'].objects.get_or_create(name=iobject_type_name,
-                                                                                    iobject_family=iobject_family,
-                                                                                    namespace=iobject_type_namespace)
+    iobject_type, created = get_or_create_cached(dingos_class_map['InfoObjectType'],
+                                                  name=iobject_type_name,
+                                                  iobject_family=iobject_family,
+                                                  namespace=iobject_type_namespace)
 
-    fact_term, created = dingos_class_map['FactTerm'].objects.get_or_create(term=fact_term_name,
-                                                                           attribute=fact_term_attribute)
+    fact_term, created = get_or_create_cached(dingos_class_map['FactTerm'],
+                                              term=fact_term_name,
+                                              attribute=fact_term_attribute)
 
-    fact_term_2_type, dummy = dingos_class_map['FactTerm2Type'].objects.get_or_create(fact_term=fact_term,
-                                                                                     iobject_type=iobject_type,
-                                                                                     )
+    fact_term_2_type, dummy = get_or_create_cached(dingos_class_map['FactTerm2Type'],
+                                                   fact_term=fact_term,
+                                                   iobject_type=iobject_type)
 
-    fact_term_2_type.fact_data_types.add(fact_dt)
-
-    fact_term_2_type.save()
+    link_fact_data_type(fact_term_2_type, fact_dt)
 
     return fact_term, created
 
 
-def write_large_value(value,storage_location=dingos.DINGOS_LARGE_VALUE_DESTINATION):
+def write_large_value(value,storage_location=None):
+    """
+    Write a value that is too large for the value table to the blob storage
+    on the file system or the blob table, depending on 'storage_location'
+    (default: DINGOS_LARGE_VALUE_DESTINATION). Returns the SHA256 digest of
+    the value and the storage location.
+
+    Blobs are addressed by their digest, so a value that has been
+    written before is not written again.
+    """
+    if storage_location is None:
+        storage_location = dingos.DINGOS_LARGE_VALUE_DESTINATION
     value_hash = hashlib.sha256(value).hexdigest()
     if storage_location == dingos.DINGOS_FILE_SYSTEM:
 
-        file_name = '%s.blob' % (value_hash)
-
-        if dingos.DINGOS_BLOB_STORAGE.exists(file_name):
-            dingos.DINGOS_BLOB_STORAGE.delete(file_name)
-
-        dingos.DINGOS_BLOB_STORAGE.save(file_name, ContentFile(value))
+        dingos.DINGOS_BLOB_STORAGE.save_blob(value, digest=value_hash)
 
     else:
         storage_location = dingos.DINGOS_BLOB_TABLE
@@ -2128,5 +3258,1098 @@ def write_large_value(value,storage_location=dingos.DINGOS_LARGE_VALUE_DESTINATI
     return (value_hash,storage_location)
 
 
+def read_large_value(value_hash,storage_location):
+    """
+    Return the content of a value written with 'write_large_value'.
+    """
+    if storage_location == dingos.DINGOS_FILE_SYSTEM:
+        return dingos.DINGOS_BLOB_STORAGE.read_blob(value_hash)
+    content = blob_cache.get(value_hash)
+    if content is None:
+        raise dingos_class_map['BlobStorage'].DoesNotExist("Blob %s not found" % value_hash)
+    return content
+
+
+
+
+# Maximal number of parameters that we pass in a single 'IN' query when
+# resolving objects in bulk (some databases, e.g., SQLite, restrict the
+# number of variables per query).
+
+BULK_QUERY_CHUNK_SIZE = 400
+
+
+def _bulk_key(key):
+    """
+    Normalize the components of a lookup key such that keys built from
+    imported data (which may contain byte strings) and keys built from
+    data read from the database (unicode) compare equal.
+    """
+    return tuple(map(lambda x: force_text(x) if isinstance(x, basestring) else x, key))
+
+
+def _chunks(a_list, size=BULK_QUERY_CHUNK_SIZE):
+    for i in range(0, len(a_list), size):
+        yield a_list[i:i + size]
+
+
+def bulk_lookup(model, key_fields, keys, cache_hits=None):
+    """
+    Look up the objects of the given model that are identified by the given keys
+    (see 'bulk_get_or_create') without creating missing objects.
+
+    If the model has a schema cache, objects found in the cache are not looked up
+    in the database (their normalized keys are added to the set 'cache_hits', if
+    one is given); objects found in the database are added to the cache. The remaining
+    objects are looked up with one 'IN' query for each combination of values of all
+    but the last key field.
+
+    The function returns a dictionary mapping the normalized keys
+    (see '_bulk_key') of the objects found to primary keys.
+    """
+
+    result = {}
+
+    attnames = map(lambda x: model._meta.get_field(x).attname, key_fields)
+
+    cache = get_schema_cache(model)
+
+    normalized_keys = set(map(_bulk_key, keys))
+
+    if cache is not None:
+        for key in normalized_keys:
+            obj = cache.get(_schema_cache_key(dict(zip(key_fields, key))))
+            if obj is not None:
+                result[key] = obj.pk
+                if cache_hits is not None:
+                    cache_hits.add(key)
+
+    grouped = {}
+    for key in normalized_keys:
+        if not key in result:
+            grouped.setdefault(key[:-1], []).append(key[-1])
+
+    for (prefix, last_values) in grouped.items():
+        filter_kwargs = dict(zip(key_fields[:-1], prefix))
+        for chunk in _chunks(last_values):
+            filter_kwargs['%s__in' % key_fields[-1]] = chunk
+            if cache is None:
+                for row in model.objects.filter(**filter_kwargs).values_list(*(tuple(key_fields) + ('pk',))):
+                    result[_bulk_key(row[:-1])] = row[-1]
+            else:
+                for obj in model.objects.filter(**filter_kwargs):
+                    key = _bulk_key(map(lambda x: getattr(obj, x), attnames))
+                    result[key] = obj.pk
+                    cache.set(_schema_cache_key(dict(zip(key_fields, key))), obj)
+
+    return result
+
+
+def bulk_get_or_create(model, key_fields, keys, defaults=None):
+    """
+    Get or create all objects of the given model that are identified by the
+    given keys. Each key is a tuple containing the values for the
+    fields in 'key_fields'; for foreign-key fields, the primary key of the
+    referenced object is expected. If an object is created, the
+    dictionary 'defaults' (which maps keys to dictionaries)
+    may supply values for further fields.
+
+    Existing objects are determined with 'bulk_lookup' (i.e., from the schema cache
+    of the model, if any, and with batched 'IN' queries);
+    missing objects are created with 'bulk_create'. If the bulk creation runs into
+    an integrity error (e.g., because another process created one of the objects in the
+    meantime), we fall back to 'get_or_create' for each of the objects.
+
+    The function returns a dictionary mapping the normalized keys
+    (see '_bulk_key') to primary keys.
+    """
+
+    if not defaults:
+        defaults = {}
+
+    wanted = {}
+    for key in keys:
+        wanted.setdefault(_bulk_key(key), key)
+
+    attnames = map(lambda x: model._meta.get_field(x).attname, key_fields)
+
+    cache = get_schema_cache(model)
+
+    def get_or_create(key):
+        original_key = wanted[key]
+        obj, created = model.objects.get_or_create(defaults=defaults.get(key, {}),
+                                                   **dict(zip(attnames, original_key)))
+        result[key] = obj.pk
+        if cache is not None:
+            cache.set(_schema_cache_key(dict(zip(key_fields, key))), obj)
+
+    result = bulk_lookup(model, key_fields, wanted.keys())
+
+    missing = filter(lambda x: x not in result, wanted.keys())
+
+    if missing:
+        new_objects = []
+        for key in missing:
+            kwargs = dict(zip(attnames, wanted[key]))
+            kwargs.update(defaults.get(key, {}))
+            new_objects.append(model(**kwargs))
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(new_objects)
+        except IntegrityError:
+            for key in missing:
+                get_or_create(key)
+        else:
+            result.update(bulk_lookup(model, key_fields, missing))
+            # If the database compares values differently than Python (e.g.,
+            # case-insensitive collation), we may not find some of the
+            # objects by the normalized key: look these up one by one.
+            for key in missing:
+                if key not in result:
+                    get_or_create(key)
+
+    return result
+
+
+def bulk_update_column(model, field_name, updates):
+    """
+    Set the given field for a number of objects of the given model to individual
+    values. 'updates' is a list of pairs (primary key, value); for a foreign-key
+    field, the value is the primary key of the referenced object.
+
+    The update is carried out with (a chunked) 'UPDATE ... SET field = CASE pk WHEN ... END'.
+    Note that no signals are sent.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    column = quote_name(model._meta.get_field(field_name).column)
+    pk_column = quote_name(model._meta.pk.column)
+
+    cursor = connection.cursor()
+    for chunk in _chunks(updates, BULK_QUERY_CHUNK_SIZE / 3):
+        sql = "UPDATE %s SET %s = CASE %s %s END WHERE %s IN (%s)" % (table,
+                                                                        column,
+                                                                        pk_column,
+                                                                        " ".join(["WHEN %s THEN %s"] * len(chunk)),
+                                                                        pk_column,
+                                                                        ", ".join(["%s"] * len(chunk)))
+        params = list(itertools.chain(*chunk)) + map(lambda x: x[0], chunk)
+        cursor.execute(sql, params)
+
+
+def get_bulk_load_backend(connection):
+    """
+    Return the backend ('copy', 'executemany' or 'orm') that 'bulk_insert' uses for
+    the given database connection according to DINGOS_BULK_LOAD_BACKEND.
+    """
+    backend = dingos.DINGOS_BULK_LOAD_BACKEND
+    if backend == 'auto':
+        backend = 'copy' if connection.vendor == 'postgresql' else 'executemany'
+    elif backend == 'copy' and connection.vendor != 'postgresql':
+        backend = 'executemany'
+    return backend
+
+
+def _copy_line(row):
+    """
+    Render a row of values in the text format of PostgreSQL's COPY.
+    """
+    columns = []
+    for value in row:
+        if value is None:
+            columns.append('\\N')
+        elif value is True or value is False:
+            columns.append('t' if value else 'f')
+        else:
+            columns.append(force_text(value).replace('\\', '\\\\').replace('\t', '\\t').replace(
+                '\n', '\\n').replace('\r', '\\r'))
+    return force_bytes("\t".join(columns) + "\n")
+
+
+class CopyBuffer(object):
+    """
+    File-like object that renders the given rows for PostgreSQL's 'COPY ... FROM STDIN'
+    while they are read, so that the rows are streamed to the database
+    without rendering all of them at once.
+    """
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = ''
+
+    def _fill(self, size):
+        # Render rows until the buffer holds at least 'size' bytes (or all rows, if 'size' is negative)
+        while size < 0 or len(self.buffer) < size:
+            try:
+                row = next(self.rows)
+            except StopIteration:
+                break
+            self.buffer += _copy_line(row)
+
+    def _take(self, size):
+        (result, self.buffer) = (self.buffer[:size], self.buffer[size:])
+        return result
+
+    def read(self, size=-1):
+        self._fill(size)
+        if size < 0:
+            size = len(self.buffer)
+        return self._take(size)
+
+    def readline(self, size=-1):
+        if not self.buffer:
+            self._fill(1)
+        end = self.buffer.find('\n') + 1 or len(self.buffer)
+        if size >= 0:
+            end = min(end, size)
+        return self._take(end)
+
+
+def bulk_insert(model, field_names, rows):
+    """
+    Insert rows into the table of the given model with the backend configured
+    by DINGOS_BULK_LOAD_BACKEND (see 'get_bulk_load_backend'). Each row is a tuple
+    of values for the fields (given by attribute name, e.g., 'fact_id') in 'field_names';
+    values must be ready for the database (e.g., primary keys for foreign keys).
+    Further fields receive their default values.
+
+    With 'copy', the rows are streamed into the model's table with a single 'COPY ... FROM STDIN';
+    the primary keys are taken from the sequence of the table in the order of the rows.
+    Since only new rows are appended (there is nothing to update and no conflict to resolve),
+    there is no need for a staging table from which the rows are merged into the table.
+    As with 'bulk_create', no signals are sent; the primary keys of the new rows follow
+    the order of 'rows'.
+    """
+
+    if not rows:
+        return
+
+    connection = connections[router.db_for_write(model)]
+    backend = get_bulk_load_backend(connection)
+
+    if backend == 'orm':
+        model.objects.bulk_create(map(lambda x: model(**dict(zip(field_names, x))), rows))
+        return
+
+    fields_by_attname = dict(map(lambda x: (x.attname, x), model._meta.local_concrete_fields))
+    fields = map(lambda x: fields_by_attname[x], field_names)
+    default_fields = filter(lambda x: not isinstance(x, models.AutoField) and not x in fields,
+                            model._meta.local_concrete_fields)
+    if default_fields:
+        defaults = tuple(map(lambda x: x.get_db_prep_save(x.get_default(), connection=connection), default_fields))
+        fields = fields + default_fields
+        rows = map(lambda x: tuple(x) + defaults, rows)
+
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    columns = ", ".join(map(lambda x: quote_name(x.column), fields))
+
+    cursor = connection.cursor()
+
+    if backend == 'copy':
+        cursor.copy_expert("COPY %s (%s) FROM STDIN" % (table, columns), CopyBuffer(rows))
+    else:
+        cursor.executemany("INSERT INTO %s (%s) VALUES (%s)" % (table, columns, ", ".join(["%s"] * len(fields))),
+                           rows)
+
+
+class PendingFact(SlottedRecord):
+    """
+    Compact record holding the keyword arguments of 'InfoObject.add_fact' for a fact that is
+    to be written by 'FactBatchWriter', together with the objects that the writer resolves for
+    the fact. The record can be accessed like the dictionary of keyword arguments it
+    replaces, so datatype extractors and special fact-term handlers that manipulate
+    the 'add_fact_kargs' passed to them keep working.
+    """
+
+    __slots__ = ('fact_term_name', 'fact_term_attribute', 'fact_dt_name', 'fact_dt_namespace_name',
+                 'fact_dt_namespace_uri', 'fact_dt_kind', 'fact_values', 'value_iobject_id', 'value_iobject_ts',
+                 'node_id_name', 'is_attribute', 'ns_uri_dict', 'namespaces', 'top_level_namespace',
+                 # Objects resolved by the writer
+                 '_dt_namespace_pk', '_dt_pk', '_fact_term_pk', '_value_keys', '_value_pks', '_naming_values',
+                 '_vio_pk', '_signature', '_lookup', '_fact_pk', '_node_id_pk', '_namespace_map_pk')
+
+    _keys = ('fact_term_name', 'fact_term_attribute', 'fact_dt_name', 'fact_dt_namespace_name',
+             'fact_dt_namespace_uri', 'fact_dt_kind', 'values', 'value_iobject_id', 'value_iobject_ts',
+             'node_id_name', 'is_attribute', 'ns_uri_dict', 'namespaces', 'top_level_namespace',
+             '_dt_namespace_pk', '_dt_pk', '_fact_term_pk', '_value_keys', '_value_pks', '_naming_values',
+             '_vio_pk', '_signature', '_lookup', '_fact_pk', '_node_id_pk', '_namespace_map_pk')
+
+    # 'values' would hide the dictionary method of the same name
+
+    _key_slots = {'values': 'fact_values'}
+
+
+class FactBatchWriter(object):
+    """
+    Writes a list of facts (given as dictionaries of keyword arguments for 'InfoObject.add_fact'
+    or as 'PendingFact' records) to an information object, resolving all required objects (fact terms, data types, values,
+    facts, node identifiers and namespace maps) for the complete list at once.
+
+    The rows that are written are the same as those written by calling 'add_fact' for each entry
+    of the list in turn; in particular, facts, namespace maps etc. that are created for
+    one entry of the list are reused for later entries of the list just as 'add_fact' would do.
+    """
+
+    def __init__(self, iobject):
+        self.iobject = iobject
+        self._DCM = iobject._DCM
+        self.facts = []
+
+    def write(self, fact_list, parent_revision=None):
+
+        if not fact_list:
+            return []
+
+        facts = []
+        for kargs in fact_list:
+            if isinstance(kargs, PendingFact):
+                # Records queued by 'from_dict' are not used elsewhere, so we fill them in directly
+                fact = kargs
+            else:
+                fact = PendingFact(kargs)
+            if not getattr(fact, 'fact_values', None):
+                fact.fact_values = []
+            if not getattr(fact, 'namespaces', None):
+                fact.namespaces = []
+            if not getattr(fact, 'fact_term_attribute', None):
+                fact.fact_term_attribute = ''
+            for (slot, default) in [('fact_dt_name', 'String'),
+                                    ('fact_dt_namespace_uri', DINGOS_NAMESPACE_URI),
+                                    ('fact_dt_kind', FactDataType.UNKNOWN_KIND),
+                                    ('value_iobject_id', None),
+                                    ('value_iobject_ts', None),
+                                    ('node_id_name', '')]:
+                if not hasattr(fact, slot):
+                    setattr(fact, slot, default)
+            facts.append(fact)
+
+        ns_uri_dict = None
+        for fact in facts:
+            if getattr(fact, 'ns_uri_dict', None):
+                ns_uri_dict = fact.ns_uri_dict
+                break
+        if ns_uri_dict is None:
+            ns_uri_dict = {}
+
+        self.facts = facts
+        rows = len(facts)
+
+        with profiling.stage('fact_terms') as stage:
+            self.resolve_fact_terms(facts)
+            stage.rows = rows
+        with profiling.stage('fact_values') as stage:
+            self.resolve_values(facts)
+            stage.rows = rows
+        with profiling.stage('facts') as stage:
+            self.resolve_facts(facts)
+            stage.rows = rows
+        with profiling.stage('node_ids') as stage:
+            self.resolve_node_ids(facts)
+            stage.rows = rows
+        with profiling.stage('namespace_maps') as stage:
+            self.resolve_namespace_maps(facts, ns_uri_dict)
+            stage.rows = rows
+        if parent_revision is not None:
+            with profiling.stage('copy_on_write') as stage:
+                facts = self.select_changed_facts(facts, parent_revision)
+                stage.rows = rows
+        with profiling.stage('io2f') as stage:
+            result = self.write_io2f(facts)
+            stage.rows = len(facts)
+        return result
+
+    def resolve_fact_terms(self, facts):
+        """
+        Determine fact data types and fact terms and make sure that
+        the fact terms are registered for the information-object type
+        with the respective data types.
+        """
+        iobject_type_pk = self.resolve_iobject_type()
+
+        dt_namespace_pks = self.bulk_get_or_create('DataTypeNameSpace',
+                                                   ('uri',),
+                                                   map(lambda x: (x.fact_dt_namespace_uri,), facts))
+
+        dt_keys = []
+        dt_defaults = {}
+        for fact in facts:
+            fact._dt_namespace_pk = dt_namespace_pks[_bulk_key((fact.fact_dt_namespace_uri,))]
+            dt_key = (fact._dt_namespace_pk, fact.fact_dt_name)
+            dt_keys.append(dt_key)
+            # The kind of a data type is set by the first fact that creates it
+            dt_defaults.setdefault(_bulk_key(dt_key), {'kind': fact.fact_dt_kind})
+
+        dt_pks = self.bulk_get_or_create('FactDataType',
+                                         ('namespace', 'name'),
+                                         dt_keys,
+                                         defaults=dt_defaults)
+
+        ft_pks = self.bulk_get_or_create('FactTerm',
+                                         ('attribute', 'term'),
+                                         map(lambda x: (x.fact_term_attribute, x.fact_term_name), facts))
+
+        for fact in facts:
+            fact._dt_pk = dt_pks[_bulk_key((fact._dt_namespace_pk, fact.fact_dt_name))]
+            fact._fact_term_pk = ft_pks[_bulk_key((fact.fact_term_attribute, fact.fact_term_name))]
+
+        ft2t_pks = self.bulk_get_or_create('FactTerm2Type',
+                                           ('iobject_type', 'fact_term'),
+                                           map(lambda x: (iobject_type_pk, x._fact_term_pk), facts))
+
+        self.link_fact_data_types(map(lambda x: (ft2t_pks[_bulk_key((iobject_type_pk, x._fact_term_pk))], x._dt_pk),
+                                      facts))
+
+    def bulk_get_or_create(self, model_name, key_fields, keys, defaults=None):
+        return bulk_get_or_create(self._DCM[model_name], key_fields, keys, defaults=defaults)
+
+    def resolve_iobject_type(self):
+        """
+        Return the primary key of the information-object type of the iobject.
+        """
+        iobject = self.iobject
+
+        iobject_family, created = get_or_create_cached(self._DCM['InfoObjectFamily'],
+                                                       name=iobject.iobject_family.name)
+        iobject_type_namespace, created = get_or_create_cached(self._DCM['DataTypeNameSpace'],
+                                                               uri=iobject.iobject_type.namespace.uri)
+        iobject_type, created = get_or_create_cached(self._DCM['InfoObjectType'],
+                                                     name=iobject.iobject_type.name,
+                                                     iobject_family=iobject_family,
+                                                     namespace=iobject_type_namespace)
+        return iobject_type.pk
+
+    def link_fact_data_types(self, links):
+        """
+        Make sure that the given pairs of FactTerm2Type and FactDataType primary keys are linked.
+        """
+
+        ft2t_dt_model = self._DCM['FactTerm2Type'].fact_data_types.through
+
+        link_cache = get_schema_cache(FACT_DATA_TYPE_LINKS)
+
+        wanted = set()
+        for link in links:
+            if link_cache is None or not link_cache.get(link):
+                wanted.add(link)
+
+        if not wanted:
+            return
+
+        existing = set()
+        for chunk in _chunks(list(set(map(lambda x: x[0], wanted)))):
+            existing.update(ft2t_dt_model.objects.filter(factterm2type_id__in=chunk).values_list('factterm2type_id',
+                                                                                                'factdatatype_id'))
+        missing = sorted(wanted - existing)
+        if missing:
+            try:
+                with transaction.atomic():
+                    ft2t_dt_model.objects.bulk_create(map(lambda x: ft2t_dt_model(factterm2type_id=x[0],
+                                                                                  factdatatype_id=x[1]),
+                                                          missing))
+            except IntegrityError:
+                for (ft2t_pk, dt_pk) in missing:
+                    link_fact_data_type(self._DCM['FactTerm2Type'].objects.get(pk=ft2t_pk),
+                                        self._DCM['FactDataType'].objects.get(pk=dt_pk))
+
+        if link_cache is not None:
+            for link in wanted:
+                link_cache.set(link, True)
+
+    def resolve_values(self, facts):
+        """
+        Determine the fact values of all facts. As in 'get_or_create_fact', values
+        that are too large for the value table are handed over to 'write_large_value'.
+        """
+
+        value_keys = []
+        value_defaults = {}
+        for fact in facts:
+            fact_value_keys = []
+            # For naming the object, we keep the values as 'extract_name' would
+            # retrieve them, i.e., with the content of values in the blob table.
+            fact._naming_values = []
+            for value in fact.fact_values:
+                storage_location = dingos.DINGOS_VALUES_TABLE
+                if value == None:
+                    value = ''
+                if isinstance(value, tuple):
+                    value, storage_location = value
+                naming_value = (value, storage_location)
+
+                if storage_location == dingos.DINGOS_VALUES_TABLE:
+                    if len(value) > dingos.DINGOS_MAX_VALUE_SIZE_WRITTEN_TO_VALUE_TABLE:
+                        (value_hash, storage_location) = self.write_large_value(value)
+                        if storage_location != dingos.DINGOS_BLOB_TABLE:
+                            naming_value = (value_hash, storage_location)
+                        value = value_hash
+                value_key = (fact._dt_pk, storage_location, FactValue.digest(value))
+                value_defaults.setdefault(value_key, {'value': value})
+                fact_value_keys.append(value_key)
+                fact._naming_values.append(naming_value)
+            fact._value_keys = fact_value_keys
+            value_keys.extend(fact_value_keys)
+
+        value_pks = self.bulk_get_or_create('FactValue',
+                                            ('fact_data_type', 'storage_location', 'value_hash'),
+                                            value_keys,
+                                            defaults=value_defaults)
+
+        for fact in facts:
+            fact._value_pks = map(lambda x: value_pks[_bulk_key(x)], fact._value_keys)
+
+    def write_large_value(self, value):
+        return write_large_value(value)
+
+    def resolve_facts(self, facts):
+        """
+        Determine facts with the same fact term, values and value-iobject reference
+        as required for each entry of the list (using the fact signatures); create facts
+        that do not exist yet.
+
+        As in 'get_or_create_fact', a fact for which the same value is required
+        several times or that has no values is always created anew.
+        """
+
+        fact_model = self._DCM['Fact']
+        fact_values_model = fact_model.fact_values.through
+
+        for fact in facts:
+            vio = fact.value_iobject_id
+            fact._vio_pk = getattr(vio, 'pk', vio)
+            value_pks = fact._value_pks
+            fact._signature = Fact.calculate_signature(fact._fact_term_pk,
+                                                          value_pks,
+                                                          fact._vio_pk,
+                                                          fact.value_iobject_ts)
+            fact._lookup = bool(value_pks) and len(set(value_pks)) == len(value_pks)
+
+        signatures = sorted(set(map(lambda x: x._signature, filter(lambda x: x._lookup, facts))))
+
+        fact_pks = {}
+        for chunk in _chunks(signatures):
+            for (signature, fact_pk) in fact_model.objects.filter(signature__in=chunk).order_by('-pk').values_list(
+                    'signature', 'pk'):
+                # Ordering by descending primary key leaves us with the oldest fact
+                fact_pks[signature] = fact_pk
+
+        new_fact_values = []
+        for fact in facts:
+            fact_pk = None
+            if fact._lookup:
+                fact_pk = fact_pks.get(fact._signature)
+            if not fact_pk:
+                fact_obj = fact_model.objects.create(fact_term_id=fact._fact_term_pk,
+                                                     value_iobject_id_id=fact._vio_pk,
+                                                     value_iobject_ts=fact.value_iobject_ts,
+                                                     signature=fact._signature)
+                fact_pk = fact_obj.pk
+                for value_pk in sorted(set(fact._value_pks)):
+                    new_fact_values.append((fact_pk, value_pk))
+                fact_pks.setdefault(fact._signature, fact_pk)
+            fact._fact_pk = fact_pk
+
+        bulk_insert(fact_values_model, ('fact_id', 'factvalue_id'), new_fact_values)
+
+    def resolve_node_ids(self, facts):
+        node_id_pks = node_id_intern_map.get_pks(map(lambda x: x.node_id_name, facts))
+        for fact in facts:
+            fact._node_id_pk = node_id_pks[force_text(fact.node_id_name)]
+
+    def resolve_namespace_maps(self, facts, ns_uri_dict):
+        """
+        Determine the namespace map of each fact via the namespace-map cache;
+        missing namespace maps are created (and are then reused for later facts).
+        """
+
+        namespace_map_cache.load(map(lambda x: x._fact_term_pk, facts))
+
+        new_maps = []
+        for fact in facts:
+            fact._namespace_map_pk = None
+            key = namespace_map_cache.make_key(fact.namespaces)
+            if not key:
+                continue
+            map_pk = namespace_map_cache.get(fact._fact_term_pk, key)
+            if not map_pk:
+                positional = []
+                for (counter, (ns_uri, ns_slug)) in enumerate(fact.namespaces):
+                    if ns_uri:
+                        positional.append((counter, ns_uri, ns_slug))
+                (map_pk, created) = get_or_create_namespace_map(fact._fact_term_pk, key)
+                if created:
+                    new_maps.append((map_pk, positional))
+                namespace_map_cache.add(fact._fact_term_pk, key, map_pk)
+            fact._namespace_map_pk = map_pk
+
+        if not new_maps:
+            return
+
+        missing_uris = []
+        ns_defaults = {}
+        for (map_pk, positional) in new_maps:
+            for (counter, ns_uri, ns_slug) in positional:
+                if not ns_uri in ns_uri_dict:
+                    missing_uris.append((ns_uri,))
+                    ns_defaults.setdefault(_bulk_key((ns_uri,)), {'name': ns_slug})
+        if missing_uris:
+            ns_pks = bulk_get_or_create(self._DCM['DataTypeNameSpace'],
+                                        ('uri',),
+                                        missing_uris,
+                                        defaults=ns_defaults)
+            for (ns_uri,) in missing_uris:
+                ns_uri_dict[ns_uri] = ns_pks[_bulk_key((ns_uri,))]
+
+        positional_namespaces = []
+        for (map_pk, positional) in new_maps:
+            for (counter, ns_uri, ns_slug) in positional:
+                positional_namespaces.append(self._DCM['PositionalNamespace'](fact_term_namespace_map_id=map_pk,
+                                                                              position=counter,
+                                                                              namespace_id=ns_uri_dict[ns_uri]))
+        self._DCM['PositionalNamespace'].objects.bulk_create(positional_namespaces)
+
+    def naming_fact_list(self):
+        """
+        Return the facts written by the last call of 'write' in the form expected by
+        'InfoObject.name_from_fact_list'. Only the names of referenced information
+        objects (if any) need to be queried.
+        """
+
+        referenced_names = {}
+        vio_pks = sorted(set(filter(None, map(lambda x: x._vio_pk, self.facts))))
+        for chunk in _chunks(vio_pks):
+            referenced_names.update(self._DCM['Identifier'].objects.filter(pk__in=chunk).values_list('pk',
+                                                                                                   'latest__name'))
+
+        fact_list = []
+        for fact in sorted(self.facts, key=lambda x: force_text(x.node_id_name)):
+            for (value, storage_location) in (fact._naming_values or [(None, None)]):
+                fact_list.append((fact.node_id_name,
+                                  fact.fact_term_name,
+                                  fact.fact_term_attribute,
+                                  value,
+                                  storage_location,
+                                  referenced_names.get(fact._vio_pk)))
+        return fact_list
+
+    def select_changed_facts(self, facts, parent_revision):
+        """
+        Turn the iobject into a copy-on-write revision of the parent revision and return
+        the facts for which InfoObject2Fact rows must be written, i.e., facts that are new
+        or differ from the fact at the same node of the parent revision (in fact,
+        namespace map or attributed fact). Nodes of the parent revision that do not
+        occur in 'facts' are recorded as removed. The node-id map of the iobject
+        is initialized with the rows inherited from the parent revision.
+
+        If 'facts' contains a node identifier more than once, the facts cannot
+        be matched with those of the parent revision and all facts are returned.
+        """
+
+        iobject = self.iobject
+
+        node_names = map(lambda x: force_text(x.node_id_name), facts)
+        if len(set(node_names)) != len(node_names):
+            return facts
 
+        parent_values = parent_revision.get_effective_io2f_values()
 
+        changed = set()
+        for fact in facts:
+            parent_value = parent_values.get(fact._node_id_pk)
+            if not parent_value or parent_value[1:3] != (fact._fact_pk, fact._namespace_map_pk):
+                changed.add(force_text(fact.node_id_name))
+
+        new_node_pks = set(map(lambda x: x._node_id_pk, facts))
+        node_pks = node_id_intern_map.get_pks(node_names)
+
+        # An unchanged attribute fact must also be written if its attributed fact is written
+        # or has been added or removed.
+
+        for fact in facts:
+            name = force_text(fact.node_id_name)
+            components = name.split(':')
+            if name in changed or not (components[-1] and components[-1][0] == 'A'):
+                continue
+            attributed_name = ":".join(components[:-1])
+            attributed_node_pk = node_pks.get(attributed_name)
+            if attributed_name in changed:
+                changed.add(name)
+            elif attributed_node_pk in new_node_pks:
+                if parent_values[fact._node_id_pk][3] != parent_values[attributed_node_pk][0]:
+                    changed.add(name)
+            elif parent_values[fact._node_id_pk][3] is not None:
+                changed.add(name)
+
+        removed_node_pks = sorted(set(parent_values.keys()) - new_node_pks)
+        self._DCM['InfoObjectRemovedNode'].objects.bulk_create(
+            map(lambda x: self._DCM['InfoObjectRemovedNode'](iobject=iobject, node_id_id=x),
+                removed_node_pks))
+
+        iobject.parent_revision = parent_revision
+        nodes = node_id_intern_map.get_nodes(new_node_pks & set(parent_values.keys()))
+        iobject._io2f_map = dict(map(lambda x: (force_text(x.name), parent_values[x.pk][0]),
+                                     nodes.values()))
+
+        return filter(lambda x: force_text(x.node_id_name) in changed, facts)
+
+    def write_io2f(self, facts):
+        """
+        Write the InfoObject2Fact rows. An attribute fact (i.e., a fact whose node identifier
+        ends with an 'A'-component) points to the fact with the parent node identifier, if
+        such a fact precedes it in the list or already exists for the information object.
+
+        Because 'bulk_insert' does not return primary keys, all rows are inserted first;
+        after retrieving the primary keys of the new rows, the pointers to the attributed facts
+        are set with a second, bulk update pass. The primary keys are also recorded
+        in the node-id map of the iobject (see 'InfoObject.get_io2f_map').
+        """
+
+        io2f_model = self._DCM['InfoObject2Fact']
+        iobject = self.iobject
+
+        io2f_map = iobject.get_io2f_map()
+        max_existing_pk = max(io2f_map.values()) if io2f_map else 0
+
+        bulk_insert(io2f_model,
+                    ('iobject_id', 'fact_id', 'node_id_id', 'namespace_map_id'),
+                    map(lambda x: (iobject.pk, x._fact_pk, x._node_id_pk, x._namespace_map_pk), facts))
+
+        new_rows = list(io2f_model.objects.filter(iobject=iobject,
+                                                  pk__gt=max_existing_pk).order_by('pk').values_list('node_id', 'pk'))
+
+        if map(lambda x: x[0], new_rows) == map(lambda x: x._node_id_pk, facts):
+            new_pks = map(lambda x: x[1], new_rows)
+        else:
+            # Someone else has written rows for this iobject in the meantime: we cannot rely on the
+            # ordering and take the latest row for each node identifier.
+            pks_by_node_id = dict(new_rows)
+            new_pks = map(lambda x: pks_by_node_id.get(x._node_id_pk), facts)
+
+        updates = []
+        for (fact, pk) in zip(facts, new_pks):
+            components = fact.node_id_name.split(':')
+            if components[-1] and components[-1][0] == 'A':
+                attributed_pk = io2f_map.get(force_text(":".join(components[:-1])))
+                if attributed_pk and pk:
+                    updates.append((pk, attributed_pk))
+            io2f_map[force_text(fact.node_id_name)] = pk
+
+        if updates:
+            bulk_update_column(io2f_model, 'attributed_fact', updates)
+
+        return io2f_model.objects.filter(iobject=iobject)
+
+
+class PlannedRow(object):
+    """
+    Stands in for the primary key of a row that an import planned with 'ImportPlan' would create.
+    """
+
+    __slots__ = ('model_name', 'key')
+
+    def __init__(self, model_name, key):
+        self.model_name = model_name
+        self.key = key
+
+    def __eq__(self, other):
+        return isinstance(other, PlannedRow) and (self.model_name, self.key) == (other.model_name, other.key)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.model_name, self.key))
+
+    def __repr__(self):
+        return "<PlannedRow %s %r>" % (self.model_name, self.key)
+
+
+class ImportPlan(object):
+    """
+    Collects what an import would write without writing anything (see the '--dry-run'
+    option of the import commands and 'DingoImportHandling.start_dry_run'):
+
+    - the number of parsed documents, the time spent on parsing them and
+      the number of embedded objects extracted from them;
+    - the number of information objects per status ('new', 'new_revision', 'exists', etc.)
+      and per information-object type;
+    - for each lookup table (fact terms, data types, values, facts, node identifiers, etc.)
+      the number of distinct rows used by the import that were found in the schema cache,
+      found in the database or would be inserted;
+    - the number of InfoObject2Fact rows, large values and markings that would be written.
+
+    Rows that would be inserted for one object are taken into account for the following
+    objects, i.e., they are counted only once.
+    """
+
+    TABLES = ['InfoObjectFamily',
+              'InfoObjectType',
+              'DataTypeNameSpace',
+              'FactDataType',
+              'FactTerm',
+              'FactTerm2Type',
+              'FactValue',
+              'Fact',
+              'NodeID',
+              'FactTermNamespaceMap',
+              'InfoObject2Fact']
+
+    def __init__(self, dingos_class_map=dingos_class_map):
+        self._DCM = dingos_class_map
+        self.documents = 0
+        self.parse_seconds = 0.0
+        self.embedded_objects = 0
+        self.objects = {}
+        self.object_types = {}
+        self.large_values = 0
+        self.markings = 0
+        self.tables = dict(map(lambda x: (x, {'cached': 0, 'existing': 0, 'new': 0}), self.TABLES))
+        self._resolved = dict(map(lambda x: (x, {}), self.TABLES))
+
+    def add_document(self, seconds, embedded_objects):
+        self.documents += 1
+        self.parse_seconds += seconds
+        self.embedded_objects += embedded_objects
+
+    def add_object(self, status, iobject_type_name):
+        self.objects[status] = self.objects.get(status, 0) + 1
+        if status in ['new', 'new_revision', 'older_revision', 'placeholder']:
+            self.object_types[iobject_type_name] = self.object_types.get(iobject_type_name, 0) + 1
+
+    def add_new(self, model_name, count=1):
+        """
+        Count rows that would be inserted without being looked up (e.g., facts that are always created anew).
+        """
+        self.tables[model_name]['new'] += count
+
+    def resolve(self, model_name, key_fields, keys, lookup=None):
+        """
+        Resolve the given keys (see 'bulk_get_or_create') read-only and return a dictionary
+        mapping the normalized keys to primary keys; rows that would be inserted are
+        represented by 'PlannedRow' objects. Keys that contain a 'PlannedRow' (i.e., refer
+        to a row that would be inserted) are not looked up.
+
+        The keys are looked up with 'bulk_lookup' unless another lookup function (taking
+        the keys and a set, to which it adds the keys found in a cache) is given.
+        """
+        resolved = self._resolved[model_name]
+        stats = self.tables[model_name]
+
+        unknown = set(filter(lambda x: x not in resolved, map(_bulk_key, keys)))
+        if not unknown:
+            return resolved
+
+        wanted = filter(lambda x: not filter(lambda y: isinstance(y, PlannedRow), x), unknown)
+        cache_hits = set()
+        if not wanted:
+            found = {}
+        elif lookup:
+            found = lookup(wanted, cache_hits)
+        else:
+            found = bulk_lookup(self._DCM[model_name], key_fields, wanted, cache_hits=cache_hits)
+
+        for key in unknown:
+            if key in found:
+                resolved[key] = found[key]
+                if key in cache_hits:
+                    stats['cached'] += 1
+                else:
+                    stats['existing'] += 1
+            else:
+                resolved[key] = PlannedRow(model_name, key)
+                stats['new'] += 1
+
+        return resolved
+
+    def add_iobject(self,
+                    status,
+                    identifier_ns_uri,
+                    uid,
+                    timestamp,
+                    create_timestamp,
+                    iobject_data,
+                    config_hooks,
+                    namespace_dict,
+                    iobject_family_name,
+                    iobject_family_revision_name,
+                    iobject_type_name,
+                    iobject_type_namespace_uri,
+                    iobject_type_revision_name):
+        """
+        Plan the writing of an information object (as 'DingoImportHandling.create_iobject' would
+        write it) and return the (unsaved) information object.
+        """
+
+        self.add_object(status, iobject_type_name)
+
+        iobject_family = self._DCM['InfoObjectFamily'](name=iobject_family_name)
+        iobject_type = self._DCM['InfoObjectType'](name=iobject_type_name,
+                                                   iobject_family=iobject_family,
+                                                   namespace=self._DCM['DataTypeNameSpace'](uri=iobject_type_namespace_uri))
+        identifier = self._DCM['Identifier'](uid=uid,
+                                             namespace=self._DCM['IdentifierNameSpace'](uri=identifier_ns_uri))
+        iobject = self._DCM['InfoObject'](identifier=identifier,
+                                          timestamp=timestamp,
+                                          create_timestamp=create_timestamp or timestamp,
+                                          iobject_type=iobject_type,
+                                          iobject_type_revision=self._DCM['Revision'](name=iobject_type_revision_name),
+                                          iobject_family=iobject_family,
+                                          iobject_family_revision=self._DCM['Revision'](name=iobject_family_revision_name))
+
+        fact_list = iobject.fact_list_from_dict(iobject_data, config_hooks=config_hooks, namespace_dict=namespace_dict)
+        FactBatchPlanner(iobject, self).write(fact_list)
+
+        return iobject
+
+    def report(self):
+        """
+        Return a dictionary (that can be serialized as JSON) with the figures of the plan;
+        for each lookup table, the ratio of rows found in the schema cache ('cache_hit_ratio')
+        is given.
+        """
+        tables = {}
+        for (name, stats) in self.tables.items():
+            entry = dict(stats)
+            looked_up = stats['cached'] + stats['existing'] + stats['new']
+            entry['cache_hit_ratio'] = float(stats['cached']) / looked_up if looked_up else None
+            tables[name] = entry
+        return {'documents': self.documents,
+                'parse_seconds': self.parse_seconds,
+                'embedded_objects': self.embedded_objects,
+                'objects': dict(self.objects),
+                'object_types': dict(self.object_types),
+                'tables': tables,
+                'large_values': self.large_values,
+                'markings': self.markings}
+
+    def format_report(self):
+        report = self.report()
+
+        lines = ["Dry run -- nothing has been written.",
+                 "%s documents parsed in %.3fs, %s embedded objects extracted" % (report['documents'],
+                                                                                  report['parse_seconds'],
+                                                                                  report['embedded_objects']),
+                 "Information objects: %s" % ", ".join(map(lambda x: "%s %s" % (x[1], x[0]),
+                                                           sorted(report['objects'].items())))]
+        for (name, count) in sorted(report['object_types'].items()):
+            lines.append("    %-40s %8d" % (name, count))
+        lines.append("%-20s %8s %9s %8s %10s" % ('Table', 'Cached', 'Existing', 'New', 'Hit ratio'))
+        for name in self.TABLES:
+            entry = report['tables'][name]
+            lines.append("%-20s %8d %9d %8d %10s" % (name,
+                                                     entry['cached'],
+                                                     entry['existing'],
+                                                     entry['new'],
+                                                     '-' if entry['cache_hit_ratio'] is None
+                                                     else "%.1f%%" % (100 * entry['cache_hit_ratio'])))
+        lines.append("%s large values, %s markings" % (report['large_values'], report['markings']))
+        return "\n".join(lines) + "\n"
+
+
+class FactBatchPlanner(FactBatchWriter):
+    """
+    Determines what 'FactBatchWriter.write' would write for the given facts without writing
+    anything: objects of the lookup tables are resolved read-only via the 'ImportPlan', which also
+    counts the rows that would be inserted. The information object need not have been saved.
+
+    Copy-on-write revisions are not planned as such: all InfoObject2Fact rows of the object are counted.
+    """
+
+    def __init__(self, iobject, plan):
+        super(FactBatchPlanner, self).__init__(iobject)
+        self.plan = plan
+
+    def bulk_get_or_create(self, model_name, key_fields, keys, defaults=None):
+        return self.plan.resolve(model_name, key_fields, keys)
+
+    def resolve_iobject_type(self):
+        iobject = self.iobject
+        family_key = _bulk_key((iobject.iobject_family.name,))
+        family_pk = self.plan.resolve('InfoObjectFamily', ('name',), [family_key])[family_key]
+        namespace_key = _bulk_key((iobject.iobject_type.namespace.uri,))
+        namespace_pk = self.plan.resolve('DataTypeNameSpace', ('uri',), [namespace_key])[namespace_key]
+        type_key = _bulk_key((family_pk, namespace_pk, iobject.iobject_type.name))
+        return self.plan.resolve('InfoObjectType', ('iobject_family', 'namespace', 'name'), [type_key])[type_key]
+
+    def link_fact_data_types(self, links):
+        pass
+
+    def write_large_value(self, value):
+        self.plan.large_values += 1
+        if dingos.DINGOS_LARGE_VALUE_DESTINATION == dingos.DINGOS_FILE_SYSTEM:
+            storage_location = dingos.DINGOS_FILE_SYSTEM
+        else:
+            storage_location = dingos.DINGOS_BLOB_TABLE
+        return (hashlib.sha256(value).hexdigest(), storage_location)
+
+    def resolve_facts(self, facts):
+        signature_keys = []
+        for fact in facts:
+            vio = fact.value_iobject_id
+            fact._vio_pk = getattr(vio, 'pk', vio)
+            fact._signature = None
+            if fact._value_pks and len(set(fact._value_pks)) == len(fact._value_pks) and \
+                    not filter(lambda x: isinstance(x, PlannedRow), [fact._fact_term_pk] + fact._value_pks):
+                fact._signature = Fact.calculate_signature(fact._fact_term_pk,
+                                                           fact._value_pks,
+                                                           fact._vio_pk,
+                                                           fact.value_iobject_ts)
+                signature_keys.append((fact._signature,))
+
+        fact_pks = self.plan.resolve('Fact', ('signature',), signature_keys)
+
+        for fact in facts:
+            if fact._signature:
+                fact._fact_pk = fact_pks[_bulk_key((fact._signature,))]
+            else:
+                # As in 'resolve_facts' of the writer, the fact is created anew
+                self.plan.add_new('Fact')
+                fact._fact_pk = PlannedRow('Fact', None)
+
+    def resolve_node_ids(self, facts):
+
+        def lookup(keys, cache_hits):
+            # All existing node identifiers are held in memory; if they are
+            # loaded by this lookup, they are not found in the cache.
+            in_memory = node_id_intern_map.loaded
+            found = dict(map(lambda x: ((x[0],), x[1]), node_id_intern_map.lookup(map(lambda x: x[0], keys)).items()))
+            if in_memory:
+                cache_hits.update(found.keys())
+            return found
+
+        node_id_pks = self.plan.resolve('NodeID', ('name',), map(lambda x: (x.node_id_name,), facts), lookup=lookup)
+        for fact in facts:
+            fact._node_id_pk = node_id_pks[_bulk_key((fact.node_id_name,))]
+
+    def resolve_namespace_maps(self, facts, ns_uri_dict):
+
+        def lookup(keys, cache_hits):
+            # The namespace maps of fact terms that have not been loaded yet are loaded
+            # in one go; only maps of fact terms loaded before are found in the cache.
+            fact_term_pks = set(map(lambda x: x[0], keys))
+            in_memory = set(filter(namespace_map_cache.is_loaded, fact_term_pks))
+            namespace_map_cache.load(fact_term_pks)
+            found = {}
+            for (fact_term_pk, key) in keys:
+                map_pk = namespace_map_cache.get(fact_term_pk, key)
+                if map_pk:
+                    found[(fact_term_pk, key)] = map_pk
+            cache_hits.update(filter(lambda x: x[0] in in_memory, found.keys()))
+            return found
+
+        map_keys = map(lambda x: (x._fact_term_pk, namespace_map_cache.make_key(x.namespaces)), facts)
+
+        map_pks = self.plan.resolve('FactTermNamespaceMap', ('fact_term', 'key'), filter(lambda x: x[1], map_keys),
+                                    lookup=lookup)
+        for (fact, map_key) in zip(facts, map_keys):
+            fact._namespace_map_pk = None
+            if map_key[1]:
+                fact._namespace_map_pk = map_pks[_bulk_key(map_key)]
+
+    def select_changed_facts(self, facts, parent_revision):
+        return facts
+
+    def write_io2f(self, facts):
+        self.plan.add_new('InfoObject2Fact', len(facts))
+        return facts
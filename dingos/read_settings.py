@@ -16,9 +16,9 @@
 #
 
 from django.conf import settings
-from django.core.files.storage import FileSystemStorage
 
 import dingos
+from dingos.core.blob_storage import BlobFileSystemStorage
 
 if settings.configured and 'DINGOS' in dir(settings):
     dingos.DINGOS_TEMPLATE_FAMILY = settings.DINGOS.get('TEMPLATE_FAMILY', dingos.DINGOS_TEMPLATE_FAMILY)
@@ -30,6 +30,18 @@ if settings.configured and 'DINGOS' in dir(settings):
 if settings.configured and 'DINGOS' in dir(settings):
     dingos.DINGOS_BLOB_ROOT = settings.DINGOS.get('BLOB_ROOT',None)
 
+if settings.configured and 'DINGOS' in dir(settings):
+    dingos.DINGOS_BLOB_SHARD_DEPTH = settings.DINGOS.get('BLOB_SHARD_DEPTH',
+                                                        dingos.DINGOS_BLOB_SHARD_DEPTH)
+    dingos.DINGOS_BLOB_COMPRESSION = settings.DINGOS.get('BLOB_COMPRESSION',
+                                                        dingos.DINGOS_BLOB_COMPRESSION)
+
+if settings.configured and 'DINGOS' in dir(settings):
+    dingos.DINGOS_BLOB_CACHE_SIZE = settings.DINGOS.get('BLOB_CACHE_SIZE',
+                                                       dingos.DINGOS_BLOB_CACHE_SIZE)
+    dingos.DINGOS_BLOB_PREVIEW_LENGTH = settings.DINGOS.get('BLOB_PREVIEW_LENGTH',
+                                                           dingos.DINGOS_BLOB_PREVIEW_LENGTH)
+
 if not dingos.DINGOS_BLOB_ROOT:
 
     dingos.DINGOS_BLOB_STORAGE=None
@@ -39,7 +51,9 @@ if not dingos.DINGOS_BLOB_ROOT:
     #                          "values) on the filesystem.")
 else:
 
-    dingos.DINGOS_BLOB_STORAGE = FileSystemStorage(location=dingos.DINGOS_BLOB_ROOT)
+    dingos.DINGOS_BLOB_STORAGE = BlobFileSystemStorage(location=dingos.DINGOS_BLOB_ROOT,
+                                                       compress=dingos.DINGOS_BLOB_COMPRESSION,
+                                                       shard_depth=dingos.DINGOS_BLOB_SHARD_DEPTH)
     # We do not want the blobs to be directly available via URL.
     # Reading the code it seems that setting 'base_url=None' in
     # the __init__ arguments does not help, because __init__
@@ -56,10 +70,32 @@ if settings.configured and 'DINGOS' in dir(settings):
     if configured_large_value_dest:
         if configured_large_value_dest == 'DINGOS_VALUES_TABLE':
             dingos.DINGOS_LARGE_VALUE_DESTINATION = dingos.DINGOS_VALUES_TABLE
-    elif configured_large_value_dest == 'DINGOS_FILE_SYSTEM':
-        dingos.DINGOS_LARGE_VALUE_DESTINATION = dingos.DINGOS_FILE_SYSTEM
-    elif configured_large_value_dest == 'DINGOS_BLOB_TABLE':
-        dingos.DINGOS_LARGE_VALUE_DESTINATION = dingos.DINGOS_BLOB_TABLE
+        elif configured_large_value_dest == 'DINGOS_FILE_SYSTEM':
+            dingos.DINGOS_LARGE_VALUE_DESTINATION = dingos.DINGOS_FILE_SYSTEM
+        elif configured_large_value_dest == 'DINGOS_BLOB_TABLE':
+            dingos.DINGOS_LARGE_VALUE_DESTINATION = dingos.DINGOS_BLOB_TABLE
+
+if settings.configured and 'DINGOS' in dir(settings):
+    dingos.DINGOS_BULK_FACT_WRITE = settings.DINGOS.get('BULK_FACT_WRITE',
+                                                        dingos.DINGOS_BULK_FACT_WRITE)
+
+if settings.configured and 'DINGOS' in dir(settings):
+    dingos.DINGOS_BULK_LOAD_BACKEND = settings.DINGOS.get('BULK_LOAD_BACKEND',
+                                                          dingos.DINGOS_BULK_LOAD_BACKEND)
+
+if settings.configured and 'DINGOS' in dir(settings):
+    dingos.DINGOS_SCHEMA_CACHE_SIZE = settings.DINGOS.get('SCHEMA_CACHE_SIZE',
+                                                          dingos.DINGOS_SCHEMA_CACHE_SIZE)
+
+if settings.configured and 'DINGOS' in dir(settings):
+    dingos.DINGOS_SKIP_UNCHANGED_REIMPORT = settings.DINGOS.get('SKIP_UNCHANGED_REIMPORT',
+                                                               dingos.DINGOS_SKIP_UNCHANGED_REIMPORT)
+
+if settings.configured and 'DINGOS' in dir(settings):
+    dingos.DINGOS_COPY_ON_WRITE_REVISIONS = settings.DINGOS.get('COPY_ON_WRITE_REVISIONS',
+                                                                dingos.DINGOS_COPY_ON_WRITE_REVISIONS)
+    dingos.DINGOS_COPY_ON_WRITE_MAX_CHAIN = settings.DINGOS.get('COPY_ON_WRITE_MAX_CHAIN',
+                                                                dingos.DINGOS_COPY_ON_WRITE_MAX_CHAIN)
 
 if settings.configured and 'DINGOS' in dir(settings):
     dingos.DINGOS_DEFAULT_USER_PREFS = settings.DINGOS.get('DINGOS_DEFAULT_USER_PREFS',
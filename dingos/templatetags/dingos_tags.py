@@ -23,8 +23,9 @@ from django.core.urlresolvers import reverse
 
 from django.utils.html import conditional_escape
 from django.utils.safestring import mark_safe
-from dingos.models import BlobStorage
+from dingos.models import blob_cache
 
+import dingos
 from dingos import DINGOS_TEMPLATE_FAMILY
 
     
@@ -238,17 +239,26 @@ def render_table_ordering(context, index, title):
 
 
 @register.simple_tag
-def lookup_blob(hash_value):
+def lookup_blob(hash_value, preview_length=None):
     """
-    Combines all given arguments to create clean title-tags values.
-    All arguments are divided by a " " seperator and HTML tags
-    are to be removed.
+    Display the content of the given value from the blob table. If a
+    preview length is given, only the start of the content is displayed,
+    followed by a link to the full content.
     """
-    try:
-        blob = BlobStorage.objects.get(sha256=hash_value)
-    except:
+    if preview_length:
+        try:
+            (content, truncated) = blob_cache.load_previews([hash_value], preview_length)[hash_value]
+        except KeyError:
+            return "Blob not found"
+        if truncated:
+            content = '%s... <a href="%s">[full value]</a>' % (content,
+                                                                reverse('url.dingos.view.blob',
+                                                                        kwargs={'sha256': hash_value}))
+        return content
+    content = blob_cache.get(hash_value)
+    if content is None:
         return "Blob not found"
-    return blob.content
+    return content
 
 
 @register.simple_tag
@@ -298,8 +308,22 @@ def show_InfoObject(context, iobject, iobject2facts, highlight=None, show_NodeID
         # If page is out of range (e.g. 9999), deliver last page of results.
         iobject2facts = iobject2facts_paginator.page(iobject2facts_paginator.num_pages)
 
+    # The values in the blob table that are displayed on the page
+    # (or their previews) are loaded in one go.
+
+    blob_preview_length = dingos.DINGOS_BLOB_PREVIEW_LENGTH
+    blob_digests = [value.value
+                    for io2f in iobject2facts
+                    for value in io2f.fact.fact_values.all()
+                    if value.storage_location == dingos.DINGOS_BLOB_TABLE]
+    if blob_preview_length:
+        blob_cache.load_previews(blob_digests, blob_preview_length)
+    else:
+        blob_cache.load(blob_digests)
+
     return {'object': iobject,
             'view' : context['view'],
+            'blob_preview_length' : blob_preview_length,
             'is_paginated' : is_paginated,
             'paginator' : iobject2facts_paginator,
             'page_obj' :iobject2facts,
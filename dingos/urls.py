@@ -36,6 +36,9 @@ urlpatterns = patterns('',
     url(r'^View/InfoObject/(?P<pk>\d*)/$',
         views.InfoObjectView.as_view(),
         name= "url.dingos.view.infoobject"),
+    url(r'^View/Blob/(?P<sha256>[0-9a-f]{64})/$',
+        views.BlobView.as_view(),
+        name= "url.dingos.view.blob"),
     url(r'^Admin/ViewUserPrefs/?$',
         views.UserPrefsView.as_view(),
         name= "url.dingos.admin.view.userprefs"),
@@ -20,10 +20,11 @@ import json
 
 from django import http
 from django.db.models import F
+from django.views.generic import View
 from django.forms.formsets import formset_factory
 from braces.views import SuperuserRequiredMixin
 
-from dingos.models import Identifier, InfoObject2Fact, InfoObject, UserData, FactValue, get_or_create_fact
+from dingos.models import Identifier, InfoObject2Fact, InfoObject, UserData, FactValue, get_or_create_fact, blob_cache
 
 from dingos.filter import InfoObjectFilter, CompleteInfoObjectFilter,FactTermValueFilter, IdSearchFilter , OrderedFactTermValueFilter
 from dingos.forms import EditSavedSearchesForm, EditInfoObjectFieldForm
@@ -209,13 +210,15 @@ class InfoObjectView_wo_login(BasicDetailView):
 
     @property
     def iobject2facts(self):
-        return self.object.fact_thru.all().prefetch_related('fact__fact_term',
-                                                             'fact__fact_values',
-                                                             'fact__fact_values__fact_data_type',
-                                                             'fact__value_iobject_id',
-                                                             'fact__value_iobject_id__latest',
-                                                             'fact__value_iobject_id__latest__iobject_type',
-                                                             'node_id')
+        # The node identifiers are taken from the process-wide intern map
+        # rather than being prefetched from the database.
+        return self.object.get_fact_thrus('fact__fact_term',
+                                          'fact__fact_values',
+                                          'fact__fact_values__fact_data_type',
+                                          'fact__value_iobject_id',
+                                          'fact__value_iobject_id__latest',
+                                          'fact__value_iobject_id__latest__iobject_type',
+                                          intern_node_ids=True)
 
 
 
@@ -463,3 +466,17 @@ class InfoObjectJSONView(BasicDetailView):
                                  content_type='application/json',
                                  **httpresponse_kwargs)
 
+
+class BlobView(LoginRequiredMixin, View):
+    """
+    View for the full content of a value in the blob table (as plain text);
+    the facts of an information object link to it if only a preview of
+    the value is displayed (see DINGOS_BLOB_PREVIEW_LENGTH).
+    """
+
+    def get(self, request, sha256):
+        content = blob_cache.get(sha256)
+        if content is None:
+            raise http.Http404
+        return http.HttpResponse(content,
+                                 content_type='text/plain; charset=utf-8')
@@ -1,4 +1,6 @@
+import os
 import sys
+import tempfile
 from optparse import OptionParser
 
 try:
@@ -11,6 +13,9 @@ try:
         DATABASES={
             "default": {
                 "ENGINE": "django.db.backends.sqlite3",
+                # The worker processes of parallel imports must see the test database,
+                # which therefore cannot be kept in memory.
+                "TEST_NAME": os.path.join(tempfile.gettempdir(), "dingos_test.sqlite"),
             }
         },
         ROOT_URLCONF="dingos.urls",
@@ -35,7 +40,7 @@ def run_tests(*test_args):
         test_args = ['tests']
 
     # Run tests
-    test_runner = NoseTestSuiteRunner(verbosity=1)
+    test_runner = NoseTestSuiteRunner(verbosity=1, interactive=False)
 
     failures = test_runner.run_tests(test_args)
 
@@ -0,0 +1,218 @@
+"""
+Micro-benchmark for 'DingoObjDict.flatten'
+------------
+
+Compares the flattening of DingoObjDicts as carried out by 'DingoObjDict.flatten' with the
+implementation used up to Dingos 0.2.1, which sorted the list of facts at every level
+of the recursion. Run with::
+
+    python tests/bench_flatten.py [number of repetitions]
+
+The module also serves as reference for the tests of 'flatten' in test_models.py.
+"""
+
+import sys
+import os
+import re
+import logging
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dingos.core.datastructures import DingoObjDict
+
+logger = logging.getLogger(__name__)
+
+
+def sorting_flatten(self, attr_ignore_predicate=None, force_nonleaf_fact_predicate=None, namespace_dict=None):
+    """
+    The implementation of 'DingoObjDict.flatten' used up to Dingos 0.2.1.
+    """
+    if not namespace_dict:
+        namespace_dict = {}
+
+
+
+    def node_id_gen(n):
+        """
+        Given an integer, generate a fixed-length representation.
+
+        This is used for coding tree-node representations such
+        as N001:N005:N009 (9th child of 5th child of 1st child).
+
+        Currently, we use three digits, i.e., we get problems
+        if we import stuff with more than 1000 children in a node.
+
+        """
+
+        return "%s%04d" % (n[0], n[1])
+
+
+
+    RE_ELEMENT_MATCHER = re.compile(r"[^@_].*")
+
+
+    def _flatten(self, result_list, attr_dict, elt_names, prefix):
+        """
+        Flatten a Dingo dictionary representation of an infomration object into a list
+        of fact-term/value pairs and associated information about tree structure (in node_id)
+        and XML attributes.
+
+        Internal function for recursive calls.
+
+        """
+
+        if '@@ns' in self.keys():
+            current_namespace = (namespace_dict.get(self.get('@@ns'),None),self.get('@@ns'))
+        else:
+            current_namespace = (None,None)
+
+        attributes = filter(lambda x: x[0] == '@', self.keys())
+
+        node_id = ':'.join(map(node_id_gen, prefix))
+        for attribute in attributes:
+            if node_id not in attr_dict.keys():
+                attr_dict[node_id] = {attribute[1:]: self[attribute]}
+            else:
+                attr_dict[node_id][attribute[1:]] = self[attribute]
+
+        elements = filter(lambda x: RE_ELEMENT_MATCHER.match(x), self)
+
+        fact_data = {'term': '/'.join(elt_names),
+                     'namespaces' : map(lambda x: x[2],prefix),
+                     'value': self.get('_value', ''),
+                     'attribute': False,
+                     'node_id': node_id}
+
+        if elements == [] or force_nonleaf_fact_predicate(fact_data,attributes):
+            logger.debug("Entered _VALUE branch for %s" % self)
+            if '_value' in self.keys() or attributes != []:
+                fact_data = {'term': '/'.join(elt_names),
+                             'namespaces' : map(lambda x: x[2],prefix),
+                             'value': self.get('_value', ''),
+                             'attribute': False,
+                             'node_id': node_id}
+                result_list.append(fact_data)
+                logger.debug("Appended fact %s" % fact_data)
+        if elements != []:
+
+            counter = 0
+            for element in elements:
+                logger.debug("Processing element %s" % element)
+                if type(self[element]) == type([]):
+                    logger.debug("Entered list branch for %s " % self[element])
+
+                    for sub_elt in self[element]:
+                        current_namespace = (namespace_dict.get(sub_elt.get('@@ns'),None),sub_elt.get('@@ns'))
+
+                        (result_list, attr_dict) = _flatten(sub_elt,
+                                                            result_list=result_list,
+                                                            attr_dict=attr_dict,
+                                                            elt_names=elt_names + [element],
+                                                            prefix=prefix + [('L', counter,current_namespace)])
+
+
+                        counter += 1
+                elif isinstance(self[element],basestring):
+                    logger.debug("Entered value branch for %s" % self[element])
+                    # added this branch to deal with abbreviated dictionaries
+                    # that provide value directly rather then via '_value' key in dictionary
+
+                    # temporarily append namespace
+                    elt_names.append(element)
+
+                    fact_data = {'term': '/'.join(elt_names),
+                                 'namespaces' : map(lambda x: x[2],prefix + [('N',counter,current_namespace)]),
+                                 'value': self[element],
+                                 'attribute': False,
+                                 'node_id': "%s" % ':'.join(map(node_id_gen, prefix + [('N', counter,current_namespace)]))}
+                    logger.debug("Appended fact %s" % fact_data)
+                    result_list.append(fact_data)
+                    # clean up namespace
+                    elt_names = elt_names[:-1]
+                    counter += 1
+                else:
+                    logger.debug("Recursing for %s" % self[element])
+                    current_namespace = (namespace_dict.get(self[element].get('@@ns'),None),self[element].get('@@ns'))
+
+                    (result_list, attr_dict) = _flatten(self[element],
+                                                        result_list=result_list,
+                                                        attr_dict=attr_dict,
+                                                        elt_names=elt_names + [element],
+                                                        prefix=prefix + [('N', counter,current_namespace)])
+                    counter += 1
+
+        attr_counter = 0
+        for attribute in attributes:
+            if node_id == '':
+                attr_node_id = node_id_gen(('A', attr_counter,(None,None)))
+            else:
+                attr_node_id = "%s:%s" % (node_id, node_id_gen(('A', attr_counter,(None,None))))
+            fact = {'term': "%s" % ('/'.join(elt_names)),
+                    'namespaces' : map(lambda x: x[2],prefix),
+                    'value': self[attribute],
+                    'node_id': attr_node_id,
+                    'attribute': attribute[1:],
+                    'number_of_attributed_elements': len(elements)}
+            if not attr_ignore_predicate(fact):
+                del(fact['number_of_attributed_elements'])
+                result_list.append(fact)
+                logger.debug("Appended fact %s" % fact)
+                attr_counter += 1
+            else:
+                logger.debug("Ignoring fact %s because of attr_ignore_list" % fact)
+        result_list.sort(key=lambda x: x['node_id'])
+
+        return (result_list, attr_dict)
+
+    if not attr_ignore_predicate:
+        attr_ignore_predicate = (lambda x: '@' in x['attribute'])
+
+    if not force_nonleaf_fact_predicate:
+        force_nonleaf_fact_predicate = (lambda x,y: False)
+
+    return _flatten(self,result_list=[], attr_dict={}, elt_names=[], prefix=[])
+
+
+def make_obj_dict(width, depth, namespace='cybox'):
+    """
+    Create a DingoObjDict resembling a CybOX object: each level has 'width' elements
+    with attributes and a list of 'width' subtrees of the given depth.
+    """
+    result = DingoObjDict()
+    result['@@ns'] = namespace
+    result['@id'] = 'example:Object-%s-%s' % (width, depth)
+    for i in range(width):
+        element = DingoObjDict()
+        element['@condition'] = 'Equals'
+        element['_value'] = 'Value %s' % i
+        result['Property_%s' % i] = element
+    result['Name'] = 'Object of depth %s' % depth
+    if depth > 0:
+        result['Related'] = map(lambda x: make_obj_dict(width, depth - 1, namespace), range(width))
+    return result
+
+
+def benchmark(obj_dict, repetitions):
+    """
+    Check that both implementations yield the same result and return the
+    time taken (in seconds) by each implementation for the given number of repetitions.
+    """
+    namespace_dict = {'cybox': 'http://cybox.mitre.org/cybox-2'}
+    if sorting_flatten(obj_dict, namespace_dict=namespace_dict) != obj_dict.flatten(namespace_dict=namespace_dict):
+        raise AssertionError("Flattened representations differ")
+    return (timeit.timeit(lambda: sorting_flatten(obj_dict, namespace_dict=namespace_dict), number=repetitions),
+            timeit.timeit(lambda: obj_dict.flatten(namespace_dict=namespace_dict), number=repetitions))
+
+
+if __name__ == '__main__':
+
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+
+    print "%-8s %-8s %10s %12s %12s %8s" % ('width', 'depth', 'facts', 'sorting (s)', 'linear (s)', 'speedup')
+    for (width, depth) in [(3, 2), (3, 4), (5, 3), (3, 6), (5, 4)]:
+        obj_dict = make_obj_dict(width, depth)
+        facts = len(obj_dict.flatten()[0])
+        (sorting_time, linear_time) = benchmark(obj_dict, repetitions)
+        print "%-8s %-8s %10s %12.3f %12.3f %8.1f" % (width, depth, facts, sorting_time, linear_time,
+                                                      sorting_time / linear_time)
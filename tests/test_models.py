@@ -9,18 +9,49 @@ Tests for `django-dingos` modules module.
 """
 
 import unittest
+import re
+import hashlib
+import os
+import sys
+import tempfile
+import shutil
+import pickle
+import copy
+import json
+import StringIO
+
+import dingos
 
 from dingos import models
 
 from utils import deltaCalc
+from bench_flatten import sorting_flatten, make_obj_dict
 
 from django import test
+from django.db import connection, IntegrityError
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.contrib.auth.models import User
+from django.template import Template, Context
 
 from dingos.management.commands.dingos_generic_xml_import import Command
 
+from dingos.import_handling import DingoImportHandling, EXIST_ID_AND_EXACT_TIMESTAMP, EXIST_ID_AND_OLDER_TIMESTAMP, \
+    EXIST_ID_AND_NEWER_TIMESTAMP, EXIST_PLACEHOLDER, NO_EXISTING_OBJECT_FOUND
+from dingos.importer import Generic_XML_Import, DingoImporter
+from dingos import importer as importer_module
+from dingos.views import BlobView
+
+from dingos.core.datastructures import LRUCache, SizeBoundedLRUCache, DingoObjDict, FlatFact
+from dingos.core import profiling
+from dingos.core.blob_storage import BlobFileSystemStorage
+
 import pprint
 
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from django.utils import timezone
 
 now = datetime.now()
 
@@ -28,7 +59,8 @@ pp = pprint.PrettyPrinter(indent=2)
 
 class creation_Tests(test.TestCase):
     def setUp(self):
-        pass
+        # Objects cached in an earlier test have been rolled back
+        models.clear_schema_caches()
     def test_creation(self):
 
         @deltaCalc
@@ -60,6 +92,8 @@ class InfoObject_Tests(test.TestCase):
 
     def setUp(self):
 
+        models.clear_schema_caches()
+
         self.enrichment, created = models.get_or_create_iobject(identifier_uid="1234",
                                                          identifier_namespace_uri="http://test.org",
                                                          iobject_type_name="File",
@@ -128,9 +162,175 @@ class InfoObject_Tests(test.TestCase):
                                  ('NodeID', 1)])
 
 
+    def test_add_facts(self):
+
+        @deltaCalc
+        def t_add_facts(*args,**kwargs):
+            return self.enrichment.add_facts(*args,**kwargs)
+
+        fact_kargs = {'fact_term_attribute' : None,
+                      'fact_dt_name' : 'String',
+                      'fact_dt_kind' : models.FactDataType.VOCAB_SINGLE}
+
+        fact_list = [dict(fact_kargs, fact_term_name='Filename', values=["iexplore.exe"], node_id_name='N0000'),
+                     dict(fact_kargs, fact_term_name='Filename', values=["iexplore.exe","evil.exe"], node_id_name='N0001'),
+                     dict(fact_kargs, fact_term_name='Filename', values=["evil.exe"], node_id_name='N0002'),
+                     dict(fact_kargs, fact_term_name='Filename', values=["evil.exe"], node_id_name='N0003'),
+                     dict(fact_kargs, fact_term_name='OtherTerm', values=["evil.exe"], node_id_name='N0004'),
+                     dict(fact_kargs, fact_term_name='Filename', fact_term_attribute='type',
+                          values=["exe"], node_id_name='N0004:A0000')]
+
+        (delta,result) = t_add_facts(fact_list)
+
+        # The same objects are created as by calling 'add_fact' for each fact;
+        # in particular, the facts for 'N0002' and 'N0003' are the same.
+
+        expected = [ ('DataTypeNameSpace', 1),
+                     ('Fact', 5),
+                     ('FactDataType', 1),
+                     ('FactTerm', 3),
+                     ('FactTerm2Type', 3),
+                     ('FactValue', 3),
+                     ('InfoObject2Fact', 6),
+                     ('NodeID', 6)]
+        self.assertEqual(delta,expected)
+
+        io2fs = dict(map(lambda x: (x.node_id.name,x), self.enrichment.fact_thru.all()))
+
+        self.assertEqual(io2fs['N0002'].fact_id,io2fs['N0003'].fact_id)
+        self.assertEqual(io2fs['N0004:A0000'].attributed_fact_id,io2fs['N0004'].pk)
+        self.assertEqual(io2fs['N0004'].attributed_fact_id,None)
+
+
+    def test_name_from_dict(self):
+
+        models.InfoObjectNaming.objects.create(iobject_type=self.enrichment.iobject_type,
+                                               format_string='[Filename] ([Filename@type], [fact_count] facts)',
+                                               position=1)
+
+        filename = DingoObjDict()
+        filename['@type'] = 'exe'
+        filename['_value'] = 'evil.exe'
+        obj_dict = DingoObjDict()
+        obj_dict['Filename'] = filename
+        obj_dict['Content'] = 'x' * (dingos.DINGOS_MAX_VALUE_SIZE_WRITTEN_TO_VALUE_TABLE + 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.enrichment.from_dict(obj_dict, bulk_write=True)
+
+        self.assertEqual(self.enrichment.name, 'evil.exe (exe, 3 facts)')
+        with CaptureQueriesContext(connection) as extract_queries:
+            self.assertEqual(self.enrichment.name, self.enrichment.extract_name())
+        self.assertEqual(len(filter(lambda x: 'ORDER BY "dingos_nodeid"."name"' in x['sql'],
+                                    extract_queries.captured_queries)),
+                         1)
+
+        # The name is determined without querying the facts of the object
+
+        self.assertEqual(filter(lambda x: 'ORDER BY "dingos_nodeid"."name"' in x['sql'],
+                                queries.captured_queries),
+                         [])
+
+        # The blob-table value is named with its content, just as by 'extract_name'
+
+        models.InfoObjectNaming.objects.create(iobject_type=self.enrichment.iobject_type,
+                                               format_string='[Content]',
+                                               position=0)
+        self.enrichment.from_dict(obj_dict, bulk_write=True)
+        self.assertEqual(self.enrichment.name, obj_dict['Content'][:254])
+        self.assertEqual(self.enrichment.name, self.enrichment.extract_name()[:254])
+
+    def test_fact_value_digest(self):
+
+        value = u"N\xfcrnberg " * 150
+
+        for node_id_name in ['N0000','N0001']:
+            self.enrichment.add_fact(fact_term_name='City',
+                                     fact_term_attribute=None,
+                                     values=[value],
+                                     node_id_name=node_id_name)
+
+        fact_values = models.FactValue.objects.filter(value_hash=models.FactValue.digest(value))
+        self.assertEqual(len(fact_values),1)
+        self.assertEqual(fact_values[0].value,value)
+        self.assertEqual(fact_values[0].value_hash,hashlib.sha256(value.encode('utf-8')).hexdigest())
+
+
+    def test_fact_signature_backfill(self):
+
+        kargs = {'fact_term_name' : 'Filename',
+                 'fact_term_attribute' : None,
+                 'values' : ["iexplore.exe","evil.exe"]}
+
+        io2f = self.enrichment.add_fact(node_id_name='N0000',**kargs)
+        signature = io2f.fact.signature
+        self.assertEqual(len(signature),64)
+
+        # Simulate a fact created before signatures were introduced
+
+        models.Fact.objects.filter(pk=io2f.fact.pk).update(signature='')
+
+        (delta,result) = deltaCalc(self.enrichment.add_fact)(node_id_name='N0001',**kargs)
+        self.assertEqual(delta,[('Fact', 1), ('InfoObject2Fact', 1), ('NodeID', 1)])
+
+        call_command('dingos_calculate_fact_signatures')
+
+        self.assertEqual(models.Fact.objects.filter(signature='').count(),0)
+        self.assertEqual(models.Fact.objects.get(pk=io2f.fact.pk).signature,signature)
+
+        io2f = self.enrichment.add_fact(node_id_name='N0002',**kargs)
+        self.assertEqual(io2f.fact.signature,signature)
+
+
+    def test_attributed_facts(self):
+
+        fact_kargs = {'fact_term_name' : 'Hash',
+                      'fact_term_attribute' : None,
+                      'values' : ['abc']}
+        attr_kargs = {'fact_term_name' : 'Hash',
+                      'fact_term_attribute' : 'type',
+                      'values' : ['MD5']}
+
+        self.enrichment.add_fact(node_id_name='N0000',**fact_kargs)
+        self.enrichment.add_fact(node_id_name='N0000:A0000',**attr_kargs)
+
+        # Facts added in bulk may be attributes of facts that already exist
+        # or that precede them in the list; an attribute that precedes
+        # the fact it belongs to remains without attributed fact.
+
+        self.enrichment.add_facts([dict(attr_kargs,node_id_name='N0000:A0001'),
+                                   dict(fact_kargs,node_id_name='N0001'),
+                                   dict(attr_kargs,node_id_name='N0001:A0000'),
+                                   dict(attr_kargs,node_id_name='N0002:A0000'),
+                                   dict(fact_kargs,node_id_name='N0002')])
+
+        # Start with a fresh object for which the node-id map must be loaded
+
+        enrichment = models.InfoObject.objects.get(pk=self.enrichment.pk)
+        enrichment.add_fact(node_id_name='N0001:A0001',**attr_kargs)
+
+        io2fs = dict(map(lambda x: (x.node_id.name,x), enrichment.fact_thru.all()))
+
+        self.assertEqual(io2fs['N0000:A0000'].attributed_fact_id,io2fs['N0000'].pk)
+        self.assertEqual(io2fs['N0000:A0001'].attributed_fact_id,io2fs['N0000'].pk)
+        self.assertEqual(io2fs['N0001:A0000'].attributed_fact_id,io2fs['N0001'].pk)
+        self.assertEqual(io2fs['N0001:A0001'].attributed_fact_id,io2fs['N0001'].pk)
+        self.assertEqual(io2fs['N0002:A0000'].attributed_fact_id,None)
+
+        # With the node-id map loaded, adding an attribute does not require
+        # a query for finding the attributed fact.
+
+        with CaptureQueriesContext(connection) as queries:
+            enrichment.add_fact(node_id_name='N0001:A0002',**attr_kargs)
+        self.assertEqual(filter(lambda x: '"dingos_infoobject2fact"."iobject_id" = ' in x['sql'],
+                                queries.captured_queries),
+                         [])
+
+
 class XML_Import_Tests(test.TestCase):
 
     def setUp(self):
+        models.clear_schema_caches()
         self.command = Command()
 
     def test_import_without_namespace(self):
@@ -173,16 +373,45 @@ class XML_Import_Tests(test.TestCase):
                                   marking_json='tests/testdata/markings/import_info.json')
         #print "Import Test"
 
+        # The content is unchanged, so only the marking object is created
+        # and the existing object is marked with it.
+
         expected = [ ('Identifier', 1),
-                     ('InfoObject', 2),
-                     ('InfoObject2Fact', 17),
+                     ('InfoObject', 1),
+                     ('InfoObject2Fact', 6),
                      ('Marking2X', 1)]
 
         self.assertEqual(delta,expected)
 
         #pp.pprint(delta)
 
+    def test_import_bulk_write(self):
+
+        # Writing facts in bulk must yield the same result as
+        # writing one fact at a time.
+
+        bulk_setting = dingos.DINGOS_BULK_FACT_WRITE
+
+        results = []
+        try:
+            for bulk_write in [False,True]:
+                dingos.DINGOS_BULK_FACT_WRITE = bulk_write
+                self.command.handle('tests/testdata/xml/person_with_namespaces.xml',
+                                    uid='bulk_%s' % bulk_write,
+                                    placeholder_fillers=[],
+                                    identifier_ns_uri=None,
+                                    marking_json='tests/testdata/markings/import_info.json')
+                iobject = models.InfoObject.objects.get(identifier__uid='bulk_%s' % bulk_write)
+                results.append((iobject.name,
+                                iobject.to_dict(include_node_id=True,track_namespaces=True),
+                                list(iobject.fact_thru.values_list('node_id__name',
+                                                                   'fact',
+                                                                   'attributed_fact__node_id__name',
+                                                                   'namespace_map__namespaces_thru__namespace__uri'))))
+        finally:
+            dingos.DINGOS_BULK_FACT_WRITE = bulk_setting
 
+        self.assertEqual(results[0],results[1])
 
     def test_import_with_namespace(self):
 
@@ -226,9 +455,12 @@ class XML_Import_Tests(test.TestCase):
                                   marking_json='tests/testdata/markings/import_info.json')
         #print "Import Test"
 
+        # The content is unchanged, so only the marking object is created
+        # and the existing object is marked with it.
+
         expected = [ ('Identifier', 1),
-                     ('InfoObject', 2),
-                     ('InfoObject2Fact', 18),
+                     ('InfoObject', 1),
+                     ('InfoObject2Fact', 6),
                      ('Marking2X', 1)]
 
         self.assertEqual(delta,expected)
@@ -237,3 +469,1270 @@ class XML_Import_Tests(test.TestCase):
 
 
 
+
+
+    def test_skip_unchanged_reimport(self):
+
+        @deltaCalc
+        def t_import(filename):
+            return self.command.handle(filename,
+                                       uid='unchanged',
+                                       placeholder_fillers=[],
+                                       identifier_ns_uri=None)
+
+        t_import('tests/testdata/xml/person.xml')
+        iobject = models.InfoObject.objects.get(identifier__uid='unchanged')
+        self.assertEqual(len(iobject.content_digest),64)
+
+        (delta,result) = t_import('tests/testdata/xml/person.xml')
+        self.assertEqual(delta,[])
+
+        # Changed content leads to a new revision ...
+
+        (delta,result) = t_import('tests/testdata/xml/person_with_namespaces.xml')
+        self.assertEqual(dict(delta)['InfoObject'],1)
+        self.assertEqual(dict(delta)['InfoObject2Fact'],12)
+
+        # ... as does unchanged content if skipping is switched off.
+
+        skip_setting = dingos.DINGOS_SKIP_UNCHANGED_REIMPORT
+        try:
+            dingos.DINGOS_SKIP_UNCHANGED_REIMPORT = False
+            (delta,result) = t_import('tests/testdata/xml/person_with_namespaces.xml')
+        finally:
+            dingos.DINGOS_SKIP_UNCHANGED_REIMPORT = skip_setting
+        self.assertEqual(delta,[('InfoObject', 1),('InfoObject2Fact', 12)])
+
+        # Unchanged content is imported again if the importer's hooks have changed
+
+        import_version = self.command.Importer.import_version
+        try:
+            self.command.Importer.import_version = '2'
+            (delta,result) = t_import('tests/testdata/xml/person_with_namespaces.xml')
+            self.assertEqual(delta,[('InfoObject', 1),('InfoObject2Fact', 12)])
+            (delta,result) = t_import('tests/testdata/xml/person_with_namespaces.xml')
+            self.assertEqual(delta,[])
+        finally:
+            self.command.Importer.import_version = import_version
+
+    def test_copy_on_write_revisions(self):
+
+        modified_xml = open('tests/testdata/xml/person.xml').read().replace(
+            '<age>25</age>', '<age>26</age>').replace(
+            '<postalCode>10021</postalCode>', '').replace(
+            'type="fax"', 'type="work"').replace(
+            '</phoneNumbers>', '</phoneNumbers><email>john@example.com</email>')
+        modified_file = tempfile.NamedTemporaryFile(suffix='.xml')
+        modified_file.write(modified_xml)
+        modified_file.flush()
+
+        @deltaCalc
+        def t_import(filename, uid):
+            return self.command.handle(filename,
+                                       uid=uid,
+                                       placeholder_fillers=[],
+                                       identifier_ns_uri=None)
+
+        def latest(uid):
+            return models.Identifier.objects.get(uid=uid).latest
+
+        cow_setting = dingos.DINGOS_COPY_ON_WRITE_REVISIONS
+        try:
+            dingos.DINGOS_COPY_ON_WRITE_REVISIONS = True
+            t_import('tests/testdata/xml/person.xml', 'cow')
+            (delta,result) = t_import(modified_file.name, 'cow')
+            cow_revision = latest('cow')
+            (chain_delta,result) = t_import('tests/testdata/xml/person.xml', 'cow')
+            chained_revision = latest('cow')
+        finally:
+            dingos.DINGOS_COPY_ON_WRITE_REVISIONS = cow_setting
+
+        t_import('tests/testdata/xml/person.xml', 'full')
+        t_import(modified_file.name, 'full')
+        full_revision = latest('full')
+
+        # Only the changed age, the changed phone-number type and the added email
+        # are written; the removed postal code is recorded as removed.
+
+        self.assertEqual(delta,[('Fact', 3),
+                                ('FactTerm', 1),
+                                ('FactTerm2Type', 1),
+                                ('FactValue', 3),
+                                ('InfoObject', 1),
+                                ('InfoObject2Fact', 3),
+                                ('InfoObjectRemovedNode', 1),
+                                ('NodeID', 1)])
+
+        self.assertEqual(cow_revision.parent_revision.identifier.uid,'cow')
+        self.assertEqual(cow_revision.to_dict(),full_revision.to_dict())
+        self.assertEqual(cow_revision.name,full_revision.name)
+
+        self.assertEqual(chained_revision.get_revision_chain(),
+                         [chained_revision.pk,cow_revision.pk,cow_revision.parent_revision_id])
+        self.assertEqual(chained_revision.to_dict(),cow_revision.parent_revision.to_dict())
+
+    def test_prefetch_existing_revisions(self):
+
+        importer = DingoImportHandling()
+        ns_uri = 'http://test.org'
+        t0 = timezone.now()
+        t1 = t0 + timedelta(days=1)
+        t2 = t0 + timedelta(days=2)
+
+        def create(uid, timestamp, **kwargs):
+            iobject_data = DingoObjDict()
+            iobject_data['value'] = '%s' % timestamp
+            return importer.create_iobject(identifier_ns_uri=ns_uri,
+                                           uid=uid,
+                                           timestamp=timestamp,
+                                           iobject_data=iobject_data,
+                                           skip_unchanged=False,
+                                           **kwargs)
+
+        object_kwargs = {'iobject_type_name': 'Test',
+                         'iobject_type_namespace_uri': ns_uri,
+                         'iobject_family_name': 'test'}
+
+        create('a', t0, **object_kwargs)
+        create('b', t0, **object_kwargs)
+        create('p', t0)
+
+        with CaptureQueriesContext(connection) as queries:
+            importer.prefetch_existing_revisions([(ns_uri, 'a', t0),
+                                                  (ns_uri, 'b', t2),
+                                                  (ns_uri, 'b', t1),
+                                                  (ns_uri, 'c', t0),
+                                                  (ns_uri, 'p', t0)])
+        self.assertEqual(len(queries), 3)
+
+        with CaptureQueriesContext(connection) as queries:
+            results = [create('a', t0, **object_kwargs),
+                       create('b', t2, **object_kwargs),
+                       create('b', t1, **object_kwargs),
+                       create('c', t0, **object_kwargs),
+                       create('p', t0, **object_kwargs)]
+
+        # The revision of 'b' written with timestamp t2 is taken into account
+        # for the revision with timestamp t1.
+
+        self.assertEqual(map(lambda x: x[1], results),
+                         [EXIST_ID_AND_EXACT_TIMESTAMP,
+                          EXIST_ID_AND_OLDER_TIMESTAMP,
+                          EXIST_ID_AND_NEWER_TIMESTAMP,
+                          NO_EXISTING_OBJECT_FOUND,
+                          EXIST_PLACEHOLDER])
+
+        # No existence checks have been carried out per object
+
+        self.assertEqual(filter(lambda x: 'ORDER BY "dingos_infoobject"."timestamp" DESC' in x['sql'],
+                                queries.captured_queries),
+                         [])
+
+        # A further prefetch replaces the information gathered before
+
+        importer.prefetch_existing_revisions([(ns_uri, 'c', t1)])
+        self.assertEqual(importer._existing_revisions.keys(), [(ns_uri, 'c')])
+        self.assertEqual(importer._existing_revisions[(ns_uri, 'c')]['latest'].timestamp, t0)
+
+    def test_prefetch_revisions_for_import_result(self):
+
+        importer = DingoImportHandling()
+        ns_uri = 'http://test.org'
+        timestamp = timezone.now()
+
+        def id_and_revision_extractor(xml_elt):
+            return {'id': 'test:%s' % xml_elt.name,
+                    'timestamp': timestamp}
+
+        def embedded_predicate(parent, child, ns_mapping):
+            if child.name in ['address','phoneNumber']:
+                return ns_mapping.get('who')
+            return False
+
+        def id_triple_extractor(id_and_rev_info):
+            return (ns_uri, id_and_rev_info['id'], id_and_rev_info['timestamp'])
+
+        kwargs = {'xml_fname': 'tests/testdata/xml/person_with_namespaces.xml',
+                  'ns_mapping': {},
+                  'embedded_predicate': embedded_predicate,
+                  'id_and_revision_extractor': id_and_revision_extractor,
+                  'id_triple_extractor': id_triple_extractor}
+
+        def write(result):
+            for found_object in [result] + list(result['embedded_objects']):
+                (namespace_uri, uid, timestamp) = id_triple_extractor(found_object['id_and_rev_info'])
+                importer.create_iobject(identifier_ns_uri=namespace_uri,
+                                        uid=uid,
+                                        timestamp=timestamp,
+                                        iobject_type_name=found_object['elt_name'],
+                                        iobject_type_namespace_uri=ns_uri,
+                                        iobject_family_name='test',
+                                        iobject_data=found_object['dict_repr'],
+                                        namespace_dict=kwargs['ns_mapping'])
+
+        for existing in [False, True]:
+            with CaptureQueriesContext(connection) as queries:
+                result = importer.xml_import(**kwargs)
+                uids = set(map(lambda x: x['id_and_rev_info']['id'],
+                               [result] + list(result['embedded_objects'])))
+                self.assertEqual(set(importer._existing_revisions.keys()),
+                                 set(map(lambda x: (ns_uri, x), uids)))
+                write(result)
+
+            # No existence checks have been carried out per object
+
+            self.assertEqual(filter(lambda x: ('FROM "dingos_infoobject"' in x['sql']
+                                               and '"dingos_identifier"."uid" = ' in x['sql']),
+                                    queries.captured_queries),
+                             [])
+
+        self.assertEqual(models.InfoObject.objects.filter(identifier__namespace__uri=ns_uri).count(), len(uids))
+
+    def test_failed_import_leaves_no_data(self):
+
+        class FailingImport(Generic_XML_Import):
+            def datatype_extractor(self, iobject, fact, attr_info, namespace_mapping, add_fact_kargs):
+                if fact['term'] == 'phoneNumbers/phoneNumber':
+                    raise ValueError("Cannot determine data type")
+                return False
+
+        class FailingCommand(Command):
+            Importer = FailingImport()
+
+        @deltaCalc
+        def t_import(*args,**kwargs):
+            return FailingCommand().import_file(*args,**kwargs)
+
+        (delta,result) = t_import('tests/testdata/xml/person.xml',
+                                  [],
+                                  {'uid': 'failing',
+                                   'identifier_ns_uri': None})
+
+        self.assertFalse(result['success'])
+        self.assertEqual(delta,[])
+
+        # The schema caches do not contain objects that have been rolled back
+
+        for cache in models.schema_caches.values():
+            self.assertEqual(len(cache),0)
+
+    def test_retry_after_integrity_error(self):
+
+        class FlakyImport(Generic_XML_Import):
+            attempts = []
+
+            def xml_import(self, *args, **kwargs):
+                self.attempts.append(kwargs['filepath'])
+                Generic_XML_Import.xml_import(self, *args, **kwargs)
+                if len(self.attempts) == 1:
+                    raise IntegrityError("Another process has created the same object")
+
+        class FlakyCommand(Command):
+            Importer = FlakyImport()
+            IMPORT_RETRY_DELAY = 0
+
+        result = FlakyCommand().import_file('tests/testdata/xml/person.xml',
+                                            [],
+                                            {'uid': 'flaky',
+                                             'identifier_ns_uri': None})
+
+        self.assertTrue(result['success'])
+        self.assertEqual(len(FlakyImport.attempts), 2)
+
+        # The object written by the failed attempt has been rolled back
+
+        self.assertEqual(models.InfoObject.objects.filter(identifier__uid='flaky').count(), 1)
+
+    def test_streaming_import(self):
+
+        importer = DingoImportHandling()
+
+        def id_and_revision_extractor(xml_elt):
+            return {'id': 'test:%s' % xml_elt.name,
+                    'timestamp': None}
+
+        def embedded_predicate(parent, child, ns_mapping):
+            if child.name in ['address','phoneNumber']:
+                return ns_mapping.get('who')
+            return False
+
+        kwargs = {'embedded_predicate' : embedded_predicate,
+                  'id_and_revision_extractor' : id_and_revision_extractor}
+
+        result = importer.xml_import(xml_fname='tests/testdata/xml/person_with_namespaces.xml',
+                                     ns_mapping={},
+                                     **kwargs)
+
+        streamed = list(importer.xml_import_stream('tests/testdata/xml/person_with_namespaces.xml',
+                                                   **kwargs))
+
+        # The top-level object comes last, after all embedded objects
+
+        top_level = streamed.pop()
+
+        self.assertEqual(top_level['elt_name'],result['elt_name'])
+        self.assertEqual(top_level['dict_repr'],result['dict_repr'])
+        self.assertEqual(top_level['unprocessed'],[])
+
+        self.assertEqual(len(streamed),3)
+        self.assertEqual(sorted(map(lambda x: (x['id_and_rev_info']['id'],x['dict_repr'].flatten()),streamed)),
+                         sorted(map(lambda x: (x['id_and_rev_info']['id'],x['dict_repr'].flatten()),
+                                    result['embedded_objects'])))
+
+    def test_streaming_import_of_embedded_objects(self):
+
+        importer = DingoImportHandling()
+
+        xml_content = """<r:root xmlns:r="urn:r">
+                           Mixed <b>content <r:obj id="o1"><v>1</v></r:obj></b>
+                           <group>
+                             <r:obj id="o2"><v>2</v><r:obj id="o3"><v>3</v></r:obj></r:obj>
+                             <sub>text <i>and</i> elements</sub>
+                             <dup><a>1</a><b>2</b><a>3</a></dup>
+                             <r:obj id="o4"><v>4</v></r:obj>
+                           </group>
+                           <r:obj id="o5"/>
+                         </r:root>"""
+
+        (handle, xml_fname) = tempfile.mkstemp(suffix='.xml')
+        with os.fdopen(handle, 'w') as xml_file:
+            xml_file.write(xml_content)
+
+        predicate_calls = []
+
+        def id_and_revision_extractor(xml_elt):
+            return {'id': 'test:%s' % (xml_elt.prop('id') or xml_elt.name),
+                    'timestamp': None}
+
+        def embedded_predicate(parent, child, ns_mapping):
+            predicate_calls.append(child.prop('id'))
+            return child.name == 'obj' and 'urn:r'
+
+        kwargs = {'embedded_predicate' : embedded_predicate,
+                  'id_and_revision_extractor' : id_and_revision_extractor}
+
+        try:
+            result = importer.xml_import(xml_fname=xml_fname,
+                                         ns_mapping={},
+                                         **kwargs)
+
+            # Embedded objects are yielded as soon as they have been read, rather than
+            # after the child of the root element containing them.
+
+            del predicate_calls[:]
+            stream = importer.xml_import_stream(xml_fname, **kwargs)
+            streamed = [next(stream), next(stream)]
+            self.assertEqual(map(lambda x: x['id_and_rev_info']['id'], streamed), ['test:o1', 'test:o2'])
+            self.assertFalse('o4' in predicate_calls)
+            streamed.extend(stream)
+        finally:
+            os.remove(xml_fname)
+
+        # The mixed content of the root element and the content of 'dup' are dumped
+        # just as in 'xml_import'.
+
+        top_level = streamed.pop()
+        self.assertEqual(top_level['dict_repr'], result['dict_repr'])
+        self.assertEqual(top_level['dict_repr']['@@content_type'], 'mixed')
+
+        self.assertEqual(sorted(map(lambda x: (x['id_and_rev_info']['id'],x['dict_repr'].flatten()),streamed)),
+                         sorted(map(lambda x: (x['id_and_rev_info']['id'],x['dict_repr'].flatten()),
+                                    result['embedded_objects'])))
+        self.assertEqual(len(streamed), 4)
+
+    def test_streaming_command_import(self):
+
+        xml_fname = 'tests/testdata/xml/person_with_namespaces.xml'
+
+        self.command.handle(xml_fname,
+                            uid='parsed',
+                            placeholder_fillers=[],
+                            identifier_ns_uri=None)
+        Command().handle(xml_fname,
+                         placeholder_fillers=[],
+                         identifier_ns_uri=None,
+                         stream=True)
+
+        # Without given identifier, the digest of the file content is used, just as when
+        # the file is parsed as a whole.
+
+        with open(xml_fname, 'rb') as xml_file:
+            uid = hashlib.sha256(xml_file.read()).hexdigest()
+
+        parsed = models.InfoObject.objects.get(identifier__uid='parsed')
+        streamed = models.InfoObject.objects.get(identifier__uid=uid)
+        self.assertEqual(streamed.to_dict(), parsed.to_dict())
+
+    def test_deep_import(self):
+
+        importer = DingoImportHandling()
+
+        # The nesting depth exceeds Python's recursion limit
+
+        depth = 3 * sys.getrecursionlimit()
+        xml_content = "<root>%s<mixed>text <b>bold</b> text</mixed>%s</root>" % ("<e>" * depth, "</e>" * depth)
+
+        result = importer.xml_import(xml_content=xml_content,
+                                     ns_mapping={},
+                                     id_and_revision_extractor=lambda x: {'id': 'test:deep', 'timestamp': None})
+
+        walker = result['dict_repr']
+        for i in range(depth):
+            walker = walker['e']
+        self.assertEqual(walker['mixed'], {'_value': 'text <b>bold</b> text',
+                                           '@@content_type': 'mixed'})
+
+    def test_import_profile(self):
+
+        (handle, report_name) = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        try:
+            Command().handle('tests/testdata/xml/person.xml',
+                             uid='profiled',
+                             placeholder_fillers=[],
+                             identifier_ns_uri=None,
+                             stats_json=report_name)
+            with open(report_name) as report_file:
+                report = json.load(report_file)
+        finally:
+            os.remove(report_name)
+
+        # Profiling is turned off after the import
+
+        self.assertEqual(profiling.active, None)
+
+        self.assertEqual(report['total']['files'], 1)
+        self.assertEqual(report['total']['objects'], 1)
+        self.assertTrue(report['total']['queries'] > 0)
+
+        stages = report['stages']
+        for stage in ['xml_parse', 'xml_to_dict', 'flatten', 'datatype_extraction', 'fact_terms', 'naming']:
+            self.assertTrue(stages[stage]['calls'] > 0)
+        self.assertEqual(stages['datatype_extraction']['rows'], stages['flatten']['rows'])
+
+        (file_record,) = report['files']
+        self.assertEqual(file_record['filename'], 'tests/testdata/xml/person.xml')
+        (object_record,) = file_record['objects']
+        self.assertTrue(object_record['identifier'].endswith(':profiled'))
+        self.assertEqual(object_record['iobject_type'], 'person')
+        self.assertEqual(object_record['stages']['flatten'], stages['flatten'])
+        self.assertTrue(object_record['queries'] <= file_record['queries'])
+
+    def test_dry_run(self):
+
+        @deltaCalc
+        def t_import(*args,**kwargs):
+            return Command().handle(*args,**kwargs)
+
+        def dry_run():
+            (handle, plan_name) = tempfile.mkstemp(suffix='.json')
+            os.close(handle)
+            try:
+                (delta, result) = t_import('tests/testdata/xml/person.xml',
+                                           uid='dry_run',
+                                           placeholder_fillers=[],
+                                           identifier_ns_uri=None,
+                                           dry_run=True,
+                                           plan_json=plan_name)
+                with open(plan_name) as plan_file:
+                    plan = json.load(plan_file)
+            finally:
+                os.remove(plan_name)
+
+            # Nothing has been written
+
+            self.assertEqual(delta, [])
+            self.assertEqual(DingoImporter.plan, None)
+            return plan
+
+        plan = dry_run()
+
+        self.assertEqual(plan['documents'], 1)
+        self.assertEqual(plan['objects'], {'new': 1})
+        self.assertEqual(plan['object_types'], {'person': 1})
+
+        # The plan predicts the rows written by the import
+
+        (delta, result) = t_import('tests/testdata/xml/person.xml',
+                                   uid='dry_run',
+                                   placeholder_fillers=[],
+                                   identifier_ns_uri=None)
+        delta = dict(delta)
+        for name in ['InfoObjectType', 'FactDataType', 'FactTerm', 'FactTerm2Type', 'FactValue', 'Fact',
+                     'NodeID', 'FactTermNamespaceMap', 'InfoObject2Fact']:
+            self.assertEqual(plan['tables'][name]['new'], delta.get(name, 0))
+        self.assertTrue(plan['tables']['InfoObject2Fact']['new'] > 0)
+
+        # When the import is repeated, everything is found
+
+        plan = dry_run()
+
+        self.assertEqual(plan['objects'], {'unchanged': 1})
+        self.assertEqual(sum(map(lambda x: x['new'], plan['tables'].values())), 0)
+
+    def test_dry_run_cache_hits(self):
+
+        Command().handle('tests/testdata/xml/person_with_namespaces.xml',
+                         uid='cache_hits',
+                         placeholder_fillers=[],
+                         identifier_ns_uri=None)
+        models.clear_schema_caches()
+
+        (handle, plan_name) = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                Command().handle('tests/testdata/xml/person_with_namespaces.xml',
+                                 uid='cache_hits_dry_run',
+                                 placeholder_fillers=[],
+                                 identifier_ns_uri=None,
+                                 dry_run=True,
+                                 plan_json=plan_name)
+            with open(plan_name) as plan_file:
+                plan = json.load(plan_file)
+        finally:
+            os.remove(plan_name)
+
+        # Rows loaded from the database are not reported as cache hits, and the
+        # namespace maps of all fact terms are loaded with a single query.
+
+        for name in ['NodeID', 'FactTermNamespaceMap']:
+            self.assertTrue(plan['tables'][name]['existing'] > 0)
+            self.assertEqual(plan['tables'][name]['cached'], 0)
+        self.assertEqual(len(filter(lambda x: 'FROM "dingos_facttermnamespacemap"' in x['sql'],
+                                    queries.captured_queries)),
+                         1)
+
+    def test_dry_run_with_own_import_handler(self):
+
+        # Importers may keep their own 'DingoImportHandling'; the dry run is
+        # carried out by that handler.
+
+        class OwnHandlerImport(Generic_XML_Import):
+            import_handler = DingoImportHandling()
+
+        class OwnHandlerCommand(Command):
+            Importer = OwnHandlerImport()
+
+        @deltaCalc
+        def t_import(*args,**kwargs):
+            return OwnHandlerCommand().handle(*args,**kwargs)
+
+        (handle, plan_name) = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        try:
+            (delta, result) = t_import('tests/testdata/xml/person.xml',
+                                       uid='dry_run_own_handler',
+                                       placeholder_fillers=[],
+                                       identifier_ns_uri=None,
+                                       dry_run=True,
+                                       plan_json=plan_name)
+            with open(plan_name) as plan_file:
+                plan = json.load(plan_file)
+        finally:
+            os.remove(plan_name)
+
+        self.assertEqual(delta, [])
+        self.assertEqual(plan['objects'], {'new': 1})
+        self.assertEqual(OwnHandlerImport.import_handler.plan, None)
+
+        # Should an importer write via another handler, the writes are rolled back
+
+        class OtherHandlerImport(Generic_XML_Import):
+            import_handler = DingoImportHandling()
+
+            def xml_import(self, *args, **kwargs):
+                self.import_handler = DingoImportHandling()
+                return Generic_XML_Import.xml_import(self, *args, **kwargs)
+
+        class OtherHandlerCommand(Command):
+            Importer = OtherHandlerImport()
+
+        @deltaCalc
+        def t_other_import(*args,**kwargs):
+            return OtherHandlerCommand().handle(*args,**kwargs)
+
+        (delta, result) = t_other_import('tests/testdata/xml/person.xml',
+                                         uid='dry_run_other_handler',
+                                         placeholder_fillers=[],
+                                         identifier_ns_uri=None,
+                                         dry_run=True)
+        self.assertEqual(delta, [])
+        self.assertEqual(models.ImportCheckpoint.objects.count(), 0)
+
+class BulkLoad_Tests(test.TestCase):
+
+    def test_bulk_insert(self):
+
+        Command().handle('tests/testdata/xml/person.xml',
+                         uid='bulk_insert',
+                         placeholder_fillers=[],
+                         identifier_ns_uri=None)
+        io2f_model = models.InfoObject2Fact
+        fields = ('iobject_id', 'fact_id', 'node_id_id', 'namespace_map_id')
+        rows = list(io2f_model.objects.order_by('pk').values_list(*fields))
+
+        backend_setting = dingos.DINGOS_BULK_LOAD_BACKEND
+        try:
+            for backend in ['orm', 'executemany', 'copy']:
+                dingos.DINGOS_BULK_LOAD_BACKEND = backend
+                max_pk = io2f_model.objects.order_by('-pk')[0].pk
+                models.bulk_insert(io2f_model, fields, rows)
+                new_rows = io2f_model.objects.filter(pk__gt=max_pk).order_by('pk')
+                self.assertEqual(list(new_rows.values_list(*fields)), rows)
+                self.assertEqual(new_rows.filter(attributed_fact__isnull=False).count(), 0)
+        finally:
+            dingos.DINGOS_BULK_LOAD_BACKEND = backend_setting
+
+        # COPY is only used on PostgreSQL, where it is chosen automatically
+
+        try:
+            for backend in ['auto', 'copy']:
+                dingos.DINGOS_BULK_LOAD_BACKEND = backend
+                self.assertEqual(models.get_bulk_load_backend(connection),
+                                 'copy' if connection.vendor == 'postgresql' else 'executemany')
+        finally:
+            dingos.DINGOS_BULK_LOAD_BACKEND = backend_setting
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', "COPY is only available on PostgreSQL")
+    def test_copy_import(self):
+
+        # Importing with COPY writes the same rows as importing with 'executemany'
+
+        backend_setting = dingos.DINGOS_BULK_LOAD_BACKEND
+        try:
+            for (backend, uid) in [('executemany', 'executemany_import'), ('copy', 'copy_import')]:
+                dingos.DINGOS_BULK_LOAD_BACKEND = backend
+                models.clear_schema_caches()
+                Command().handle('tests/testdata/xml/person.xml',
+                                 uid=uid,
+                                 placeholder_fillers=[],
+                                 identifier_ns_uri=None)
+        finally:
+            dingos.DINGOS_BULK_LOAD_BACKEND = backend_setting
+
+        (executemany_iobject, copy_iobject) = map(lambda x: models.Identifier.objects.get(uid=x).latest,
+                                                  ['executemany_import', 'copy_import'])
+        fields = ('fact__fact_term__term', 'fact__fact_term__attribute', 'node_id__name', 'fact__fact_values__value')
+        self.assertEqual(list(models.InfoObject2Fact.objects.filter(iobject=copy_iobject).order_by(
+                             'node_id__name').values_list(*fields)),
+                         list(models.InfoObject2Fact.objects.filter(iobject=executemany_iobject).order_by(
+                             'node_id__name').values_list(*fields)))
+        self.assertTrue(models.InfoObject2Fact.objects.filter(iobject=copy_iobject).exists())
+
+    def test_copy_buffer(self):
+
+        rows = [(1, None, True), (2, u'tab\tnew\nline\\', False)]
+        expected = '1\t\\N\tt\n2\ttab\\tnew\\nline\\\\\tf\n'
+
+        self.assertEqual(models.CopyBuffer(rows).read(), expected)
+
+        copy_buffer = models.CopyBuffer(rows)
+        first_line = copy_buffer.readline()
+        self.assertEqual(first_line, '1\t\\N\tt\n')
+        self.assertEqual(''.join(iter(lambda: copy_buffer.read(5), '')), expected[len(first_line):])
+
+
+class ImportJob_Tests(test.TestCase):
+
+    def setUp(self):
+        models.clear_schema_caches()
+        self.command = Command()
+
+    def test_queued_import(self):
+
+        self.command.handle('tests/testdata/xml/person.xml',
+                            'tests/testdata/xml/does_not_exist.xml',
+                            uid='queued',
+                            placeholder_fillers=[],
+                            identifier_ns_uri=None,
+                            queue=True)
+
+        # Queuing does not import anything
+
+        self.assertEqual(models.ImportJob.objects.filter(status=models.ImportJob.QUEUED).count(), 1)
+        self.assertEqual(models.Identifier.objects.filter(uid='queued').count(), 0)
+
+        models.ImportJob.enqueue('dingos_generic_xml_import', 'tests/testdata/xml/does_not_exist.xml')
+        models.ImportJob.enqueue('no_such_command', 'tests/testdata/xml/person.xml')
+
+        call_command('dingos_import_worker', exit_when_empty=True)
+
+        (done, missing_file, unknown_command) = models.ImportJob.objects.all()
+
+        self.assertEqual(done.status, models.ImportJob.DONE)
+        self.assertEqual(done.filename, os.path.abspath('tests/testdata/xml/person.xml'))
+        self.assertEqual(done.error, '')
+        self.assertTrue(done.started <= done.finished)
+        self.assertEqual(models.Identifier.objects.get(uid='queued').latest.iobject_type.name, 'person')
+
+        self.assertEqual(missing_file.status, models.ImportJob.FAILED)
+        self.assertTrue('Traceback' in missing_file.error)
+        self.assertEqual(unknown_command.status, models.ImportJob.FAILED)
+        self.assertTrue('Unknown import command no_such_command' in unknown_command.error)
+
+        self.assertEqual(models.ImportJob.claim('worker'), None)
+
+    def test_claim_and_requeue_stale(self):
+        first = models.ImportJob.enqueue('dingos_generic_xml_import', 'tests/testdata/xml/person.xml')
+        second = models.ImportJob.enqueue('dingos_generic_xml_import', 'tests/testdata/xml/does_not_exist.xml')
+
+        job = models.ImportJob.claim('worker-1')
+        self.assertEqual((job.pk, job.status, job.worker), (first.pk, models.ImportJob.RUNNING, 'worker-1'))
+        self.assertTrue(job.beat())
+
+        # Claimed jobs are not claimed again
+
+        self.assertEqual(models.ImportJob.claim('worker-2').pk, second.pk)
+        self.assertEqual(models.ImportJob.claim('worker-3'), None)
+
+        # A job whose worker has stopped recording heartbeats is queued again
+
+        models.ImportJob.objects.filter(pk=first.pk).update(heartbeat=timezone.now() - timedelta(seconds=120))
+        self.assertEqual(models.ImportJob.requeue_stale(60), 1)
+        self.assertFalse(job.beat())
+
+        call_command('dingos_import_worker', exit_when_empty=True, requeue_stale=60)
+
+        requeued = models.ImportJob.objects.get(pk=first.pk)
+        self.assertEqual(requeued.status, models.ImportJob.DONE)
+        self.assertNotEqual(requeued.worker, 'worker-1')
+        self.assertEqual(models.ImportJob.objects.get(pk=second.pk).status, models.ImportJob.RUNNING)
+
+class ImportCheckpoint_Tests(test.TestCase):
+
+    def setUp(self):
+        models.clear_schema_caches()
+
+    def test_resume(self):
+
+        (handle, empty_name) = tempfile.mkstemp(suffix='.xml')
+        os.close(handle)
+        try:
+            Command().handle('tests/testdata/xml/person.xml',
+                             empty_name,
+                             placeholder_fillers=[],
+                             identifier_ns_uri=None)
+
+            (done, failed) = models.ImportCheckpoint.objects.all()
+
+            self.assertEqual(done.command, 'dingos_generic_xml_import')
+            self.assertEqual(done.status, models.ImportCheckpoint.DONE)
+            with open('tests/testdata/xml/person.xml', 'rb') as person_file:
+                self.assertEqual(done.digest, hashlib.sha256(person_file.read()).hexdigest())
+            self.assertEqual(failed.status, models.ImportCheckpoint.FAILED)
+            self.assertTrue('Traceback' in failed.error)
+
+            # Resuming skips the file imported before (also under another name),
+            # but retries the failed one.
+
+            (handle, copy_name) = tempfile.mkstemp(suffix='.xml')
+            os.close(handle)
+            with open('tests/testdata/xml/person.xml', 'rb') as person_file:
+                with open(copy_name, 'wb') as copy_file:
+                    copy_file.write(person_file.read())
+            file_digest = importer_module.file_digest
+            hashed_files = []
+
+            def counting_file_digest(filename, *args, **kwargs):
+                hashed_files.append(filename)
+                return file_digest(filename, *args, **kwargs)
+
+            try:
+                iobject_count = models.InfoObject.objects.count()
+                importer_module.file_digest = counting_file_digest
+                Command().handle(copy_name,
+                                 'tests/testdata/xml/person_with_namespaces.xml',
+                                 empty_name,
+                                 placeholder_fillers=[],
+                                 identifier_ns_uri=None,
+                                 resume=True)
+            finally:
+                importer_module.file_digest = file_digest
+                os.remove(copy_name)
+
+            # Each file has been read only once for its digest
+
+            self.assertEqual(sorted(hashed_files),
+                             sorted([copy_name, 'tests/testdata/xml/person_with_namespaces.xml', empty_name]))
+        finally:
+            os.remove(empty_name)
+
+        self.assertEqual(models.InfoObject.objects.count(), iobject_count + 1)
+        self.assertEqual(map(lambda x: (x.filename, x.status), models.ImportCheckpoint.objects.all()[2:]),
+                         [('tests/testdata/xml/person_with_namespaces.xml', models.ImportCheckpoint.DONE),
+                          (empty_name, models.ImportCheckpoint.FAILED)])
+
+class ParallelImport_Tests(test.TransactionTestCase):
+
+    # The worker processes of the pool write with connections of their own, so
+    # the test must not run within a transaction of the test case.
+
+    def setUp(self):
+        models.clear_schema_caches()
+
+    def test_import_with_workers(self):
+
+        source_dir = tempfile.mkdtemp()
+        destination_dir = tempfile.mkdtemp()
+        try:
+            with open('tests/testdata/xml/person_with_namespaces.xml', 'rb') as person_file:
+                xml_content = person_file.read()
+            filenames = []
+            for name in ['Anna', 'Bert', 'Carl', 'Dora', 'Emil']:
+                filename = os.path.join(source_dir, '%s.xml' % name)
+                with open(filename, 'wb') as xml_file:
+                    xml_file.write(xml_content.replace('John', name))
+                filenames.append(filename)
+            open(os.path.join(source_dir, 'Empty.xml'), 'wb').close()
+
+            command = Command()
+            command.stdout = StringIO.StringIO()
+            command.handle(os.path.join(source_dir, '*.xml'),
+                           placeholder_fillers=[('source', 'parallel test')],
+                           identifier_ns_uri=None,
+                           marking_json='tests/testdata/markings/import_info.json',
+                           destination_path=destination_dir,
+                           workers=2)
+
+            # Processed files are moved to the destination path
+
+            self.assertEqual(sorted(os.listdir(destination_dir)),
+                             ['Anna.xml', 'Bert.xml', 'Carl.xml', 'Dora.xml', 'Emil.xml', 'Empty.xml'])
+        finally:
+            shutil.rmtree(source_dir)
+            shutil.rmtree(destination_dir)
+
+        summary = command.stdout.getvalue().splitlines()
+        self.assertEqual(sorted(map(lambda x: x.split()[0], summary[:-1])), ['FAILED'] + ['OK'] * 5)
+        self.assertTrue(summary[-1].startswith('Imported 5 of 6 files (1 failed) in '))
+
+        # Each imported object is marked with the marking created by the parent process
+
+        marking = models.InfoObject.objects.get(iobject_type__name='ImportInfo')
+        self.assertEqual(models.InfoObject.objects.filter(iobject_type__name='person').count(), 5)
+        self.assertEqual(models.Marking2X.objects.filter(marking=marking).count(), 5)
+
+        # Concurrent workers have not created the same namespace map twice
+
+        maps = {}
+        for (map_pk, fact_term_pk, position, uri) in models.PositionalNamespace.objects.values_list(
+                'fact_term_namespace_map', 'fact_term_namespace_map__fact_term', 'position', 'namespace__uri'):
+            maps.setdefault(map_pk, [fact_term_pk]).append((position, uri))
+        self.assertEqual(len(maps), models.FactTermNamespaceMap.objects.count())
+        self.assertEqual(len(set(map(lambda x: tuple(sorted(x)), maps.values()))), len(maps))
+
+class StreamingImport_Tests(test.TransactionTestCase):
+
+    # Objects of a streamed import are committed one by one, so the test
+    # must not run within a transaction of the test case.
+
+    def setUp(self):
+        models.clear_schema_caches()
+
+    def test_objects_are_committed_one_by_one(self):
+
+        class EmbeddingStreamImport(Generic_XML_Import):
+            # Writes the addresses and phone numbers as embedded objects as soon
+            # as they are yielded; fails when it comes to the fax number.
+
+            def xml_import(self, filepath=None, markings=None, **kwargs):
+
+                def embedded_predicate(parent, child, ns_mapping):
+                    return child.name in ['address', 'phoneNumber']
+
+                def id_and_revision_extractor(xml_elt):
+                    return {'id': xml_elt.prop('type') or xml_elt.name,
+                            'timestamp': None}
+
+                for found in self.import_handler.xml_import_stream(filepath,
+                                                                   ns_mapping={},
+                                                                   embedded_predicate=embedded_predicate,
+                                                                   id_and_revision_extractor=id_and_revision_extractor):
+                    uid = found['id_and_rev_info']['id']
+                    if uid == 'fax':
+                        raise ValueError("Cannot import %s" % uid)
+                    self.import_handler.create_iobject(iobject_family_name='test',
+                                                       iobject_type_name=found['elt_name'],
+                                                       iobject_type_namespace_uri='test.org',
+                                                       iobject_data=found['dict_repr'],
+                                                       uid=uid,
+                                                       identifier_ns_uri='test.org',
+                                                       timestamp=timezone.now(),
+                                                       markings=markings)
+
+        class StreamCommand(Command):
+            Importer = EmbeddingStreamImport()
+
+        options = {'identifier_ns_uri': None}
+
+        # Imported in a single transaction, nothing is left of the failed import ...
+
+        result = StreamCommand().import_file('tests/testdata/xml/person.xml', [], options)
+
+        self.assertFalse(result['success'])
+        self.assertEqual(models.InfoObject.objects.filter(iobject_family__name='test').count(), 0)
+
+        # ... whereas a streamed import keeps the objects written before the failure.
+
+        result = StreamCommand().import_file('tests/testdata/xml/person.xml', [], dict(options, stream=True))
+
+        self.assertFalse(result['success'])
+        self.assertFalse(connection.in_atomic_block)
+        self.assertEqual(sorted(models.InfoObject.objects.filter(iobject_family__name='test').values_list(
+            'identifier__uid', flat=True)), ['address', 'home'])
+        self.assertEqual(list(models.ImportCheckpoint.objects.filter(digest=result['digest']).values_list(
+            'status', flat=True)), [models.ImportCheckpoint.FAILED] * 2)
+
+class BlobFileSystemStorage_Tests(test.TestCase):
+
+    def setUp(self):
+        self.blob_root = tempfile.mkdtemp()
+        self.blob_storage = dingos.DINGOS_BLOB_STORAGE
+        dingos.DINGOS_BLOB_STORAGE = BlobFileSystemStorage(location=self.blob_root)
+
+    def tearDown(self):
+        dingos.DINGOS_BLOB_STORAGE = self.blob_storage
+        shutil.rmtree(self.blob_root)
+
+    def test_write_large_value(self):
+        storage = dingos.DINGOS_BLOB_STORAGE
+        value = 'x' * (dingos.DINGOS_MAX_VALUE_SIZE_WRITTEN_TO_VALUE_TABLE + 1)
+        digest = hashlib.sha256(value).hexdigest()
+
+        self.assertEqual(models.write_large_value(value, storage_location=dingos.DINGOS_FILE_SYSTEM),
+                         (digest, dingos.DINGOS_FILE_SYSTEM))
+
+        # The blob is written into subdirectories named after the digest
+
+        blob_path = os.path.join(self.blob_root, digest[0:2], digest[2:4], '%s.blob' % digest)
+        self.assertTrue(os.path.isfile(blob_path))
+        self.assertEqual(models.read_large_value(digest, dingos.DINGOS_FILE_SYSTEM), value)
+
+        # Existing blobs are not written again
+
+        self.assertEqual(storage.save_blob(value), (digest, False))
+
+        # Compressed blobs are read transparently, as are blobs in the root
+        # directory that have been written by earlier versions.
+
+        storage.compress = True
+        compressed_value = 'y' * 10000
+        (compressed_digest, written) = storage.save_blob(compressed_value)
+        self.assertTrue(written)
+        compressed_path = storage.path(storage.blob_name(compressed_digest, compressed=True))
+        self.assertTrue(os.path.getsize(compressed_path) < len(compressed_value))
+        storage.compress = False
+        self.assertEqual(storage.read_blob(compressed_digest), compressed_value)
+
+        flat_value = 'z' * 10000
+        flat_digest = hashlib.sha256(flat_value).hexdigest()
+        with open(os.path.join(self.blob_root, '%s.blob' % flat_digest), 'wb') as flat_file:
+            flat_file.write(flat_value)
+        self.assertEqual(storage.save_blob(flat_value), (flat_digest, False))
+        self.assertEqual(storage.read_blob(flat_digest), flat_value)
+
+        # No temporary files are left behind
+
+        for (dirpath, dirnames, filenames) in os.walk(self.blob_root):
+            self.assertEqual(filter(lambda x: x.endswith('.tmp'), filenames), [])
+
+class BlobCache_Tests(test.TestCase):
+
+    def setUp(self):
+        self.contents = {}
+        for char in 'abc':
+            content = char * 3000
+            digest = hashlib.sha256(content).hexdigest()
+            models.BlobStorage.objects.create(sha256=digest, content=content)
+            self.contents[digest] = content
+
+    def test_load(self):
+        blob_cache = models.BlobCache(maxsize=7000)
+        missing_digest = hashlib.sha256('missing').hexdigest()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(blob_cache.load(self.contents.keys() + [missing_digest]), self.contents)
+        self.assertEqual(len(queries.captured_queries), 1)
+
+        # Only two of the three contents fit into the cache
+
+        self.assertEqual(blob_cache.contents.total_size, 6000)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(blob_cache.load(self.contents.keys()), self.contents)
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertEqual(blob_cache.get(missing_digest), None)
+
+    def test_preview(self):
+        blob_cache = models.BlobCache()
+        (digest, content) = self.contents.items()[0]
+
+        with CaptureQueriesContext(connection) as queries:
+            previews = blob_cache.load_previews(self.contents.keys(), 10)
+            self.assertEqual(blob_cache.preview(digest, 10), "%s..." % content[:10])
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertEqual(previews[digest], (content[:10], True))
+
+        # Only the start of the contents has been transferred and cached
+
+        self.assertEqual(blob_cache.contents.total_size, 3 * 11)
+        self.assertEqual(blob_cache.load_previews([digest], 3000), {digest: (content, False)})
+
+        # Blobs that are changed are not served from the cache any more
+
+        models.blob_cache.load([digest])
+        blob = models.BlobStorage.objects.get(sha256=digest)
+        blob.content = 'changed'
+        blob.save()
+        self.assertEqual(models.blob_cache.get(digest), 'changed')
+
+
+    def test_display(self):
+        (digest, content) = self.contents.items()[0]
+        url = reverse('url.dingos.view.blob', kwargs={'sha256': digest})
+
+        # Values are displayed in full, unless a preview length is given; the
+        # preview links to the full value.
+
+        template = Template("{% load dingos_tags %}{% lookup_blob digest preview_length %}")
+        self.assertEqual(template.render(Context({'digest': digest, 'preview_length': 0})), content)
+        self.assertEqual(template.render(Context({'digest': digest, 'preview_length': 10})),
+                         '%s... <a href="%s">[full value]</a>' % (content[:10], url))
+
+        request = test.RequestFactory().get(url)
+        request.user = User.objects.create_user('blob_viewer', password='secret')
+        response = BlobView.as_view()(request, sha256=digest)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, content)
+
+
+class SizeBoundedLRUCache_Tests(unittest.TestCase):
+
+    def test_eviction(self):
+        cache = SizeBoundedLRUCache(maxsize=10)
+        cache.set('a', 'xxxx')
+        cache.set('b', 'xxxx')
+        cache.get('a')
+        cache.set('c', 'xxxx')
+        self.assertEqual(('a' in cache, 'b' in cache, 'c' in cache), (True, False, True))
+        cache.set('a', 'x')
+        self.assertEqual(cache.total_size, 5)
+
+        # Values that exceed the maximal size are not cached
+
+        cache.set('d', 'x' * 11)
+        self.assertFalse('d' in cache)
+        self.assertEqual(cache.stats()['total_size'], 5)
+
+
+class SchemaCache_Tests(test.TestCase):
+
+    def setUp(self):
+        models.clear_schema_caches()
+        self.command = Command()
+
+    def test_no_schema_queries_after_warmup(self):
+
+        schema_tables = map(lambda x: models.dingos_class_map[x]._meta.db_table,
+                            models.SCHEMA_CACHED_MODELS)
+
+        for uid in ['first','second']:
+            with CaptureQueriesContext(connection) as queries:
+                self.command.handle('tests/testdata/xml/person_with_namespaces.xml',
+                                    uid=uid,
+                                    placeholder_fillers=[],
+                                    identifier_ns_uri=None,
+                                    marking_json='tests/testdata/markings/import_info.json')
+
+        schema_queries = filter(lambda x: re.search(r'FROM "(%s)"' % "|".join(schema_tables), x['sql']),
+                                queries.captured_queries)
+
+        self.assertEqual(schema_queries,[])
+        self.assertTrue(models.schema_cache_stats()['FactTerm']['hits'] > 0)
+
+    def test_invalidation(self):
+
+        fact_term, created = models.get_or_create_cached(models.FactTerm,term='Filename',attribute='')
+        self.assertTrue(created)
+
+        cache = models.get_schema_cache(models.FactTerm)
+        self.assertEqual(len(cache),1)
+
+        # Creating further objects leaves the cache intact ...
+
+        models.get_or_create_cached(models.FactTerm,term='Hash',attribute='')
+        self.assertEqual(len(cache),2)
+
+        # ... but changing or deleting an object invalidates it.
+
+        fact_term.term = 'File_Name'
+        fact_term.save()
+        self.assertEqual(len(cache),0)
+
+        cached_fact_term, created = models.get_or_create_cached(models.FactTerm,term='File_Name',attribute='')
+        self.assertFalse(created)
+        cached_fact_term.delete()
+        self.assertEqual(len(cache),0)
+
+    def test_lru_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a',1)
+        cache.set('b',2)
+        self.assertEqual(cache.get('a'),1)
+        cache.set('c',3)
+        self.assertEqual(cache.get('b'),None)
+        self.assertEqual(cache.get('c'),3)
+        self.assertEqual(cache.stats(),{'hits': 2, 'misses': 1, 'size': 2})
+
+    def test_node_id_intern_map(self):
+
+        self.command.handle('tests/testdata/xml/person.xml',
+                            uid='interned',
+                            placeholder_fillers=[],
+                            identifier_ns_uri=None,
+                            marking_json='tests/testdata/markings/import_info.json')
+
+        iobject = models.InfoObject.objects.get(identifier__uid='interned')
+
+        node_id_names = list(iobject.fact_thru.values_list('node_id__name',flat=True))
+
+        # The intern map knows all node identifiers, so the node identifiers
+        # of the facts are not retrieved from the database.
+
+        with self.assertNumQueries(1):
+            interned_names = map(lambda x: x.node_id.name, iobject.fact_thru.all().intern_node_ids())
+
+        self.assertEqual(interned_names,node_id_names)
+
+        # Missing node identifiers are created in one go
+
+        (delta,pks) = deltaCalc(models.node_id_intern_map.get_pks)(['N0000','N9999:L0000','N9999:L0001'])
+        self.assertEqual(delta,[('NodeID', 2)])
+        self.assertEqual(models.NodeID.objects.get(name='N9999:L0001').pk,pks['N9999:L0001'])
+
+    def test_namespace_map_cache(self):
+
+        self.assertEqual(models.namespace_map_cache.make_key([('urn:a','a'),(None,None),('urn:b','b'),(None,None)]),
+                         (u'urn:a',None,u'urn:b'))
+        self.assertEqual(models.namespace_map_cache.make_key([(None,None)]),())
+
+        for uid in ['first','second']:
+            with CaptureQueriesContext(connection) as queries:
+                self.command.handle('tests/testdata/xml/person_with_namespaces.xml',
+                                    uid=uid,
+                                    placeholder_fillers=[],
+                                    identifier_ns_uri=None,
+                                    marking_json='tests/testdata/markings/import_info.json')
+
+        # The second import finds all namespace maps in the cache
+
+        map_queries = filter(lambda x: re.search(r'FROM "%s"' % models.FactTermNamespaceMap._meta.db_table, x['sql']),
+                             queries.captured_queries)
+        self.assertEqual(map_queries,[])
+
+        # Maps that are loaded from the database are found under the same key
+
+        cached_maps = dict(models.namespace_map_cache._maps)
+        self.assertTrue(cached_maps)
+        models.namespace_map_cache.clear()
+        models.namespace_map_cache.load(map(lambda x: x[0], cached_maps.keys()))
+        self.assertEqual(models.namespace_map_cache._maps,cached_maps)
+
+
+class DingoObjDict_Tests(unittest.TestCase):
+
+    def assertFlattenedAsBefore(self, obj_dict, **kwargs):
+        self.assertEqual(obj_dict.flatten(**kwargs), sorting_flatten(obj_dict, **kwargs))
+
+    def test_flatten(self):
+
+        namespace_dict = {'cybox': 'http://cybox.mitre.org/cybox-2'}
+
+        self.assertFlattenedAsBefore(make_obj_dict(3, 3), namespace_dict=namespace_dict)
+        self.assertFlattenedAsBefore(make_obj_dict(3, 3),
+                                     namespace_dict=namespace_dict,
+                                     attr_ignore_predicate=lambda x: x['attribute'] == 'condition',
+                                     force_nonleaf_fact_predicate=lambda x, y: 'id' in map(lambda z: z[1:], y))
+
+        # Abbreviated values, empty lists and namespaces of elements in lists
+
+        obj_dict = DingoObjDict()
+        obj_dict['@@ns'] = 'cybox'
+        obj_dict['Empty'] = []
+        item = DingoObjDict()
+        item['@@ns'] = 'other'
+        item['_value'] = 'item'
+        obj_dict['Items'] = [item, DingoObjDict()]
+        obj_dict['Name'] = 'abbreviated'
+        child = DingoObjDict()
+        child['@@ns'] = 'cybox'
+        child['Value'] = 'nested'
+        obj_dict['Child'] = child
+        obj_dict['Other_Name'] = 'abbreviated'
+        self.assertFlattenedAsBefore(obj_dict, namespace_dict=namespace_dict)
+
+        # Nodes with more than 10000 children do not have node identifiers of fixed length
+
+        obj_dict = DingoObjDict()
+        for i in range(10002):
+            obj_dict['Element_%s' % i] = 'value'
+        obj_dict['@attribute'] = 'value'
+        self.assertFlattenedAsBefore(obj_dict)
+
+    def test_iterflatten(self):
+
+        obj_dict = make_obj_dict(2, 2)
+        attr_dict = {}
+        facts = obj_dict.iterflatten(attr_dict=attr_dict)
+
+        first_fact = next(facts)
+        self.assertEqual(attr_dict, {'': {'@ns': 'cybox', 'id': 'example:Object-2-2'}})
+        self.assertEqual(([first_fact] + list(facts), attr_dict), obj_dict.flatten())
+
+    def test_flat_fact(self):
+
+        fact = FlatFact.create('N000', 'Title', '', 'A title', ['cybox'])
+        self.assertEqual(fact, {'node_id': 'N000', 'term': 'Title', 'attribute': '',
+                                'value': 'A title', 'namespaces': ['cybox']})
+        self.assertFalse('value_list' in fact)
+
+        # Keys without slot are kept in an extra dictionary, keys with slot may be deleted
+
+        fact['@@type'] = 'Object'
+        fact['number_of_attributed_elements'] = 2
+        del fact['number_of_attributed_elements']
+        self.assertEqual(fact.get('@@type'), 'Object')
+        self.assertEqual(sorted(fact.keys()), ['@@type', 'attribute', 'namespaces', 'node_id', 'term', 'value'])
+        self.assertRaises(KeyError, fact.__getitem__, 'number_of_attributed_elements')
+        self.assertEqual(pickle.loads(pickle.dumps(fact)), fact)
+
+        # Pending facts map the 'values' keyword of 'add_fact' onto a slot
+
+        pending = models.PendingFact(fact_term_name='Title', values=['A title'])
+        self.assertEqual(pending.fact_values, ['A title'])
+        self.assertEqual(dict(**pending), {'fact_term_name': 'Title', 'values': ['A title']})
+
+    def test_compact_ordered_dict(self):
+
+        obj_dict = DingoObjDict([('b', 1), ('a', 2)], c=3)
+        obj_dict['d'] = 4
+        del obj_dict['a']
+        obj_dict['e'] = 5
+        self.assertEqual(obj_dict.keys(), ['b', 'c', 'd', 'e'])
+        self.assertFalse('a' in obj_dict)
+
+        # A key that is deleted and set again moves to the end
+
+        del obj_dict['b']
+        obj_dict['b'] = 6
+        self.assertEqual(obj_dict.items(), [('c', 3), ('d', 4), ('e', 5), ('b', 6)])
+        self.assertEqual(obj_dict.pop('d'), 4)
+        self.assertEqual(obj_dict.popitem(), ('b', 6))
+        self.assertEqual(list(obj_dict.itervalues()), [3, 5])
+
+        # Copies and pickled dictionaries keep their class and key order
+
+        obj_dict['Child'] = DingoObjDict([('z', 1), ('y', 2)])
+        for duplicate in [obj_dict.copy(), copy.deepcopy(obj_dict), pickle.loads(pickle.dumps(obj_dict))]:
+            self.assertEqual(type(duplicate), DingoObjDict)
+            self.assertEqual(duplicate.to_tuple(), (('c', 3), ('e', 5), ('Child', (('z', 1), ('y', 2)))))